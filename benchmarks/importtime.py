@@ -0,0 +1,78 @@
+""" import time budget check for the dcspray CLI
+
+Runs `python -X importtime -c "import dcspray.cli"` in a fresh interpreter,
+reports the slowest imports and fails if the budget is exceeded or if a heavy
+module is imported at startup.
+
+usage: python benchmarks/importtime.py [--budget-ms 250] [--runs 5]
+"""
+import argparse
+import subprocess
+import sys
+from typing import Dict, List, Tuple
+
+MODULE = "dcspray.cli"
+# only required by commands - must not be imported by the CLI module itself
+DEFERRED_MODULES = ["dracoon", "httpx", "pydantic", "PIL", "cryptography"]
+DEFAULT_BUDGET_MS = 250
+DEFAULT_RUNS = 5
+
+
+def parse_importtime(output: str) -> List[Tuple[str, int, int]]:
+    """parse -X importtime output into (module, self us, cumulative us)"""
+    imports = []
+
+    for line in output.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        imports.append((name.strip(), int(self_us), int(cumulative_us)))
+
+    return imports
+
+
+def measure(module: str = MODULE) -> List[Tuple[str, int, int]]:
+    res = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                         capture_output=True, text=True, check=True)
+    return parse_importtime(res.stderr)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="dcspray CLI import time budget check")
+    parser.add_argument("--budget-ms", type=float, default=DEFAULT_BUDGET_MS)
+    parser.add_argument("--runs", type=int, default=DEFAULT_RUNS)
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    # first run warms up bytecode caches
+    runs = [measure() for _ in range(args.runs + 1)][1:]
+
+    totals = [dict((name, cumulative) for name, _, cumulative in run)[MODULE] for run in runs]
+    best_ms = min(totals) / 1000
+
+    self_times: Dict[str, int] = {}
+    for name, self_us, _ in runs[-1]:
+        self_times[name] = self_us
+
+    print(f"import {MODULE}: best {best_ms:.1f} ms of {args.runs} runs (budget {args.budget_ms:.0f} ms)")
+    print("slowest imports (self time):")
+    for name, self_us in sorted(self_times.items(), key=lambda item: item[1], reverse=True)[:args.top]:
+        print(f"  {self_us / 1000:8.1f} ms  {name}")
+
+    failed = False
+
+    imported = {name.split(".")[0] for name in self_times}
+    for module in DEFERRED_MODULES:
+        if module in imported:
+            print(f"FAILED: {module} is imported at CLI startup.")
+            failed = True
+
+    if best_ms > args.budget_ms:
+        print(f"FAILED: import time {best_ms:.1f} ms exceeds budget of {args.budget_ms:.0f} ms.")
+        failed = True
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,116 @@
+""" local stand-in for the DRACOON branding endpoints (based on respx)
+
+All requests against SOURCE_URL / TARGET_URL are answered in process with a
+configurable latency and image payload size - no network access required.
+"""
+import asyncio
+import io
+import os
+from datetime import datetime
+
+import httpx
+import respx
+from PIL import Image
+
+from dracoon import DRACOON
+from dracoon.client import DRACOONConnection
+
+from dcspray.util.pool import ConnectionPool, init_dracoon
+
+SOURCE_URL = "https://source.dracoon.test"
+TARGET_URL = "https://target.dracoon.test"
+
+IMAGE_TYPES = ["webLogo", "appLogo", "squaredLogo", "appSplashImage", "webSplashImage"]
+
+BRANDING = {
+    "createdAt": "2022-01-01T00:00:00.000Z",
+    "changedAt": "2022-01-01T00:00:00.000Z",
+    "productName": "DRACOON",
+    "colors": [
+        {"type": "main", "colorDetails": [{"type": "normal", "rgba": "0,0,0,1"}, {"type": "light", "rgba": "1,1,1,1"}]}
+    ],
+    "colorizeHeader": True,
+    "imprintUrl": "https://dracoon.test/imprint",
+    "privacyUrl": "https://dracoon.test/privacy",
+    "supportUrl": "https://dracoon.test/support",
+    "emailContact": "support@dracoon.test",
+    "images": [],
+    "positionLoginBox": 1,
+    "appearanceLoginBox": "light",
+    "texts": [{"type": "terms", "languages": [{"languageTag": "en-US", "content": "Terms"}]}],
+}
+
+
+def make_image(size: int) -> bytes:
+    """PNG with random pixels (size x size) - noise does not compress"""
+    image = Image.frombytes("RGB", (size, size), os.urandom(size * size * 3))
+    buffer = io.BytesIO()
+    image.save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+class MockDRACOON:
+    """ respx router answering DRACOON branding requests with latency """
+
+    def __init__(self, latency: float = 0.05, image_size: int = 512):
+        self.latency = latency
+        self.image = make_image(image_size)
+        self.router = respx.mock(assert_all_called=False)
+        self.requests = 0
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self._setup()
+
+    async def _respond(self, response: httpx.Response, request: httpx.Request = None) -> httpx.Response:
+        self.requests += 1
+        if request is not None:
+            self.bytes_received += len(request.content)
+        self.bytes_sent += len(response.content)
+        await asyncio.sleep(self.latency)
+        return response
+
+    def _setup(self):
+        router = self.router
+        version = {"restApiVersion": "4.39.0", "sdsServerVersion": "4.39.0", "buildDate": "2022-01-01"}
+
+        for url in [SOURCE_URL, TARGET_URL]:
+            router.get(f"{url}/api/v4/public/software/version").mock(
+                side_effect=lambda request: self._respond(httpx.Response(200, json=version))
+            )
+
+        router.get(f"{SOURCE_URL}/branding/api/v1/public/branding").mock(
+            side_effect=lambda request: self._respond(httpx.Response(200, json=BRANDING))
+        )
+        router.get(url__regex=rf"{SOURCE_URL}/branding/api/v1/public/branding/files/\w+/large").mock(
+            side_effect=lambda request: self._respond(
+                httpx.Response(200, content=self.image, headers={"content-type": "image/png"})
+            )
+        )
+        router.post(url__startswith=f"{TARGET_URL}/branding/api/v1/branding/files").mock(
+            side_effect=lambda request: self._respond(
+                httpx.Response(200, json={"id": self.requests, "createdAt": "2022-01-01T00:00:00.000Z"}), request
+            )
+        )
+        router.put(f"{TARGET_URL}/branding/api/v1/branding").mock(
+            side_effect=lambda request: self._respond(httpx.Response(200, json=BRANDING), request)
+        )
+
+    def reset(self):
+        self.requests = 0
+        self.bytes_sent = 0
+        self.bytes_received = 0
+
+    def __enter__(self) -> "MockDRACOON":
+        self.router.__enter__()
+        return self
+
+    def __exit__(self, *args):
+        self.router.__exit__(*args)
+
+
+async def connected_target(url: str = TARGET_URL, pool: ConnectionPool = None) -> DRACOON:
+    """ DRACOON instance with a (fake) valid connection - no login required (pooled as in the CLI) """
+    dracoon = await init_dracoon(base_url=url, pool=pool, raise_on_err=True)
+    dracoon.client.connection = DRACOONConnection(datetime.now(), "access_token", 3600, "refresh_token")
+    dracoon.client.connected = True
+    return dracoon
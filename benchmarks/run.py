@@ -0,0 +1,163 @@
+""" end-to-end benchmarks for dcspray against a local mock DRACOON
+
+Reports wall time, requests per second, peak Python memory (tracemalloc) and
+maximum resident set size (includes C buffers, e.g. Pillow) for spray_branding,
+zip_branding, load_from_zip and image resizing. Requests go through a shared
+ConnectionPool (retry transport) as in the CLI.
+
+usage: python benchmarks/run.py [--latency-ms 50] [--image-size 512] [--runs 3] [--only spray]
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import os
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Awaitable, Callable, List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from dracoon.branding.responses import ImageType
+
+from dcspray.util.branding import spray_branding, zip_branding, load_from_zip, resize_image_bytes
+from dcspray.util.pool import ConnectionPool
+from mock_dracoon import MockDRACOON, SOURCE_URL, connected_target, make_image
+
+try:
+    import resource
+except ImportError:
+    # Windows
+    resource = None
+
+BENCHMARKS = ["spray", "save", "load", "resize"]
+
+
+@dataclass
+class Result:
+    name: str
+    wall_times: List[float]
+    requests: int
+    peak_memory: int
+    # maximum resident set size of the process after the benchmark (bytes, None if not available)
+    max_rss: int = None
+
+    @property
+    def wall_time(self) -> float:
+        return statistics.median(self.wall_times)
+
+    @property
+    def requests_per_second(self) -> float:
+        return self.requests / self.wall_time if self.wall_time else 0
+
+
+async def measure(name: str, run: Callable[[], Awaitable], runs: int, mock: MockDRACOON = None) -> Result:
+    wall_times = []
+    peak_memory = 0
+    requests = 0
+
+    for _ in range(runs):
+        if mock:
+            mock.reset()
+        tracemalloc.start()
+        start = time.perf_counter()
+        # silence progress bars and status output
+        with contextlib.redirect_stdout(io.StringIO()):
+            await run()
+        wall_times.append(time.perf_counter() - start)
+        peak_memory = max(peak_memory, tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+        requests = mock.requests if mock else 0
+
+    return Result(name=name, wall_times=wall_times, requests=requests, peak_memory=peak_memory,
+                  max_rss=get_max_rss())
+
+
+def get_max_rss() -> int:
+    """high-water mark of the process (does not decrease - run single benchmarks with --only to compare)"""
+    if not resource:
+        return None
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return max_rss if sys.platform == "darwin" else max_rss * 1024
+
+
+async def run_benchmarks(args: argparse.Namespace) -> List[Result]:
+    results = []
+    selected = args.only or BENCHMARKS
+    zip_name = "branding.zip"
+
+    with MockDRACOON(latency=args.latency_ms / 1000, image_size=args.image_size) as mock:
+        async with ConnectionPool() as pool:
+
+            if "spray" in selected:
+                async def _spray():
+                    await spray_branding(source_url=SOURCE_URL, target_dracoon=await connected_target(pool=pool),
+                                         concurrency=args.concurrency, pool=pool)
+                results.append(await measure("spray_branding", _spray, args.runs, mock))
+
+            if "save" in selected or "load" in selected:
+                async def _save():
+                    await zip_branding(source_url=SOURCE_URL, zip_name=zip_name, on_prem_source=False,
+                                       concurrency=args.concurrency, pool=pool)
+                result = await measure("zip_branding", _save, args.runs, mock)
+                if "save" in selected:
+                    results.append(result)
+
+            if "load" in selected:
+                async def _load():
+                    await load_from_zip(dracoon=await connected_target(pool=pool), zip_file=zip_name,
+                                        concurrency=args.concurrency)
+                results.append(await measure("load_from_zip", _load, args.runs, mock))
+
+    if "resize" in selected:
+        image = make_image(args.image_size)
+
+        async def _resize():
+            for img_type in [ImageType.APP_LOGO, ImageType.WEB_LOGO]:
+                resize_image_bytes(content=image, img_type=img_type)
+        results.append(await measure("resize_image (app + web logo)", _resize, args.runs))
+
+    return results
+
+
+def print_results(results: List[Result], args: argparse.Namespace):
+    print(f"latency {args.latency_ms:.0f} ms, image size {args.image_size}px, "
+          f"concurrency {args.concurrency}, {args.runs} runs (median)")
+    print(f"{'benchmark':<32}{'wall time':>12}{'requests':>10}{'req/s':>10}{'peak memory':>14}{'max RSS':>12}")
+    for result in results:
+        requests_per_second = f"{result.requests_per_second:.1f}" if result.requests else "-"
+        max_rss = f"{result.max_rss / 1024 / 1024:.1f} MB" if result.max_rss is not None else "-"
+        print(f"{result.name:<32}{result.wall_time * 1000:>9.1f} ms{result.requests:>10}"
+              f"{requests_per_second:>10}{result.peak_memory / 1024 / 1024:>11.1f} MB{max_rss:>12}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="dcspray benchmarks against a local mock DRACOON")
+    parser.add_argument("--latency-ms", type=float, default=50, help="latency per request")
+    parser.add_argument("--image-size", type=int, default=512, help="width / height of served images (px)")
+    parser.add_argument("--concurrency", type=int, default=5)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--only", choices=BENCHMARKS, action="append")
+    args = parser.parse_args()
+
+    # zip files and DRACOON logs are written to a temporary directory
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        cwd = os.getcwd()
+        os.chdir(tmp_dir)
+        try:
+            results = asyncio.run(run_benchmarks(args))
+        finally:
+            os.chdir(cwd)
+
+    print_results(results, args)
+
+
+if __name__ == "__main__":
+    main()
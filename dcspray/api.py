@@ -0,0 +1,354 @@
+"""
+Async API to embed dcspray in an application (e.g. an orchestration service).
+
+Nothing is prompted and the process is never exited: errors raise DCSprayError
+subclasses (see dcspray.util.errors), results are returned as dataclasses.
+Nothing is printed either, unless quiet=False (as used by the CLI).
+All calls of a DCSpray instance share one connection pool (with its own retry policy
+and memory budget), so many sprays can run concurrently in a single event loop:
+
+    async with DCSpray(token_store=store) as dcspray:
+        source = await dcspray.get_source("https://source.dracoon.team")
+        results = await dcspray.spray_many(source, target_urls, username=..., password=...)
+"""
+import asyncio
+from dataclasses import dataclass
+from typing import Awaitable, Callable, List, Union
+
+import httpx
+from dracoon import DRACOON
+from dracoon.errors import DRACOONHttpError
+
+from dcspray.util.auth import add_https_protocol, connect_target, make_auth_error, verify_dracoon_url
+from dcspray.util.branding import (
+    SourceBranding,
+    TargetResult,
+    await_prefetch,
+    check_branding_zips,
+    fetch_source_branding,
+    format_error,
+    load_from_zip,
+    make_target_error,
+    snapshot_brandings,
+    spray_branding_to_targets,
+    update_target_branding,
+    watch_branding,
+    zip_branding,
+)
+from dcspray.util.cache import BrandingCache
+from dcspray.util.defaults import (
+    DEFAULT_CONCURRENCY,
+    DEFAULT_MEMORY_BUDGET,
+    DEFAULT_WATCH_INTERVAL,
+    DEFAULT_WATCH_JITTER,
+    DEFAULT_WORKERS,
+)
+from dcspray.util.errors import (
+    AuthenticationFailedError,
+    BrandingError,
+    DCSprayError,
+    InvalidArchiveError,
+    InvalidDRACOONUrlError,
+    SourceBrandingError,
+    TargetBrandingError,
+    VerificationFailedError,
+)
+from dcspray.util.journal import RolloutJournal
+from dcspray.util.optimize import ImageOptimization
+from dcspray.util.pool import ConnectionPool
+from dcspray.util.retry import RetryPolicy
+from dcspray.util.tokens import TokenStore
+from dcspray.util.uploads import UploadRegistry
+
+
+__all__ = [
+    "DCSpray",
+    "SprayResult",
+    "SourceBranding",
+    "TargetResult",
+    "DCSprayError",
+    "InvalidDRACOONUrlError",
+    "AuthenticationFailedError",
+    "BrandingError",
+    "SourceBrandingError",
+    "TargetBrandingError",
+    "InvalidArchiveError",
+    "VerificationFailedError",
+]
+
+
+@dataclass
+class SprayResult:
+    target_url: str
+    # False if the target was already up to date (incremental / journal)
+    updated: bool
+
+
+class DCSpray:
+    """
+    Spray, save and load brandings without a CLI - one connection pool is shared by all calls.
+    Targets are authenticated with a stored token (token store) or password flow,
+    other logins (e.g. interactive) can be passed as connect callable.
+    Image transfers are streamed in chunks within the memory budget of the instance (in bytes).
+    Progress and results are printed if not quiet (as in the CLI).
+    """
+
+    def __init__(self, client_id: str = "dracoon_legacy_scripting", client_secret: str = None,
+                 token_store: TokenStore = None, cache: BrandingCache = None,
+                 optimization: ImageOptimization = None, concurrency: int = DEFAULT_CONCURRENCY,
+                 workers: int = DEFAULT_WORKERS, http2: bool = False, retry_policy: RetryPolicy = None,
+                 memory_budget: int = DEFAULT_MEMORY_BUDGET, quiet: bool = True,
+                 upload_registry: UploadRegistry = None):
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.token_store = token_store
+        self.cache = cache
+        self.optimization = optimization
+        self.concurrency = concurrency
+        self.workers = workers
+        self.quiet = quiet
+        # uploads of incremental sprays (default registry in the user directory if None)
+        self.upload_registry = upload_registry
+        # raises ImportError if http2 and h2 is not installed
+        self.pool = ConnectionPool(http2=http2, retry_policy=retry_policy, memory_budget=memory_budget)
+
+    async def close(self):
+        await self.pool.close()
+
+    async def __aenter__(self) -> "DCSpray":
+        return self
+
+    async def __aexit__(self, *args):
+        await self.close()
+
+    async def verify_url(self, url: str) -> str:
+        """ url with https protocol - raises InvalidDRACOONUrlError if not a DRACOON instance """
+        url = add_https_protocol(url=url)
+        await verify_dracoon_url(url=url, pool=self.pool)
+        return url
+
+    async def get_source(self, source_url: str, on_prem_source: bool = False) -> SourceBranding:
+        """ public branding and (resized / optimized) images of a source - reuse it for many sprays """
+        return await self._get_source(source_url=source_url, on_prem_source=on_prem_source, quiet=self.quiet)
+
+    def prefetch_source(self, source_url: str, on_prem_source: bool = False) -> "asyncio.Task[SourceBranding]":
+        """ get a source in the background (e.g. while prompting for credentials) - always quiet """
+        return asyncio.create_task(
+            self._get_source(source_url=source_url, on_prem_source=on_prem_source, quiet=True)
+        )
+
+    async def _get_source(self, source_url: str, on_prem_source: bool, quiet: bool) -> SourceBranding:
+        try:
+            return await fetch_source_branding(
+                source_url=add_https_protocol(url=source_url),
+                on_prem_source=on_prem_source,
+                concurrency=self.concurrency,
+                workers=self.workers,
+                cache=self.cache,
+                pool=self.pool,
+                quiet=quiet,
+                optimization=self.optimization,
+            )
+        except httpx.HTTPError as err:
+            raise SourceBrandingError(f"Getting branding failed: {format_error(err)}") from err
+
+    async def connect(self, target_url: str, username: str = None, password: str = None) -> DRACOON:
+        """ authenticated target (stored token or password flow) - raises AuthenticationFailedError """
+        target_url = add_https_protocol(url=target_url)
+        try:
+            return await connect_target(
+                target_url=target_url,
+                username=username,
+                password=password,
+                client_id=self.client_id,
+                client_secret=self.client_secret,
+                pool=self.pool,
+                token_store=self.token_store,
+            )
+        except ValueError as err:
+            raise AuthenticationFailedError(str(err)) from err
+        except DRACOONHttpError as err:
+            raise make_auth_error(err, target_url=target_url) from err
+        except httpx.HTTPError as err:
+            raise AuthenticationFailedError(f"Authentication error: {format_error(err)}") from err
+
+    async def _connect(self, target_url: str, username: str = None, password: str = None,
+                       connect: Callable[[str], Awaitable[DRACOON]] = None) -> DRACOON:
+        """ authenticated target - via connect callable if given (errors typed as in connect) """
+        if not connect:
+            return await self.connect(target_url=target_url, username=username, password=password)
+
+        try:
+            return await connect(target_url)
+        except DRACOONHttpError as err:
+            raise make_auth_error(err, target_url=target_url) from err
+        except httpx.HTTPError as err:
+            raise AuthenticationFailedError(f"Authentication error: {format_error(err)}") from err
+
+    async def spray(self, source: Union[SourceBranding, "asyncio.Task[SourceBranding]"], target_url: str,
+                    username: str = None, password: str = None, incremental: bool = False,
+                    connect: Callable[[str], Awaitable[DRACOON]] = None) -> SprayResult:
+        """
+        spray a source branding to a single target - raises on error
+        a prefetched source (see prefetch_source) is awaited after authentication
+        """
+        target_url = add_https_protocol(url=target_url)
+
+        try:
+            target_dracoon = await self._connect(
+                target_url=target_url, username=username, password=password, connect=connect
+            )
+        except BaseException:
+            if isinstance(source, asyncio.Task):
+                source.cancel()
+            raise
+
+        try:
+            if isinstance(source, asyncio.Task):
+                source = await (source if self.quiet else await_prefetch(source))
+            branding, images = source
+            update = await update_target_branding(
+                dracoon=target_dracoon,
+                branding_dict=branding.dict(),
+                images=images,
+                concurrency=self.concurrency,
+                incremental=incremental,
+                quiet=self.quiet,
+                pool=self.pool,
+                registry=self.upload_registry,
+            )
+        except DRACOONHttpError as err:
+            raise make_target_error(err, action="Could not update branding") from err
+        except httpx.HTTPError as err:
+            raise TargetBrandingError(f"Could not update branding: {format_error(err)}") from err
+        finally:
+            await target_dracoon.client.disconnect()
+
+        return SprayResult(target_url=target_url, updated=update is not None)
+
+    async def spray_many(self, source: SourceBranding, target_urls: List[str], username: str = None,
+                         password: str = None, incremental: bool = False,
+                         journal: RolloutJournal = None) -> List[TargetResult]:
+        """ spray a source branding to many targets - a failing target does not raise (see results) """
+
+        async def _connect(target_url: str) -> DRACOON:
+            return await self.connect(target_url=target_url, username=username, password=password)
+
+        return await spray_branding_to_targets(
+            source_url=None,
+            target_urls=[add_https_protocol(url=url) for url in target_urls],
+            connect=_connect,
+            concurrency=self.concurrency,
+            incremental=incremental,
+            pool=self.pool,
+            source=source,
+            journal=journal,
+            quiet=self.quiet,
+            registry=self.upload_registry,
+        )
+
+    async def watch(self, source_url: str, target_urls: List[str], username: str = None, password: str = None,
+                    interval: float = DEFAULT_WATCH_INTERVAL, jitter: float = DEFAULT_WATCH_JITTER,
+                    spray_on_start: bool = False, on_prem_source: bool = False, incremental: bool = False,
+                    journal: RolloutJournal = None,
+                    on_spray: Callable[[List[TargetResult]], None] = None):
+        """ spray a source branding to many targets whenever it changed - runs until cancelled """
+
+        async def _connect(target_url: str) -> DRACOON:
+            return await self.connect(target_url=target_url, username=username, password=password)
+
+        await watch_branding(
+            source_url=add_https_protocol(url=source_url),
+            target_urls=[add_https_protocol(url=url) for url in target_urls],
+            connect=_connect,
+            interval=interval,
+            jitter=jitter,
+            spray_on_start=spray_on_start,
+            on_prem_source=on_prem_source,
+            concurrency=self.concurrency,
+            workers=self.workers,
+            cache=self.cache,
+            incremental=incremental,
+            pool=self.pool,
+            journal=journal,
+            optimization=self.optimization,
+            on_spray=on_spray,
+            quiet=self.quiet,
+            registry=self.upload_registry,
+        )
+
+    async def save(self, source_url: str, zip_name: str, on_prem_source: bool = False):
+        """ save a source branding as zip file (archive v2) - raises SourceBrandingError on request errors """
+        try:
+            await zip_branding(
+                source_url=add_https_protocol(url=source_url),
+                zip_name=zip_name,
+                on_prem_source=on_prem_source,
+                concurrency=self.concurrency,
+                workers=self.workers,
+                cache=self.cache,
+                pool=self.pool,
+                optimization=self.optimization,
+                quiet=self.quiet,
+            )
+        except (DRACOONHttpError, httpx.HTTPError) as err:
+            raise SourceBrandingError(f"Getting branding failed: {format_error(err)}") from err
+
+    async def save_many(self, source_urls: List[str], zip_name: str,
+                        on_prem_source: bool = False) -> List[TargetResult]:
+        """ save brandings of many sources into one snapshot zip file - a failing source does not raise """
+        return await snapshot_brandings(
+            source_urls=[add_https_protocol(url=url) for url in source_urls],
+            zip_name=zip_name,
+            on_prem_source=on_prem_source,
+            concurrency=self.concurrency,
+            workers=self.workers,
+            cache=self.cache,
+            pool=self.pool,
+            optimization=self.optimization,
+            quiet=self.quiet,
+        )
+
+    async def check(self, zip_files: List[str], source_url: str = None) -> List[TargetResult]:
+        """ check zip files (format, payload and images) without network requests """
+        return await check_branding_zips(
+            zip_files=zip_files,
+            workers=self.workers,
+            source_url=add_https_protocol(url=source_url) if source_url else None,
+            quiet=self.quiet,
+        )
+
+    async def load(self, zip_file: str, target_url: str, username: str = None, password: str = None,
+                   source_url: str = None, incremental: bool = False,
+                   connect: Callable[[str], Awaitable[DRACOON]] = None) -> SprayResult:
+        """ upload a branding from a zip file to a target - the zip file is checked before authentication """
+        target_url = add_https_protocol(url=target_url)
+        source_url = add_https_protocol(url=source_url) if source_url else None
+
+        # invalid zip files fail before any request (and authentication prompt)
+        results = await self.check(zip_files=[zip_file], source_url=source_url)
+        if not results[0].success:
+            raise InvalidArchiveError(results[0].error)
+
+        target_dracoon = await self._connect(
+            target_url=target_url, username=username, password=password, connect=connect
+        )
+        try:
+            update = await load_from_zip(
+                dracoon=target_dracoon,
+                zip_file=zip_file,
+                concurrency=self.concurrency,
+                incremental=incremental,
+                source_url=source_url,
+                workers=self.workers,
+                preflight=False,
+                quiet=self.quiet,
+                pool=self.pool,
+                registry=self.upload_registry,
+            )
+        except httpx.HTTPError as err:
+            raise TargetBrandingError(f"Could not update branding: {format_error(err)}") from err
+        finally:
+            await target_dracoon.client.disconnect()
+
+        return SprayResult(target_url=target_url, updated=update is not None)
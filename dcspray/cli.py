@@ -1,21 +1,158 @@
 import asyncio
+import os
+import sys
+from contextlib import nullcontext
+from typing import TYPE_CHECKING, Awaitable, Callable, List, Tuple
+
 import typer
 
-from dcspray.util.branding import (
-    get_branding,
-    delete_images,
-    update_branding,
-    upload_images,
-    download_images,
-    zip_branding,
-    load_from_zip,
-    spray_branding
+# heavy modules (dracoon, httpx, pydantic, Pillow) are imported by the commands
+# that need them to keep CLI startup (e.g. --help) fast
+from dcspray.util.defaults import (
+    DEFAULT_CONCURRENCY,
+    DEFAULT_WORKERS,
+    DEFAULT_WATCH_INTERVAL,
+    DEFAULT_WATCH_JITTER,
+    DEFAULT_MEMORY_BUDGET,
 )
-from dcspray.util.auth import password_flow, auth_code_flow, add_https_protocol, verify_dracoon_url
+from dcspray.util.cache import BrandingCache, DEFAULT_CACHE_SIZE
+from dcspray.util.errors import DCSprayError, InvalidArchiveError
+
+if TYPE_CHECKING:
+    from dracoon import DRACOON
+    from dcspray.api import DCSpray
+    from dcspray.util.optimize import ImageOptimization
+    from dcspray.util.tokens import TokenStore
 
 
 app = typer.Typer()
 
+
+def init_cache(cache: bool, cache_dir: str, cache_size: int) -> BrandingCache:
+    """create branding cache if enabled (size in MB)"""
+
+    if not cache:
+        return None
+
+    return BrandingCache(cache_dir=cache_dir, max_size=cache_size * 1024 * 1024)
+
+
+def init_optimization(optimize: bool, byte_budget: List[str]) -> "ImageOptimization":
+    """create image optimization if enabled (budgets given as TYPE=KB)"""
+
+    if not optimize and not byte_budget:
+        return None
+
+    from dcspray.util.optimize import ImageOptimization, parse_byte_budgets
+
+    return ImageOptimization(budgets=parse_byte_budgets(byte_budget))
+
+
+def init_token_store(token_store: bool) -> "TokenStore":
+    """open encrypted token store if enabled (passphrase from environment or prompt)"""
+
+    if not token_store:
+        return None
+
+    from dcspray.util.tokens import TokenStore, TOKEN_STORE_SECRET_ENV
+
+    secret = os.environ.get(TOKEN_STORE_SECRET_ENV) or typer.prompt(
+        "Please enter token store passphrase", hide_input=True
+    )
+
+    try:
+        return TokenStore(secret=secret)
+    except ValueError as err:
+        error_txt = typer.style("Error:", bg=typer.colors.RED, fg=typer.colors.WHITE)
+        typer.echo(f"{error_txt} {err}")
+        sys.exit(1)
+
+
+async def prompt_target_credentials(
+    target_urls: List[str], client_id: str, token_store: "TokenStore" = None
+) -> Tuple[str, str]:
+    """
+    prompt credentials used for all targets - only required if a target has no stored token
+    prompts run in background so that background tasks (e.g. source prefetch) keep running
+    """
+
+    if token_store and all(token_store.get(target_url=url, client_id=client_id) for url in target_urls):
+        return None, None
+
+    from dcspray.util.auth import prompt_in_background
+
+    username = await prompt_in_background("Please enter username")
+    password = await prompt_in_background("Please enter password", hide_input=True)
+
+    return username, password
+
+
+def interactive_login(dcspray: "DCSpray", auth_code: bool = False) -> Callable[[str], Awaitable["DRACOON"]]:
+    """
+    login of a target with prompts (no prompt if a stored token is valid)
+    password flow is used if no client secret is provided
+    """
+    from dcspray.util.auth import password_flow, auth_code_flow
+
+    async def _login(target_url: str) -> "DRACOON":
+        use_auth_code = auth_code
+        if dcspray.client_secret is None:
+            use_auth_code = False
+            typer.echo("No client secret provided.")
+            typer.echo(" Using password flow.")
+
+        flow = auth_code_flow if use_auth_code else password_flow
+        return await flow(
+            client_id=dcspray.client_id,
+            client_secret=dcspray.client_secret,
+            target_url=target_url,
+            pool=dcspray.pool,
+            token_store=dcspray.token_store,
+        )
+
+    return _login
+
+
+async def run_api(
+    run: Callable[["DCSpray"], Awaitable],
+    memory_budget: int = DEFAULT_MEMORY_BUDGET // (1024 * 1024),
+    profile: bool = False,
+    trace_file: str = None,
+    **options,
+):
+    """
+    run a command with the library API (printing progress) - returns the result of run
+    all DRACOON clients share one connection pool, image transfers share the memory budget (in MB)
+    errors are reported and exit the CLI (the library only raises)
+    if profiled, a summary is printed and / or a trace file is written (also on failure)
+    """
+    from dcspray.api import DCSpray
+    from dcspray.util.profiling import start_profiling
+
+    try:
+        dcspray = DCSpray(memory_budget=memory_budget * 1024 * 1024, quiet=False, **options)
+    except ImportError:
+        error_txt = typer.style("Error:", bg=typer.colors.RED, fg=typer.colors.WHITE)
+        typer.echo(f"{error_txt} HTTP/2 requires the h2 package (pip install h2).")
+        sys.exit(1)
+
+    profiler = start_profiling() if profile or trace_file else None
+
+    try:
+        async with dcspray:
+            return await run(dcspray)
+    except DCSprayError as err:
+        label = "Format error:" if isinstance(err, InvalidArchiveError) else "Error:"
+        error_txt = typer.style(label, bg=typer.colors.RED, fg=typer.colors.WHITE)
+        typer.echo(f"{error_txt} {err}")
+        sys.exit(1)
+    finally:
+        if profile:
+            profiler.print_summary()
+        if trace_file:
+            profiler.write_trace(trace_file)
+
+
 # CLI to copy branding from source to target url
 @app.command()
 def spray(
@@ -36,6 +173,9 @@ def spray(
     auth_code: bool = typer.Option(
         False, help="Optional authorization code flow for given client id and secret."
     ),
+    token_store: bool = typer.Option(
+        False, help="Optional encrypted token store to skip authentication prompts on later runs."
+    ),
     full_branding: bool = typer.Option(
         False, help="Optional full branding (including texts)."
     ),
@@ -43,39 +183,346 @@ def spray(
         False,
         help="Source branding is a on premises DRACOON installation using DRACOON Cloud branding.",
     ),
+    concurrency: int = typer.Option(
+        DEFAULT_CONCURRENCY, min=1, help="Maximum number of concurrent image transfers."
+    ),
+    workers: int = typer.Option(
+        DEFAULT_WORKERS, min=1, help="Number of worker threads used to resize images."
+    ),
+    incremental: bool = typer.Option(
+        False, help="Optional incremental update (only changed images and branding are uploaded)."
+    ),
+    cache: bool = typer.Option(
+        False, help="Optional local cache for source branding and images."
+    ),
+    cache_dir: str = typer.Option(
+        None, help="Optional cache directory (default is the user cache directory)."
+    ),
+    cache_size: int = typer.Option(
+        DEFAULT_CACHE_SIZE // (1024 * 1024), min=1, help="Maximum cache size in MB."
+    ),
+    optimize: bool = typer.Option(
+        False, help="Optional image optimization before upload (lossless recompression, metadata removed)."
+    ),
+    byte_budget: List[str] = typer.Option(
+        None,
+        help="Optional maximum image size as TYPE=KB (e.g. webSplashImage=500), larger images are compressed lossy (implies --optimize).",
+    ),
+    http2: bool = typer.Option(
+        False, help="Optional HTTP/2 for all connections (requires h2)."
+    ),
+    memory_budget: int = typer.Option(
+        DEFAULT_MEMORY_BUDGET // (1024 * 1024), min=1,
+        help="Maximum memory in MB buffered by image transfers in flight (further transfers wait).",
+    ),
+    profile: bool = typer.Option(
+        False, help="Optional timing summary of all phases (verify, auth, download, resize, upload, update)."
+    ),
+    trace_file: str = typer.Option(
+        None, help="Optional trace file of all phases (Chrome trace, JSON lines if name ends with .jsonl)."
+    ),
 ):
     """
     Spray a source DRACOON branding to a target DRACOON instance.
     Requires DRACOON config manager role for target.
     """
+    async def _spray(dcspray: "DCSpray"):
+        parsed_source_url, parsed_target_url = await asyncio.gather(
+            dcspray.verify_url(url=source_url), dcspray.verify_url(url=target_url)
+        )
 
-    async def _spray(auth_code: bool = False):
-        # use password flow if not client secret provided
+        # download source while authenticating
+        await dcspray.spray(
+            source=dcspray.prefetch_source(source_url=parsed_source_url, on_prem_source=on_prem_source),
+            target_url=parsed_target_url,
+            incremental=incremental,
+            connect=interactive_login(dcspray, auth_code=auth_code),
+        )
 
-        parsed_source_url = add_https_protocol(url=source_url)
-        await verify_dracoon_url(url=parsed_source_url)
+        success_txt = typer.style("SUCCESS:", fg=typer.colors.GREEN, bold=True)
+        typer.echo(f"{success_txt} Sprayed branding from {parsed_source_url} to target {parsed_target_url}")
 
-        parsed_target_url = add_https_protocol(url=target_url)
-        await verify_dracoon_url(url=parsed_target_url)
+    asyncio.run(
+        run_api(
+            _spray,
+            memory_budget=memory_budget,
+            profile=profile,
+            trace_file=trace_file,
+            client_id=client_id,
+            client_secret=client_secret,
+            token_store=init_token_store(token_store),
+            cache=init_cache(cache, cache_dir, cache_size),
+            optimization=init_optimization(optimize, byte_budget),
+            concurrency=concurrency,
+            workers=workers,
+            http2=http2,
+        )
+    )
 
-        if client_secret == None:
-            auth_code = False
-            typer.echo("No client secret provided.")
-            typer.echo(" Using password flow.")
 
-        # use password flow as default
-        if not auth_code:
-            dracoon = await password_flow(
-                client_id=client_id, client_secret=client_secret, target_url=parsed_target_url
+# CLI to copy branding from source to many target urls
+@app.command()
+def spray_many(
+    source_url: str = typer.Argument(
+        ..., help="Source DRACOON instance to copy branding from."
+    ),
+    targets_file: str = typer.Argument(
+        ..., help="File with target DRACOON instances (one url per line)."
+    ),
+    client_id: str = typer.Option(
+        "dracoon_legacy_scripting",
+        help="Optional client id of an OAuth app registered in target DRACOON instances.",
+    ),
+    client_secret: str = typer.Option(
+        None,
+        help="Optional client secret of an OAuth app registered in target DRACOON instances.",
+    ),
+    token_store: bool = typer.Option(
+        False, help="Optional encrypted token store to skip authentication prompts on later runs."
+    ),
+    on_prem_source: bool = typer.Option(
+        False,
+        help="Source branding is a on premises DRACOON installation using DRACOON Cloud branding.",
+    ),
+    concurrency: int = typer.Option(
+        DEFAULT_CONCURRENCY,
+        min=1,
+        help="Maximum number of targets and image transfers in flight at once.",
+    ),
+    workers: int = typer.Option(
+        DEFAULT_WORKERS, min=1, help="Number of worker threads used to resize images."
+    ),
+    incremental: bool = typer.Option(
+        False, help="Optional incremental update (only changed images and branding are uploaded)."
+    ),
+    journal: str = typer.Option(
+        None, help="Optional journal file to resume an interrupted rollout (completed targets are skipped)."
+    ),
+    cache: bool = typer.Option(
+        False, help="Optional local cache for source branding and images."
+    ),
+    cache_dir: str = typer.Option(
+        None, help="Optional cache directory (default is the user cache directory)."
+    ),
+    cache_size: int = typer.Option(
+        DEFAULT_CACHE_SIZE // (1024 * 1024), min=1, help="Maximum cache size in MB."
+    ),
+    optimize: bool = typer.Option(
+        False, help="Optional image optimization before upload (lossless recompression, metadata removed)."
+    ),
+    byte_budget: List[str] = typer.Option(
+        None,
+        help="Optional maximum image size as TYPE=KB (e.g. webSplashImage=500), larger images are compressed lossy (implies --optimize).",
+    ),
+    http2: bool = typer.Option(
+        False, help="Optional HTTP/2 for all connections (requires h2)."
+    ),
+    memory_budget: int = typer.Option(
+        DEFAULT_MEMORY_BUDGET // (1024 * 1024), min=1,
+        help="Maximum memory in MB buffered by image transfers in flight (further transfers wait).",
+    ),
+    profile: bool = typer.Option(
+        False, help="Optional timing summary of all phases (verify, auth, download, resize, upload, update)."
+    ),
+    trace_file: str = typer.Option(
+        None, help="Optional trace file of all phases (Chrome trace, JSON lines if name ends with .jsonl)."
+    ),
+):
+    """
+    Spray a source DRACOON branding to all DRACOON instances listed in a file.
+    Source images are downloaded once, targets use password flow with the same credentials.
+    Requires DRACOON config manager role for all targets.
+    """
+    from dcspray.util.branding import await_prefetch, read_targets, print_target_summary
+    from dcspray.util.auth import add_https_protocol
+    from dcspray.util.journal import RolloutJournal
+
+    async def _spray_many(dcspray: "DCSpray"):
+
+        parsed_source_url = await dcspray.verify_url(url=source_url)
+
+        target_urls = [add_https_protocol(url=url) for url in read_targets(targets_file)]
+
+        if not target_urls:
+            error_txt = typer.style("Error:", bg=typer.colors.RED, fg=typer.colors.WHITE)
+            typer.echo(f"{error_txt} No targets in {targets_file}.")
+            sys.exit(1)
+
+        # download source while prompting for credentials
+        prefetch = dcspray.prefetch_source(source_url=parsed_source_url, on_prem_source=on_prem_source)
+
+        username, password = await prompt_target_credentials(
+            target_urls=target_urls, client_id=client_id, token_store=dcspray.token_store
+        )
+
+        source = await await_prefetch(prefetch)
+
+        with RolloutJournal(journal) if journal else nullcontext() as rollout_journal:
+            results = await dcspray.spray_many(
+                source=source,
+                target_urls=target_urls,
+                username=username,
+                password=password,
+                incremental=incremental,
+                journal=rollout_journal,
             )
-        else:
-            dracoon = await auth_code_flow(
-                client_id=client_id, client_secret=client_secret, target_url=parsed_target_url
+
+        print_target_summary(results=results)
+
+        if not all(result.success for result in results):
+            sys.exit(1)
+
+    asyncio.run(
+        run_api(
+            _spray_many,
+            memory_budget=memory_budget,
+            profile=profile,
+            trace_file=trace_file,
+            client_id=client_id,
+            client_secret=client_secret,
+            token_store=init_token_store(token_store),
+            cache=init_cache(cache, cache_dir, cache_size),
+            optimization=init_optimization(optimize, byte_budget),
+            concurrency=concurrency,
+            workers=workers,
+            http2=http2,
+        )
+    )
+
+
+@app.command()
+def watch(
+    source_url: str = typer.Argument(
+        ..., help="Source DRACOON instance to watch for branding changes."
+    ),
+    targets_file: str = typer.Argument(
+        ..., help="File with target DRACOON instances (one url per line)."
+    ),
+    client_id: str = typer.Option(
+        "dracoon_legacy_scripting",
+        help="Optional client id of an OAuth app registered in target DRACOON instances.",
+    ),
+    client_secret: str = typer.Option(
+        None,
+        help="Optional client secret of an OAuth app registered in target DRACOON instances.",
+    ),
+    token_store: bool = typer.Option(
+        False, help="Optional encrypted token store to skip authentication prompts on later runs."
+    ),
+    on_prem_source: bool = typer.Option(
+        False,
+        help="Source branding is a on premises DRACOON installation using DRACOON Cloud branding.",
+    ),
+    interval: float = typer.Option(
+        DEFAULT_WATCH_INTERVAL, min=1, help="Seconds between polls of the source branding."
+    ),
+    jitter: float = typer.Option(
+        DEFAULT_WATCH_JITTER, min=0, max=1, help="Random deviation of the interval (fraction of the interval)."
+    ),
+    spray_on_start: bool = typer.Option(
+        False, help="Optional spray of the current source branding on start (default is first change only)."
+    ),
+    concurrency: int = typer.Option(
+        DEFAULT_CONCURRENCY,
+        min=1,
+        help="Maximum number of targets and image transfers in flight at once.",
+    ),
+    workers: int = typer.Option(
+        DEFAULT_WORKERS, min=1, help="Number of worker threads used to resize images."
+    ),
+    incremental: bool = typer.Option(
+        False, help="Optional incremental update (only changed images and branding are uploaded)."
+    ),
+    journal: str = typer.Option(
+        None, help="Optional journal file to skip targets already sprayed with the current branding."
+    ),
+    cache: bool = typer.Option(
+        False, help="Optional local cache for source branding and images."
+    ),
+    cache_dir: str = typer.Option(
+        None, help="Optional cache directory (default is the user cache directory)."
+    ),
+    cache_size: int = typer.Option(
+        DEFAULT_CACHE_SIZE // (1024 * 1024), min=1, help="Maximum cache size in MB."
+    ),
+    optimize: bool = typer.Option(
+        False, help="Optional image optimization before upload (lossless recompression, metadata removed)."
+    ),
+    byte_budget: List[str] = typer.Option(
+        None,
+        help="Optional maximum image size as TYPE=KB (e.g. webSplashImage=500), larger images are compressed lossy (implies --optimize).",
+    ),
+    http2: bool = typer.Option(
+        False, help="Optional HTTP/2 for all connections (requires h2)."
+    ),
+    memory_budget: int = typer.Option(
+        DEFAULT_MEMORY_BUDGET // (1024 * 1024), min=1,
+        help="Maximum memory in MB buffered by image transfers in flight (further transfers wait).",
+    ),
+    profile: bool = typer.Option(
+        False, help="Optional timing summary of all phases (verify, auth, download, resize, upload, update)."
+    ),
+    trace_file: str = typer.Option(
+        None, help="Optional trace file of all phases (Chrome trace, JSON lines if name ends with .jsonl)."
+    ),
+):
+    """
+    Watch a source DRACOON branding and spray it to all DRACOON instances listed in a file when it changes.
+    Polling an unchanged source costs a single request, runs until interrupted (Ctrl+C).
+    Requires DRACOON config manager role for all targets.
+    """
+    from dcspray.util.branding import read_targets
+    from dcspray.util.auth import add_https_protocol
+    from dcspray.util.journal import RolloutJournal
+
+    async def _watch(dcspray: "DCSpray"):
+
+        parsed_source_url = await dcspray.verify_url(url=source_url)
+
+        target_urls = [add_https_protocol(url=url) for url in read_targets(targets_file)]
+
+        if not target_urls:
+            error_txt = typer.style("Error:", bg=typer.colors.RED, fg=typer.colors.WHITE)
+            typer.echo(f"{error_txt} No targets in {targets_file}.")
+            sys.exit(1)
+
+        username, password = await prompt_target_credentials(
+            target_urls=target_urls, client_id=client_id, token_store=dcspray.token_store
+        )
+
+        with RolloutJournal(journal) if journal else nullcontext() as rollout_journal:
+            await dcspray.watch(
+                source_url=parsed_source_url,
+                target_urls=target_urls,
+                username=username,
+                password=password,
+                interval=interval,
+                jitter=jitter,
+                spray_on_start=spray_on_start,
+                on_prem_source=on_prem_source,
+                incremental=incremental,
+                journal=rollout_journal,
             )
-        
-        await spray_branding(source_url=parsed_source_url, target_dracoon=dracoon)
 
-    asyncio.run(_spray())
+    try:
+        asyncio.run(
+            run_api(
+                _watch,
+                memory_budget=memory_budget,
+                profile=profile,
+                trace_file=trace_file,
+                client_id=client_id,
+                client_secret=client_secret,
+                token_store=init_token_store(token_store),
+                cache=init_cache(cache, cache_dir, cache_size),
+                optimization=init_optimization(optimize, byte_budget),
+                concurrency=concurrency,
+                workers=workers,
+                http2=http2,
+            )
+        )
+    except KeyboardInterrupt:
+        typer.echo("Stopped watching.")
 
 
 @app.command()
@@ -90,26 +537,158 @@ def save(
         False,
         help="Source branding is a on premises DRACOON installation using DRACOON Cloud branding.",
     ),
+    concurrency: int = typer.Option(
+        DEFAULT_CONCURRENCY, min=1, help="Maximum number of concurrent image downloads."
+    ),
+    workers: int = typer.Option(
+        DEFAULT_WORKERS, min=1, help="Number of worker threads used to resize images."
+    ),
+    cache: bool = typer.Option(
+        False, help="Optional local cache for source branding and images."
+    ),
+    cache_dir: str = typer.Option(
+        None, help="Optional cache directory (default is the user cache directory)."
+    ),
+    cache_size: int = typer.Option(
+        DEFAULT_CACHE_SIZE // (1024 * 1024), min=1, help="Maximum cache size in MB."
+    ),
+    optimize: bool = typer.Option(
+        False, help="Optional image optimization before saving (lossless recompression, metadata removed)."
+    ),
+    byte_budget: List[str] = typer.Option(
+        None,
+        help="Optional maximum image size as TYPE=KB (e.g. webSplashImage=500), larger images are compressed lossy (implies --optimize).",
+    ),
+    http2: bool = typer.Option(
+        False, help="Optional HTTP/2 for all connections (requires h2)."
+    ),
+    memory_budget: int = typer.Option(
+        DEFAULT_MEMORY_BUDGET // (1024 * 1024), min=1,
+        help="Maximum memory in MB buffered by image transfers in flight (further transfers wait).",
+    ),
+    profile: bool = typer.Option(
+        False, help="Optional timing summary of all phases (verify, auth, download, resize, upload, update)."
+    ),
+    trace_file: str = typer.Option(
+        None, help="Optional trace file of all phases (Chrome trace, JSON lines if name ends with .jsonl)."
+    ),
 ):
     """
     Downloads a DRACOON branding as a zip file containing all required images and JSON payload.
     """
+    async def _save(dcspray: "DCSpray"):
+        parsed_source_url = await dcspray.verify_url(url=source_url)
+        await dcspray.save(source_url=parsed_source_url, zip_name=zip_name, on_prem_source=on_prem_source)
+
+    asyncio.run(
+        run_api(
+            _save,
+            memory_budget=memory_budget,
+            profile=profile,
+            trace_file=trace_file,
+            cache=init_cache(cache, cache_dir, cache_size),
+            optimization=init_optimization(optimize, byte_budget),
+            concurrency=concurrency,
+            workers=workers,
+            http2=http2,
+        )
+    )
 
-    async def _save():
-        parsed_source_url = add_https_protocol(url=source_url)
-        await verify_dracoon_url(url=parsed_source_url)
-        await zip_branding(parsed_source_url, zip_name, on_prem_source)
 
-    asyncio.run(_save())
+@app.command()
+def save_many(
+    sources_file: str = typer.Argument(
+        ..., help="File with source DRACOON instances (one url per line)."
+    ),
+    zip_name: str = typer.Argument(
+        "snapshot.zip", help="Optional zip file name and path."
+    ),
+    on_prem_source: bool = typer.Option(
+        False,
+        help="Sources are on premises DRACOON installations using DRACOON Cloud branding.",
+    ),
+    concurrency: int = typer.Option(
+        DEFAULT_CONCURRENCY,
+        min=1,
+        help="Maximum number of sources and image downloads in flight at once.",
+    ),
+    workers: int = typer.Option(
+        DEFAULT_WORKERS, min=1, help="Number of worker threads used to resize images."
+    ),
+    cache: bool = typer.Option(
+        False, help="Optional local cache for source branding and images."
+    ),
+    cache_dir: str = typer.Option(
+        None, help="Optional cache directory (default is the user cache directory)."
+    ),
+    cache_size: int = typer.Option(
+        DEFAULT_CACHE_SIZE // (1024 * 1024), min=1, help="Maximum cache size in MB."
+    ),
+    optimize: bool = typer.Option(
+        False, help="Optional image optimization before saving (lossless recompression, metadata removed)."
+    ),
+    byte_budget: List[str] = typer.Option(
+        None,
+        help="Optional maximum image size as TYPE=KB (e.g. webSplashImage=500), larger images are compressed lossy (implies --optimize).",
+    ),
+    http2: bool = typer.Option(
+        False, help="Optional HTTP/2 for all connections (requires h2)."
+    ),
+    memory_budget: int = typer.Option(
+        DEFAULT_MEMORY_BUDGET // (1024 * 1024), min=1,
+        help="Maximum memory in MB buffered by image transfers in flight (further transfers wait).",
+    ),
+    profile: bool = typer.Option(
+        False, help="Optional timing summary of all phases (verify, auth, download, resize, upload, update)."
+    ),
+    trace_file: str = typer.Option(
+        None, help="Optional trace file of all phases (Chrome trace, JSON lines if name ends with .jsonl)."
+    ),
+):
+    """
+    Downloads brandings of all DRACOON instances listed in a file into a single snapshot zip file.
+    Identical images are stored once, every source has its own manifest.
+    """
+    from dcspray.util.branding import read_targets, print_target_summary
+
+    async def _save_many(dcspray: "DCSpray"):
+
+        source_urls = read_targets(sources_file)
+
+        if not source_urls:
+            error_txt = typer.style("Error:", bg=typer.colors.RED, fg=typer.colors.WHITE)
+            typer.echo(f"{error_txt} No sources in {sources_file}.")
+            sys.exit(1)
+
+        results = await dcspray.save_many(source_urls=source_urls, zip_name=zip_name, on_prem_source=on_prem_source)
+
+        print_target_summary(results=results, summary="sources saved")
+
+        if not all(result.success for result in results):
+            sys.exit(1)
+
+    asyncio.run(
+        run_api(
+            _save_many,
+            memory_budget=memory_budget,
+            profile=profile,
+            trace_file=trace_file,
+            cache=init_cache(cache, cache_dir, cache_size),
+            optimization=init_optimization(optimize, byte_budget),
+            concurrency=concurrency,
+            workers=workers,
+            http2=http2,
+        )
+    )
 
 
 @app.command()
 def load(
     zip_file: str = typer.Argument(
-        ..., help="Zip file with DRACOON branding to upload."
+        ..., help="Zip file with DRACOON branding to upload (or directory of zip files to check)."
     ),
     target_url: str = typer.Argument(
-        ..., help="Target DRACOON instance to upload branding to."
+        None, help="Target DRACOON instance to upload branding to (not required to check only)."
     ),
     client_id: str = typer.Option(
         "dracoon_legacy_scripting",
@@ -122,35 +701,95 @@ def load(
     auth_code: bool = typer.Option(
         False, help="Optional authorization code flow for given client id and secret."
     ),
+    token_store: bool = typer.Option(
+        False, help="Optional encrypted token store to skip authentication prompts on later runs."
+    ),
+    source: str = typer.Option(
+        None, help="Optional source url of the branding to upload (required if the zip file is a snapshot of several sources)."
+    ),
+    concurrency: int = typer.Option(
+        DEFAULT_CONCURRENCY, min=1, help="Maximum number of concurrent image uploads."
+    ),
+    workers: int = typer.Option(
+        DEFAULT_WORKERS, min=1, help="Number of worker threads used to check images."
+    ),
+    incremental: bool = typer.Option(
+        False, help="Optional incremental update (only changed images and branding are uploaded)."
+    ),
+    check_only: bool = typer.Option(
+        False, help="Optional check of zip files (format, payload and images) without upload."
+    ),
+    http2: bool = typer.Option(
+        False, help="Optional HTTP/2 for all connections (requires h2)."
+    ),
+    memory_budget: int = typer.Option(
+        DEFAULT_MEMORY_BUDGET // (1024 * 1024), min=1,
+        help="Maximum memory in MB buffered by image transfers in flight (further transfers wait).",
+    ),
+    profile: bool = typer.Option(
+        False, help="Optional timing summary of all phases (verify, auth, download, resize, upload, update)."
+    ),
+    trace_file: str = typer.Option(
+        None, help="Optional trace file of all phases (Chrome trace, JSON lines if name ends with .jsonl)."
+    ),
 ):
     """
     Uploads a DRACOON branding from a zip file to a target DRACOON instance.
+    The zip file is checked before the first request.
     """
+    from dcspray.util.branding import print_target_summary
+
+    if check_only or not target_url:
+        if not check_only:
+            error_txt = typer.style("Error:", bg=typer.colors.RED, fg=typer.colors.WHITE)
+            typer.echo(f"{error_txt} Target url required (or use --check-only).")
+            sys.exit(1)
 
-    async def _load(auth_code: bool = False):
+        zip_files = [zip_file]
+        if os.path.isdir(zip_file):
+            zip_files = sorted(
+                entry.path for entry in os.scandir(zip_file) if entry.name.lower().endswith(".zip")
+            )
 
-        parsed_target_url = add_https_protocol(url=target_url)
-        await verify_dracoon_url(url=parsed_target_url)
+        results = asyncio.run(
+            run_api(lambda dcspray: dcspray.check(zip_files=zip_files, source_url=source), workers=workers)
+        )
+        print_target_summary(results=results, summary="zip files valid")
 
-        # use password flow if not client secret provided
-        if client_secret == None:
-            auth_code = False
-            typer.echo("No client secret provided.")
-            typer.echo(" Using password flow.")
+        if not all(result.success for result in results):
+            sys.exit(1)
+        return
 
-        # use password flow as default
-        if not auth_code:
-            dracoon = await password_flow(
-                client_id=client_id, client_secret=client_secret, target_url=parsed_target_url
-            )
-        else:
-            dracoon = await auth_code_flow(
-                client_id=client_id, client_secret=client_secret, target_url=parsed_target_url
-            )
+    async def _load(dcspray: "DCSpray"):
+        login = interactive_login(dcspray, auth_code=auth_code)
+
+        async def _connect(target_url: str) -> "DRACOON":
+            await dcspray.verify_url(url=target_url)
+            return await login(target_url)
 
-        await load_from_zip(dracoon=dracoon, zip_file=zip_file)
+        # invalid zip files fail before any request (and authentication prompt)
+        await dcspray.load(
+            zip_file=zip_file,
+            target_url=target_url,
+            source_url=source,
+            incremental=incremental,
+            connect=_connect,
+        )
 
-    asyncio.run(_load(auth_code=auth_code))
+    asyncio.run(
+        run_api(
+            _load,
+            memory_budget=memory_budget,
+            profile=profile,
+            trace_file=trace_file,
+            client_id=client_id,
+            client_secret=client_secret,
+            token_store=init_token_store(token_store),
+            concurrency=concurrency,
+            workers=workers,
+            http2=http2,
+        )
+    )
 
 
 # run main function
@@ -1,12 +1,34 @@
+import asyncio
 import sys
+import threading
+import weakref
+from datetime import datetime
 
 from urllib.parse import urlparse
 
 import typer
 from httpx import ConnectError, HTTPStatusError
 from dracoon import DRACOON, OAuth2ConnectionType
+from dracoon.client import DRACOONClient
 from dracoon.errors import HTTPUnauthorizedError, DRACOONHttpError, HTTPNotFoundError
 
+from dcspray.util.errors import AuthenticationFailedError, InvalidDRACOONUrlError
+from dcspray.util.pool import ConnectionPool, init_dracoon
+from dcspray.util.profiling import span
+from dcspray.util.tokens import TokenStore
+
+try:
+    import termios
+except ImportError:
+    # Windows
+    termios = None
+
+# access tokens are refreshed if they expire within this time (seconds)
+TOKEN_REFRESH_MARGIN = 300
+
+# one refresh at a time per client - a rotated refresh token can only be used once
+_refresh_locks: "weakref.WeakKeyDictionary[DRACOONClient, asyncio.Lock]" = weakref.WeakKeyDictionary()
+
 
 def add_https_protocol(url: str) -> str:
 
@@ -20,81 +42,217 @@ def add_https_protocol(url: str) -> str:
 
     return url
 
-async def verify_dracoon_url(url: str):
+async def prompt_in_background(text: str, **kwargs) -> str:
+    """
+    prompt in a daemon thread so that background tasks (e.g. source prefetch) keep running
+    on Ctrl+C the thread is abandoned (a thread of the default executor would block shutdown until input)
+    """
+
+    loop = asyncio.get_running_loop()
+    answer = loop.create_future()
+
+    def _set_answer(value: str, err: BaseException):
+        if answer.done():
+            return
+        if err:
+            answer.set_exception(err)
+        else:
+            answer.set_result(value)
+
+    def _prompt():
+        value, err = None, None
+        try:
+            value = typer.prompt(text, **kwargs)
+        except BaseException as prompt_err:
+            err = prompt_err
+        try:
+            loop.call_soon_threadsafe(_set_answer, value, err)
+        except RuntimeError:
+            # loop closed (interrupted)
+            pass
 
-    dracoon = DRACOON(base_url=url)
+    # hidden input turns off terminal echo - restored if the prompt is abandoned
+    tty_attrs = termios.tcgetattr(sys.stdin) if termios and sys.stdin.isatty() else None
+
+    threading.Thread(target=_prompt, daemon=True).start()
+
+    try:
+        return await answer
+    except asyncio.CancelledError:
+        if tty_attrs:
+            termios.tcsetattr(sys.stdin, termios.TCSADRAIN, tty_attrs)
+        raise
+
+
+async def verify_dracoon_url(url: str, pool: ConnectionPool = None):
+
+    dracoon = await init_dracoon(base_url=url, pool=pool)
 
     test_url = f"{url}/api/v4/public/software/version"
 
     try:
-        response = await dracoon.client.downloader.get(url=test_url)
-        response.raise_for_status()
-    except ConnectError:
-        error_txt = typer.style('Error:', bg=typer.colors.RED, fg=typer.colors.WHITE)
-        typer.echo(f'{error_txt} Authentication error: {url} is not a valid DRACOON url.')
-        await dracoon.client.disconnect()
-        sys.exit(1)
-    except HTTPStatusError as err:
-        error_txt = typer.style('Error:', bg=typer.colors.RED, fg=typer.colors.WHITE)
-        typer.echo(f'{error_txt} Authentication error: {url} is not a valid DRACOON url.')
+        with span("verify_dracoon_url", url=url):
+            response = await dracoon.client.downloader.get(url=test_url)
+            response.raise_for_status()
+    except (ConnectError, HTTPStatusError) as err:
         await dracoon.client.disconnect()
-        sys.exit(1)
+        raise InvalidDRACOONUrlError(f'Authentication error: {url} is not a valid DRACOON url.') from err
 
 
-    
-async def password_flow(target_url: str, client_id: str, client_secret: str = None) -> DRACOON:
+def store_rotated_tokens(dracoon: DRACOON, token_store: TokenStore, target_url: str, client_id: str):
+    """ write the refresh token back to the store after every connect or refresh (refresh tokens are rotated) """
+
+    connect = dracoon.client.connect
+
+    async def _connect(*args, **kwargs):
+        connection = await connect(*args, **kwargs)
+        token_store.put(target_url=target_url, client_id=client_id, connection=dracoon.client.connection)
+        return connection
+
+    dracoon.client.connect = _connect
+
+
+async def refresh_expiring_token(client: DRACOONClient, margin: float = TOKEN_REFRESH_MARGIN):
+    """ refresh the access token before it expires (no-op for public clients) """
+
+    if not client.connection or not client.connection.refresh_token:
+        return
+
+    def _expires_soon() -> bool:
+        connection = client.connection
+        age = (datetime.now() - connection.connected_at).total_seconds()
+        return age > connection.access_token_validity - margin
+
+    if not _expires_soon():
+        return
+
+    lock = _refresh_locks.setdefault(client, asyncio.Lock())
+    async with lock:
+        # refreshed while waiting
+        if not _expires_soon():
+            return
+        with span("authenticate", url=client.base_url, flow="refresh_token"):
+            await client.connect(OAuth2ConnectionType.refresh_token)
+
+
+def make_auth_error(err: DRACOONHttpError, target_url: str, credentials: str = 'credentials') -> AuthenticationFailedError:
+    """ typed error of a failed authentication """
+
+    status_code = err.error.response.status_code
 
-    username = typer.prompt('Please enter username')
-    password = typer.prompt('Please enter password', hide_input=True)
+    if isinstance(err, HTTPUnauthorizedError):
+        return AuthenticationFailedError(f'Unauthorized (wrong {credentials} / client?): {status_code}', status_code)
+    if isinstance(err, HTTPNotFoundError):
+        return AuthenticationFailedError(f'Authentication error: {target_url} is not a valid DRACOON url.', status_code)
+
+    return AuthenticationFailedError(f'Authentication error: {status_code}', status_code)
 
-    if client_secret:
-        dracoon = DRACOON(base_url=target_url, client_id=client_id, client_secret=client_secret, raise_on_err=True)
     
-    dracoon = DRACOON(base_url=target_url, raise_on_err=True)
+async def connect_stored_token(target_url: str, client_id: str, client_secret: str = None,
+                               token_store: TokenStore = None, pool: ConnectionPool = None) -> DRACOON:
+    """ authenticate via a stored refresh token - returns None if no (valid) token is stored """
+
+    token = token_store.get(target_url=target_url, client_id=client_id) if token_store else None
+
+    if not token:
+        return None
+
+    dracoon = await init_dracoon(base_url=target_url, pool=pool, client_id=client_id, client_secret=client_secret or "",
+                                 raise_on_err=True)
+    store_rotated_tokens(dracoon, token_store=token_store, target_url=target_url, client_id=client_id)
 
     try:
-        await dracoon.connect(connection_type=OAuth2ConnectionType.password_flow, username=username, password=password)
-    except HTTPUnauthorizedError as err:
-        error_txt = typer.style('Error:', bg=typer.colors.RED, fg=typer.colors.WHITE)
-        typer.echo(f'{error_txt} Unauthorized (wrong credentials / client?): {err.error.response.status_code}')
+        # single token request - no full login required
+        with span("authenticate", url=target_url, flow="refresh_token"):
+            await dracoon.client.connect(connection_type=OAuth2ConnectionType.refresh_token,
+                                         refresh_token=token.refresh_token)
+    except DRACOONHttpError:
+        # refresh token expired or revoked
+        token_store.remove(target_url=target_url, client_id=client_id)
         await dracoon.client.disconnect()
-        sys.exit(1)
-    except HTTPNotFoundError as err:
-        error_txt = typer.style('Error:', bg=typer.colors.RED, fg=typer.colors.WHITE)
-        typer.echo(f'{error_txt} Authentication error: {target_url} is not a valid DRACOON url.')
-        await dracoon.client.disconnect()
-        sys.exit(1)
+        return None
+
+    return dracoon
+
+
+async def connect_password_flow(target_url: str, username: str, password: str, client_id: str = "dracoon_legacy_scripting",
+                                client_secret: str = None, pool: ConnectionPool = None,
+                                token_store: TokenStore = None) -> DRACOON:
+    """ authenticate via password flow without prompts - raises AuthenticationFailedError """
+
+    dracoon = await init_dracoon(base_url=target_url, pool=pool, client_id=client_id, client_secret=client_secret or "",
+                                 raise_on_err=True)
+    if token_store:
+        store_rotated_tokens(dracoon, token_store=token_store, target_url=target_url, client_id=client_id)
+
+    try:
+        with span("authenticate", url=target_url, flow="password"):
+            await dracoon.connect(connection_type=OAuth2ConnectionType.password_flow, username=username, password=password)
     except DRACOONHttpError as err:
-        error_txt = typer.style('Error:', bg=typer.colors.RED, fg=typer.colors.WHITE)
-        typer.echo(f'{error_txt} Authentication errror: {err.error.response.status_code}')
         await dracoon.client.disconnect()
-        sys.exit(1)
+        raise make_auth_error(err, target_url=target_url) from err
+
+    return dracoon
+
+
+async def connect_target(target_url: str, username: str = None, password: str = None,
+                         client_id: str = "dracoon_legacy_scripting", client_secret: str = None,
+                         pool: ConnectionPool = None, token_store: TokenStore = None) -> DRACOON:
+    """ authenticate via stored token or password flow without prompts (e.g. many targets) - raises on error """
+
+    dracoon = await connect_stored_token(target_url=target_url, client_id=client_id, client_secret=client_secret,
+                                         token_store=token_store, pool=pool)
+    if dracoon:
+        return dracoon
+
+    if username is None:
+        raise ValueError("Stored token no longer valid - credentials required.")
+
+    return await connect_password_flow(target_url=target_url, username=username, password=password,
+                                       client_id=client_id, client_secret=client_secret, pool=pool,
+                                       token_store=token_store)
+
+
+async def password_flow(target_url: str, client_id: str, client_secret: str = None, pool: ConnectionPool = None,
+                        token_store: TokenStore = None) -> DRACOON:
+
+    # no prompt if a stored token is valid
+    dracoon = await connect_stored_token(target_url=target_url, client_id=client_id, client_secret=client_secret,
+                                         token_store=token_store, pool=pool)
+    if dracoon:
+        return dracoon
+
+    # prompt in background so that background tasks (e.g. source prefetch) keep running
+    username = await prompt_in_background('Please enter username')
+    password = await prompt_in_background('Please enter password', hide_input=True)
+
+    dracoon = await connect_password_flow(target_url=target_url, username=username, password=password,
+                                          client_id=client_id, client_secret=client_secret, pool=pool,
+                                          token_store=token_store)
 
     return dracoon
     
-async def auth_code_flow(client_id: str,  client_secret: str, target_url: str) -> DRACOON:
-    """ authenticate via authorization code """
-    dracoon = DRACOON(base_url=target_url, client_id=client_id, client_secret=client_secret, raise_on_err=True)
+async def auth_code_flow(client_id: str,  client_secret: str, target_url: str, pool: ConnectionPool = None,
+                         token_store: TokenStore = None) -> DRACOON:
+    """ authenticate via authorization code (no prompt if a stored token is valid) """
+    dracoon = await connect_stored_token(target_url=target_url, client_id=client_id, client_secret=client_secret,
+                                         token_store=token_store, pool=pool)
+    if dracoon:
+        return dracoon
+
+    dracoon = await init_dracoon(base_url=target_url, pool=pool, client_id=client_id, client_secret=client_secret,
+                                 raise_on_err=True)
+    if token_store:
+        store_rotated_tokens(dracoon, token_store=token_store, target_url=target_url, client_id=client_id)
 
     typer.launch(dracoon.get_code_url())
-    auth_code = typer.prompt('Paste authorization code')
+    auth_code = await prompt_in_background('Paste authorization code')
     
     try:
-        await dracoon.connect(auth_code=auth_code)
-    except HTTPUnauthorizedError as err:
-        error_txt = typer.style('Error:', bg=typer.colors.RED, fg=typer.colors.WHITE)
-        typer.echo(f'{error_txt} Unauthorized (wrong code / client?): {err.error.response.status_code}')
-        await dracoon.client.disconnect()
-        sys.exit(1)
-    except HTTPNotFoundError as err:
-        error_txt = typer.style('Error:', bg=typer.colors.RED, fg=typer.colors.WHITE)
-        typer.echo(f'{error_txt} Authentication error: {target_url} is not a valid DRACOON url.')
-        await dracoon.client.disconnect()
-        sys.exit(1)
+        with span("authenticate", url=target_url, flow="authorization_code"):
+            await dracoon.connect(auth_code=auth_code)
     except DRACOONHttpError as err:
-        error_txt = typer.style('Error:', bg=typer.colors.RED, fg=typer.colors.WHITE)
-        typer.echo(f'{error_txt} Authentication errror: {err.error.response.status_code}')
         await dracoon.client.disconnect()
-        sys.exit(1)
+        raise make_auth_error(err, target_url=target_url, credentials='code') from err
 
     return dracoon
@@ -1,24 +1,68 @@
+import asyncio
+import copy
+import io
 import json
+import math
 import os
-import sys
+import random
 from pathlib import Path
 import zipfile
 import re
-from typing import List, Any
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import IO, Dict, List, Any, Awaitable, Callable, Tuple, Union
 from dataclasses import dataclass
 
+import httpx
 import typer
 
 
-from PIL import Image
 from pydantic import ValidationError
-from resizeimage import resizeimage
 
 from dracoon import DRACOON
-from dracoon.errors import InvalidArgumentError, HTTPForbiddenError, DRACOONHttpError
-from dracoon.branding.responses import CacheableBrandingResponse, ImageType, ImageSize
+from dracoon.client import OAuth2ConnectionType
+from dracoon.errors import (
+    InvalidArgumentError,
+    HTTPForbiddenError,
+    HTTPBadRequestError,
+    HTTPNotFoundError,
+    DRACOONHttpError,
+)
+from dracoon.branding.responses import (
+    CacheableBrandingResponse,
+    ImageType,
+    ImageSize,
+    Upload,
+    UpdateBrandingResponse,
+)
 from dracoon.branding.models import UpdateBrandingRequest, SimpleImageRequest
 
+from dcspray.util.defaults import (
+    DEFAULT_CONCURRENCY,
+    DEFAULT_WORKERS,
+    DEFAULT_WATCH_INTERVAL,
+    DEFAULT_WATCH_JITTER,
+)
+from dcspray.util.auth import refresh_expiring_token
+from dcspray.util.pool import ConnectionPool, get_memory_budget, init_dracoon
+from dcspray.util.cache import BrandingCache, CachedImage, ResizeMemo, hash_content, hash_stream
+from dcspray.util.journal import RolloutJournal, TargetJournal
+from dcspray.util.optimize import ImageOptimization, optimize_image_bytes
+from dcspray.util.errors import (
+    DCSprayError,
+    InvalidArchiveError,
+    SourceBrandingError,
+    TargetBrandingError,
+    VerificationFailedError,
+)
+from dcspray.util.snapshot import SnapshotReader, SnapshotWriter
+from dcspray.util.profiling import span
+from dcspray.util.retry import retry_call
+from dcspray.util.transfer import (
+    TRANSFER_BUFFER_SIZE,
+    stream_download,
+)
+from dcspray.util.uploads import TargetUploads, UploadRegistry
+
 
 BRANDING_IMAGES = [
     img_type
@@ -26,39 +70,154 @@ BRANDING_IMAGES = [
     if img_type != ImageType.FAV_ICON and img_type != ImageType.INGREDIENT_LOGO
 ]
 RESIZE_IMAGES = [ImageType.APP_LOGO, ImageType.WEB_LOGO]
+# target dimensions (width, height) of resized images
+RESIZE_DIMENSIONS = {
+    ImageType.WEB_LOGO: (1136, 440),
+    ImageType.APP_LOGO: (1900, 1900),
+}
+# reduce (integer factor) until the image is this factor larger than the target before resampling
+RESIZE_REDUCING_GAP = 2.0
+# resized images of this process (in memory) - a cache keeps them across runs
+resize_memo = ResizeMemo()
+# formats of resized images (transparent canvas) - others (e.g. JPEG) are written as PNG
+ALPHA_FORMATS = ["PNG", "WEBP", "GIF"]
+# image formats stored without compression in zip files
+COMPRESSED_FORMATS = [".png", ".jpeg", ".jpg", ".gif", ".webp"]
 
 
 @dataclass
 class ImageDownload:
     file_path: str
     image_type: ImageType
+    # image bytes if held in memory (file_path is used as file name only)
+    content: bytes = None
+    # zip file containing the image (file_path is the member name unless member is set)
+    archive: zipfile.ZipFile = None
+    # size before optimization (only set for optimized images)
+    original_size: int = None
+    # archive member if stored under a different name (archive v2: content hash)
+    member: str = None
+
+    def open(self) -> IO[bytes]:
+        """open image for (streamed) reading"""
+        if self.content is not None:
+            return io.BytesIO(self.content)
+        if self.archive:
+            return self.archive.open(self.member or self.file_path)
+        return open(self.file_path, "rb")
+
+    @property
+    def size(self) -> int:
+        """image size in bytes (without reading the image)"""
+        if self.content is not None:
+            return len(self.content)
+        if self.archive:
+            return self.archive.getinfo(self.member or self.file_path).file_size
+        return os.path.getsize(self.file_path)
+
+    def hash(self) -> str:
+        """SHA-256 of the image content"""
+        with self.open() as content:
+            return hash_stream(content)
+
+
+@dataclass
+class BrandingDiff:
+    # current target branding as update payload
+    current: UpdateBrandingRequest
+    changed_images: List[ImageDownload]
+    # image requests of target images uploaded from identical content
+    unchanged_images: Dict[ImageType, SimpleImageRequest]
+
+    def merge_image_reqs(
+        self, images: List[ImageDownload], uploaded: List[SimpleImageRequest]
+    ) -> List[SimpleImageRequest]:
+        """image requests for all images (in order of images)"""
+        uploaded_reqs = {
+            img.image_type: image_req
+            for img, image_req in zip(self.changed_images, uploaded)
+        }
+        return [
+            uploaded_reqs.get(img.image_type) or self.unchanged_images[img.image_type]
+            for img in images
+        ]
+
+    def is_up_to_date(self, payload: UpdateBrandingRequest) -> bool:
+        return not self.changed_images and payload_equals(payload, self.current)
+
+
+# public source branding and its (resized) images
+SourceBranding = Tuple[CacheableBrandingResponse, List[ImageDownload]]
+
+
+@dataclass
+class TargetResult:
+    target_url: str
+    success: bool
+    error: str = None
+    # already complete in a previous run (journal)
+    skipped: bool = False
 
 
 async def get_branding(dracoon: DRACOON) -> CacheableBrandingResponse:
     """get a public branding from a DRACOON instance"""
 
     try:
-        branding = await dracoon.public.branding.get_public_branding()
+        with span("get_branding", url=dracoon.client.base_url):
+            branding = await dracoon.public.branding.get_public_branding()
     except DRACOONHttpError as err:
-        error_txt = typer.style("Error:", bg=typer.colors.RED, fg=typer.colors.WHITE)
-        typer.echo(
-            f"{error_txt} Getting branding failed: {err.error.response.status_code}"
-        )
         await dracoon.client.disconnect()
-        sys.exit(1)
-    except ValidationError:
-        error_txt = typer.style("Error:", bg=typer.colors.RED, fg=typer.colors.WHITE)
-        typer.echo(
-            f"{error_txt} Getting branding failed: Invalid DRACOON version."
-        )
+        status_code = err.error.response.status_code
+        raise SourceBrandingError(f"Getting branding failed: {status_code}", status_code=status_code) from err
+    except ValidationError as err:
         await dracoon.client.disconnect()
-        sys.exit(1)
-
+        raise SourceBrandingError("Getting branding failed: Invalid DRACOON version.") from err
 
     return branding
 
 
-def init_public_dracoon(url: str, on_prem_source: bool = False) -> DRACOON:
+async def get_branding_revalidated(
+    dracoon: DRACOON, etag: str = None, last_modified: str = None
+) -> Tuple[CacheableBrandingResponse, str, str]:
+    """
+    get a public branding using a conditional request
+    returns no branding if not modified (HTTP 304) and the response validators
+    """
+
+    client = dracoon.client
+    api_url = f"{client.base_url}{client.branding_base_url}/v1/public/branding"
+
+    headers = {}
+    if etag:
+        headers["If-None-Match"] = etag
+    if last_modified:
+        headers["If-Modified-Since"] = last_modified
+
+    try:
+        with span("get_branding", url=client.base_url, conditional=True) as get_span:
+            res = await client.http.get(api_url, headers=headers)
+            get_span.bytes = len(res.content)
+        if res.status_code == 304:
+            return None, etag, last_modified
+        res.raise_for_status()
+        branding = CacheableBrandingResponse(**res.json())
+    except httpx.RequestError as err:
+        await client.disconnect()
+        raise SourceBrandingError(f"Getting branding failed: {format_error(err)}") from err
+    except httpx.HTTPStatusError as err:
+        await client.disconnect()
+        status_code = err.response.status_code
+        raise SourceBrandingError(f"Getting branding failed: {status_code}", status_code=status_code) from err
+    except ValidationError as err:
+        await client.disconnect()
+        raise SourceBrandingError("Getting branding failed: Invalid DRACOON version.") from err
+
+    return branding, res.headers.get("etag"), res.headers.get("last-modified")
+
+
+async def init_public_dracoon(
+    url: str, on_prem_source: bool = False, pool: ConnectionPool = None
+) -> DRACOON:
     """get instance of a public DRACOON url to access public branding info"""
 
     dracoon_url = "https://dracoon.team"
@@ -71,7 +230,7 @@ def init_public_dracoon(url: str, on_prem_source: bool = False) -> DRACOON:
         header_url = url
         url = dracoon_url
 
-    dracoon = DRACOON(base_url=url, raise_on_err=True)
+    dracoon = await init_dracoon(base_url=url, pool=pool, raise_on_err=True)
 
     if on_prem_source:
         dracoon.client.http.headers["Host"] = header_url
@@ -79,56 +238,330 @@ def init_public_dracoon(url: str, on_prem_source: bool = False) -> DRACOON:
     return dracoon
 
 
-async def download_images(dracoon: DRACOON, path: str = None) -> List[ImageDownload]:
-    """download all branding images required for a branding"""
+async def gather_or_cancel(aws: List[Awaitable]) -> List[Any]:
+    """run awaitables concurrently - cancel all pending ones on first error"""
 
-    image_downloads: List[ImageDownload] = []
+    tasks = [asyncio.ensure_future(aw) for aw in aws]
 
-    with typer.progressbar(
-        BRANDING_IMAGES, len(BRANDING_IMAGES), label="Downloading branding images"
+    try:
+        return await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
+
+
+async def download_image(
+    dracoon: DRACOON,
+    img_type: ImageType,
+    semaphore: asyncio.Semaphore,
+    pool: ConnectionPool = None,
+) -> ImageDownload:
+    """download a single branding image (large) chunk by chunk within the memory budget of the pool"""
+
+    client = dracoon.client
+    api_url = (
+        f"{client.base_url}{client.branding_base_url}"
+        f"/v1/public/branding/files/{img_type.value}/{ImageSize.LARGE.value}"
+    )
+    content = bytearray()
+
+    async with semaphore:
+        with span("download_image", image_type=img_type.value) as download_span:
+            try:
+                res = await stream_download(
+                    http=client.http, url=api_url, write=content.extend, budget=get_memory_budget(pool)
+                )
+            except httpx.HTTPStatusError as err:
+                await client.handle_http_error(err=err, raise_on_err=True)
+            download_span.bytes = len(content)
+
+    file_ending = get_file_ending(content_type=res.headers["content-type"])
+    file_name = f"{img_type.value}_large.{file_ending}"
+
+    return ImageDownload(file_path=file_name, image_type=img_type, content=bytes(content))
+
+
+async def resize_image_async(
+    content: bytes, img_type: ImageType, executor: Executor, memo: ResizeMemo = None
+) -> bytes:
+    """
+    resize image bytes in a worker pool without blocking the event loop
+    images resized before (same content and dimensions) are taken from the memo
+    """
+
+    loop = asyncio.get_running_loop()
+    memo = memo or resize_memo
+
+    if img_type not in RESIZE_DIMENSIONS:
+        raise InvalidArgumentError("Resizing only required for app / web logo.")
+
+    key = ResizeMemo.make_key(hash_content(content), *RESIZE_DIMENSIONS[img_type])
+
+    with span("resize_image", image_type=img_type.value, source_bytes=len(content)) as resize_span:
+        resized = memo.get(key)
+        resize_span.attributes["memoized"] = str(resized is not None)
+
+        if resized is None:
+            resized = await loop.run_in_executor(executor, resize_image_bytes, content, img_type)
+            memo.put(key, resized)
+
+        resize_span.bytes = len(resized)
+
+    return resized
+
+
+async def optimize_image_async(
+    content: bytes, img_type: ImageType, budget: int, executor: Executor
+) -> bytes:
+    """optimize image bytes in a worker pool without blocking the event loop"""
+
+    loop = asyncio.get_running_loop()
+
+    with span("optimize_image", image_type=img_type.value, source_bytes=len(content)) as optimize_span:
+        optimized = await loop.run_in_executor(executor, optimize_image_bytes, content, budget)
+        optimize_span.bytes = len(optimized)
+
+    return optimized
+
+
+def print_optimization_summary(images: List[ImageDownload]):
+    """print bytes saved by optimizing images (per target)"""
+
+    optimized = [img for img in images if img.original_size is not None]
+
+    if not optimized:
+        return
+
+    original_size = sum(img.original_size for img in optimized)
+    saved = original_size - sum(img.size for img in optimized)
+    typer.echo(
+        f"Optimized images: {saved} bytes saved per upload ({saved / original_size:.0%})."
+    )
+
+
+async def download_images(
+    dracoon: DRACOON,
+    path: str = None,
+    concurrency: int = DEFAULT_CONCURRENCY,
+    workers: int = DEFAULT_WORKERS,
+    on_download: Callable[[ImageDownload], None] = None,
+    quiet: bool = False,
+    optimization: ImageOptimization = None,
+    memo: ResizeMemo = None,
+    semaphore: asyncio.Semaphore = None,
+    pool: ConnectionPool = None,
+) -> List[ImageDownload]:
+    """
+    download all branding images required for a branding
+    on_download is called with every image as soon as it is ready
+    images are optimized (in parallel) if an optimization is given
+    a semaphore shared by many sources caps their downloads in flight (default: concurrency per call)
+    """
+
+    semaphore = semaphore or asyncio.Semaphore(concurrency)
+
+    with ThreadPoolExecutor(max_workers=workers) as executor, typer.progressbar(
+        length=len(BRANDING_IMAGES),
+        label="Downloading branding images",
+        file=io.StringIO() if quiet else None,
     ) as progress:
 
-        # iterate through all images
-        for img_type in progress:
+        async def _download(img_type: ImageType) -> ImageDownload:
+            # one copy in memory shared by all targets - no temporary files
+            process = img_type in RESIZE_IMAGES or optimization is not None
+            image_download = await download_image(
+                dracoon=dracoon, img_type=img_type, semaphore=semaphore, pool=pool
+            )
+            img_bytes = image_download.content
+            file_path = image_download.file_path
+            # resize while other downloads are still in flight
+            if img_type in RESIZE_IMAGES:
+                file_path = get_resized_file_path(file_path, image_format=get_image_format(img_bytes))
+                img_bytes = await resize_image_async(
+                    content=img_bytes, img_type=img_type, executor=executor, memo=memo
+                )
+            original_size = None
+            if optimization:
+                original_size = len(img_bytes)
+                img_bytes = await optimize_image_async(
+                    content=img_bytes,
+                    img_type=img_type,
+                    budget=optimization.budgets.get(img_type),
+                    executor=executor,
+                )
+            if process:
+                image_download = ImageDownload(
+                    file_path=file_path,
+                    image_type=img_type,
+                    content=img_bytes,
+                    original_size=original_size,
+                )
+            if on_download:
+                on_download(image_download)
+            progress.update(1)
+            return image_download
+
+        # download all images concurrently (all or nothing)
+        try:
+            image_downloads: List[ImageDownload] = await gather_or_cancel(
+                [_download(img_type) for img_type in BRANDING_IMAGES]
+            )
+        except DRACOONHttpError as err:
+            await dracoon.client.disconnect()
+            status_code = err.error.response.status_code
+            raise SourceBrandingError(
+                f"Download branding image failed: {status_code}", status_code=status_code
+            ) from err
+
+    if not quiet:
+        for img_type in RESIZE_IMAGES:
+            typer.echo(f"Resized {img_type.value}.")
+        print_optimization_summary(images=image_downloads)
+
+    return image_downloads
+
+
+def read_cached_image(cache: BrandingCache, image: CachedImage) -> ImageDownload:
+    """image from cache (read into memory)"""
+
+    content = bytearray()
+    cache.read_image(image, write=content.extend)
 
-            # get bytes
+    return ImageDownload(
+        content=bytes(content),
+        file_path=image.file_name,
+        image_type=ImageType(image.image_type),
+        original_size=image.original_size,
+    )
+
+
+async def fetch_source_branding(
+    source_url: str,
+    on_prem_source: bool = False,
+    concurrency: int = DEFAULT_CONCURRENCY,
+    workers: int = DEFAULT_WORKERS,
+    cache: BrandingCache = None,
+    on_download: Callable[[ImageDownload], None] = None,
+    pool: ConnectionPool = None,
+    quiet: bool = False,
+    optimization: ImageOptimization = None,
+    semaphore: asyncio.Semaphore = None,
+) -> SourceBranding:
+    """get branding and (resized / optimized) images of a source - uses cache if provided"""
+
+    dracoon = await init_public_dracoon(
+        url=source_url, on_prem_source=on_prem_source, pool=pool
+    )
+
+    try:
+        if not cache:
+            branding = await get_branding(dracoon=dracoon)
+            image_downloads = await download_images(
+                dracoon=dracoon,
+                concurrency=concurrency,
+                workers=workers,
+                on_download=on_download,
+                quiet=quiet,
+                optimization=optimization,
+                semaphore=semaphore,
+                pool=pool,
+            )
+            return branding, image_downloads
+
+        cache_key = f"{source_url}#on-prem" if on_prem_source else source_url
+        # optimized images are cached separately
+        if optimization:
+            cache_key = f"{cache_key}#{optimization.cache_key}"
+        entry = cache.get(cache_key)
+
+        branding, etag, last_modified = await get_branding_revalidated(
+            dracoon=dracoon,
+            etag=entry.etag if entry else None,
+            last_modified=entry.last_modified if entry else None,
+        )
+
+        # not modified: skip download and resize
+        image_downloads = None
+        if entry and (branding is None or branding.changedAt == entry.changed_at):
             try:
+                image_downloads = [read_cached_image(cache=cache, image=image) for image in entry.images]
+            except (OSError, ValueError):
+                # removed by a concurrent run or corrupt - download again
+                image_downloads = None
+
+        if image_downloads is not None:
+            cache.touch(key=cache_key, etag=etag, last_modified=last_modified)
+            if not quiet:
+                typer.echo(f"Using cached branding from {source_url}.")
+            if on_download:
+                for img in image_downloads:
+                    on_download(img)
+            if not quiet:
+                print_optimization_summary(images=image_downloads)
+            return CacheableBrandingResponse(**entry.branding), image_downloads
+
+        if branding is None:
+            branding = await get_branding(dracoon=dracoon)
+
+        image_downloads = await download_images(
+            dracoon=dracoon,
+            concurrency=concurrency,
+            workers=workers,
+            on_download=on_download,
+            quiet=quiet,
+            optimization=optimization,
+            memo=cache.resized,
+            semaphore=semaphore,
+            pool=pool,
+        )
+
+        cache.put(
+            key=cache_key,
+            branding=json.loads(branding.json()),
+            changed_at=branding.changedAt,
+            images=[
                 (
-                    img_bytes,
-                    content_type,
-                ) = await dracoon.public.branding.get_public_branding_image(
-                    type=img_type, size=ImageSize.LARGE
-                )
-                file_ending = get_file_ending(content_type=content_type)
-                file_name = f"{img_type.value}_large.{file_ending}"
-                image_downloads.append(
-                    ImageDownload(file_path=file_name, image_type=img_type)
+                    CachedImage(
+                        image_type=img.image_type.value,
+                        file_name=img.file_path,
+                        sha256=img.hash(),
+                        size=img.size,
+                        original_size=img.original_size,
+                    ),
+                    img.open,
                 )
+                for img in image_downloads
+            ],
+            etag=etag,
+            last_modified=last_modified,
+        )
 
-            except DRACOONHttpError as err:
-                error_txt = typer.style(
-                    "Error:", bg=typer.colors.RED, fg=typer.colors.WHITE
-                )
-                typer.echo(
-                    f"{error_txt} Download branding image failed: {err.error.response.status_code}"
-                )
-                await dracoon.client.disconnect()
-                sys.exit(1)
+        return branding, image_downloads
+    finally:
+        await dracoon.client.disconnect()
 
-            # write to file
-            with open(file=file_name, mode="wb") as f:
-                f.write(img_bytes)
 
-    resize_images = [
-        img_download
-        for img_download in image_downloads
-        if img_download.image_type in RESIZE_IMAGES
-    ]
+async def await_prefetch(prefetch: "asyncio.Task[SourceBranding]") -> SourceBranding:
+    """wait for a prefetched source branding - raises if it failed"""
 
-    for img_download in resize_images:
-        resize_image(path=img_download.file_path, img_type=img_download.image_type)
+    branding, image_downloads = await prefetch
 
-    return image_downloads
+    # prefetch runs quietly
+    print_optimization_summary(images=image_downloads)
+
+    return branding, image_downloads
+
+
+def get_compression(file_name: str) -> int:
+    """already compressed image formats are stored, anything else is deflated"""
+
+    if Path(file_name).suffix.lower() in COMPRESSED_FORMATS:
+        return zipfile.ZIP_STORED
+
+    return zipfile.ZIP_DEFLATED
 
 
 def get_file_ending(content_type: str):
@@ -140,161 +573,325 @@ def get_file_ending(content_type: str):
     return parts[1]
 
 
-def resize_image(path: str, img_type: ImageType):
-    """resize app or web logo to correct format"""
+def get_image_format(content: bytes) -> str:
+    """format of an image (only the header is decoded)"""
+    # imported here: Pillow is only required if images are resized
+    from PIL import Image
+
+    with Image.open(io.BytesIO(content)) as image:
+        return image.format
+
+
+def get_resized_file_path(file_path: str, image_format: str) -> str:
+    """file name of a resized image - formats without transparency are resized to PNG"""
+
+    if image_format in ALPHA_FORMATS:
+        return file_path
+
+    return str(Path(file_path).with_suffix(".png"))
+
+
+def resize_image_bytes(content: bytes, img_type: ImageType) -> bytes:
+    """resize app or web logo held in memory to correct format (centered on a transparent canvas)"""
+    # imported here: Pillow is only required if images are resized
+    from PIL import Image
 
     # handle invalid type
-    if img_type != ImageType.APP_LOGO and img_type != ImageType.WEB_LOGO:
+    if img_type not in RESIZE_DIMENSIONS:
         raise InvalidArgumentError("Resizing only required for app / web logo.")
 
-    # web logo
-    width = 1136
-    height = 440
+    width, height = RESIZE_DIMENSIONS[img_type]
 
-    # app logo
-    if img_type == ImageType.APP_LOGO:
-        width = 1900
-        height = 1900
+    with Image.open(io.BytesIO(content)) as image:
+        image_format = image.format if image.format in ALPHA_FORMATS else "PNG"
+        # image is not loaded yet: JPEGs are decoded at reduced scale (draft) and large
+        # images are reduced by an integer factor before the final LANCZOS resample
+        image.thumbnail((width, height), Image.LANCZOS, reducing_gap=RESIZE_REDUCING_GAP)
 
-    filename = f"{img_type.value}_large.png"
+        resized = Image.new("RGBA", (width, height), (255, 255, 255, 0))
+        resized.paste(
+            image,
+            (math.ceil((width - image.width) / 2), math.ceil((height - image.height) / 2)),
+        )
 
-    with open(path, "rb") as f:
-        with Image.open(f) as image:
-            resized = resizeimage.resize_contain(image, [width, height])
+    resized_bytes = io.BytesIO()
+    resized.save(resized_bytes, image_format)
 
-            resized.save(filename, image.format)
-            typer.echo(f"Resized {img_type.value}.")
+    return resized_bytes.getvalue()
 
 
-async def upload_images(images: List[ImageDownload], dracoon: DRACOON) -> List[SimpleImageRequest]:
-    """upload all required branding images"""
+async def upload_branding_image(
+    dracoon: DRACOON,
+    image_type: ImageType,
+    file_name: str,
+    content: Union[bytes, IO[bytes]],
+) -> Upload:
+    """upload branding image bytes or stream (no file path required)"""
 
-    image_reqs = []
+    client = dracoon.client
 
-    with typer.progressbar(
-        images, len(images), label="Uploading branding images"
-    ) as progress:
+    if not await client.test_connection() and client.connection:
+        await client.connect(OAuth2ConnectionType.refresh_token)
+    await refresh_expiring_token(client)
 
-        for img in progress:
-            path = img.file_path
-            check_path = Path(path)
-            if not check_path.exists() or not check_path.is_file():
-                raise FileNotFoundError("Branding image not found")
-            try:
-                upload = await dracoon.branding.upload_branding_image(
-                    type=img.image_type, file_path=path
-                )
-                image_reqs.append(SimpleImageRequest(id=upload.id, type=img.image_type))
-            except HTTPForbiddenError:
-                error_txt = typer.style(
-                    "Error:", bg=typer.colors.RED, fg=typer.colors.WHITE
-                )
-                typer.echo(f"{error_txt} Config Manager role required (Forbidden).")
-                await dracoon.logout()
-                sys.exit(1)
-            except DRACOONHttpError as err:
-                error_txt = typer.style(
-                    "Error:", bg=typer.colors.RED, fg=typer.colors.WHITE
-                )
-                typer.echo(
-                    f"{error_txt} Upload failed: {err.error.response.status_code}"
-                )
-                await dracoon.logout()
-                sys.exit(1)
+    api_url = f"{client.base_url}{client.branding_base_url}/v1/branding/files?type={image_type.value}"
 
-    return image_reqs
+    try:
+        res = await client.http.post(url=api_url, files={"file": (file_name, content)})
+        res.raise_for_status()
+    except httpx.RequestError as err:
+        await client.handle_connection_error(err)
+    except httpx.HTTPStatusError as err:
+        await client.handle_http_error(err=err, raise_on_err=True)
+
+    return Upload(**res.json())
+
+
+async def upload_image(
+    image: ImageDownload, dracoon: DRACOON, semaphore: asyncio.Semaphore, pool: ConnectionPool = None
+) -> SimpleImageRequest:
+    """upload a single branding image (memory budget and retry policy of the pool)"""
+
+    async def _upload() -> Upload:
+        # streamed body is re-opened on every attempt
+        with image.open() as content:
+            return await upload_branding_image(
+                dracoon=dracoon,
+                image_type=image.image_type,
+                file_name=Path(image.file_path).name,
+                content=content,
+            )
 
+    # image is only opened (and streamed) once an upload slot and its share of the memory budget are free
+    async with semaphore, get_memory_budget(pool).reserve(TRANSFER_BUFFER_SIZE):
+        with span("upload_image", image_type=image.image_type.value, url=dracoon.client.base_url) as upload_span:
+            upload_span.bytes = image.size
+            upload = await retry_call(_upload, policy=pool.retry_policy if pool else None)
 
-def delete_images(images: List[ImageDownload], path: str = None):
+    return SimpleImageRequest(id=upload.id, type=image.image_type)
 
-    img_paths = [Path(img.file_path) for img in images]
 
-    if path:
-        base_path = Path(path)
-        img_paths = [base_path.joinpath(img.file_path) for img in images]
+async def upload_images(
+    images: List[ImageDownload],
+    dracoon: DRACOON,
+    concurrency: int = DEFAULT_CONCURRENCY,
+    quiet: bool = False,
+    pool: ConnectionPool = None,
+) -> List[SimpleImageRequest]:
+    """upload all required branding images"""
 
-    for img_path in img_paths:
-        if not img_path.exists() or not img_path.is_file():
+    for img in images:
+        if img.content is not None or img.archive:
+            continue
+        check_path = Path(img.file_path)
+        if not check_path.exists() or not check_path.is_file():
             raise FileNotFoundError("Branding image not found")
 
-    for image in img_paths:
-        os.remove(image)
-        typer.echo(f"Temporary file {image.name} deleted.")
+    semaphore = asyncio.Semaphore(concurrency)
 
+    with typer.progressbar(
+        length=len(images),
+        label="Uploading branding images",
+        file=io.StringIO() if quiet else None,
+    ) as progress, span("upload_images", url=dracoon.client.base_url) as upload_span:
+        upload_span.bytes = sum(img.size for img in images)
+
+        async def _upload(img: ImageDownload) -> SimpleImageRequest:
+            image_req = await upload_image(image=img, dracoon=dracoon, semaphore=semaphore, pool=pool)
+            progress.update(1)
+            return image_req
+
+        # upload all images concurrently - results keep order of images
+        try:
+            image_reqs = await gather_or_cancel([_upload(img) for img in images])
+        except DRACOONHttpError as err:
+            raise make_target_error(err, action="Upload failed") from err
+
+    return image_reqs
 
-def delete_branding_json(path: str = None):
 
-    branding_json = "branding.json"
-    file_path = Path(branding_json)
+def make_target_error(err: DRACOONHttpError, action: str) -> TargetBrandingError:
+    """typed error of a failed target request (missing role is reported as such)"""
 
-    if path:
-        base_path = Path(path)
-        file_path = base_path.joinpath(branding_json)
+    status_code = err.error.response.status_code
 
-    if not file_path.exists() or not file_path.is_file():
-        raise FileNotFoundError("Branding download not found.")
+    if isinstance(err, HTTPForbiddenError):
+        return TargetBrandingError("Config Manager role required (Forbidden).", status_code=status_code)
 
-    os.remove(branding_json)
-    typer.echo(f"Temporary file {branding_json} deleted.")
+    return TargetBrandingError(f"{action}: {status_code}", status_code=status_code)
 
 
 # PUT request to update branding
 async def update_branding(dracoon: DRACOON, branding_upload: UpdateBrandingRequest):
 
+    await refresh_expiring_token(dracoon.client)
+
     try:
-        update = await dracoon.branding.update_branding(branding_update=branding_upload)
-    except HTTPForbiddenError:
-        error_txt = typer.style("Error:", bg=typer.colors.RED, fg=typer.colors.WHITE)
-        typer.echo(f"{error_txt} Config Manager role required (Forbidden).")
-        await dracoon.logout()
-        sys.exit(1)
+        with span("update_branding", url=dracoon.client.base_url):
+            update = await dracoon.branding.update_branding(branding_update=branding_upload)
     except DRACOONHttpError as err:
-        error_txt = typer.style("Error:", bg=typer.colors.RED, fg=typer.colors.WHITE)
-        typer.echo(f"{error_txt} Upload failed: {err.error.response.status_code}")
-        await dracoon.logout()
-        sys.exit(1)
+        raise make_target_error(err, action="Upload failed") from err
 
     return update
 
 
-async def zip_branding(source_url: str, zip_name: str, on_prem_source: bool):
-    """zip a branding including images in a given path"""
-    dracoon = init_public_dracoon(url=source_url, on_prem_source=on_prem_source)
-
-    branding = await get_branding(dracoon=dracoon)
-    image_downloads = await download_images(dracoon=dracoon)
-
-    # dump json to file
-    with open("branding.json", "w") as jsonfile:
-        json.dump(branding.json(), jsonfile)
+async def zip_branding(
+    source_url: str,
+    zip_name: str,
+    on_prem_source: bool,
+    concurrency: int = DEFAULT_CONCURRENCY,
+    workers: int = DEFAULT_WORKERS,
+    cache: BrandingCache = None,
+    pool: ConnectionPool = None,
+    optimization: ImageOptimization = None,
+    quiet: bool = False,
+):
+    """zip a branding including images (archive v2) - images are written to the zip as they arrive"""
+
+    part_name = f"{zip_name}.part"
+
+    with zipfile.ZipFile(part_name, "w") as branding_zip:
+        writer = SnapshotWriter(archive=branding_zip, compression=get_compression)
+        manifest_images = []
+
+        def _write_image(image: ImageDownload):
+            manifest_images.append(
+                writer.add_image(
+                    image_type=image.image_type,
+                    file_name=image.file_path,
+                    open_content=image.open,
+                )
+            )
 
-    with zipfile.ZipFile(
-        zip_name, "w", compression=zipfile.ZIP_DEFLATED
-    ) as branding_zip:
-        branding_zip.write("branding.json")
-        for image in image_downloads:
-            branding_zip.write(image.file_path)
+        try:
+            branding, image_downloads = await fetch_source_branding(
+                source_url=source_url,
+                on_prem_source=on_prem_source,
+                concurrency=concurrency,
+                workers=workers,
+                cache=cache,
+                on_download=_write_image,
+                pool=pool,
+                quiet=quiet,
+                optimization=optimization,
+            )
+        except BaseException:
+            branding_zip.close()
+            os.remove(part_name)
+            raise
+
+        writer.add_tenant(
+            source_url=source_url,
+            branding=json.loads(branding.json()),
+            images=manifest_images,
+        )
+        writer.write_index()
+
+    os.replace(part_name, zip_name)
+
+    if not quiet:
+        success_txt = typer.style("SUCCESS: ", fg=typer.colors.GREEN, bold=True)
+        typer.echo(f"{success_txt} Stored branding from {source_url} in file {zip_name}")
+
+
+async def snapshot_brandings(
+    source_urls: List[str],
+    zip_name: str,
+    on_prem_source: bool = False,
+    concurrency: int = DEFAULT_CONCURRENCY,
+    workers: int = DEFAULT_WORKERS,
+    cache: BrandingCache = None,
+    pool: ConnectionPool = None,
+    optimization: ImageOptimization = None,
+    quiet: bool = False,
+) -> List[TargetResult]:
+    """
+    save brandings of many sources into one snapshot zip file (images are stored once by content hash)
+    sources are fetched concurrently - a failing source does not stop the snapshot
+    """
+
+    part_name = f"{zip_name}.part"
+    # one cap for sources and one for image downloads across all sources
+    semaphore = asyncio.Semaphore(concurrency)
+    download_semaphore = asyncio.Semaphore(concurrency)
+
+    with zipfile.ZipFile(part_name, "w") as snapshot_zip:
+        writer = SnapshotWriter(archive=snapshot_zip, compression=get_compression)
+
+        with typer.progressbar(
+            length=len(source_urls),
+            label="Saving source brandings",
+            file=io.StringIO() if quiet else None,
+        ) as progress:
+
+            async def _save(source_url: str) -> TargetResult:
+                async with semaphore:
+                    try:
+                        with span("save_source", url=source_url):
+                            branding, image_downloads = await fetch_source_branding(
+                                source_url=source_url,
+                                on_prem_source=on_prem_source,
+                                concurrency=concurrency,
+                                workers=workers,
+                                cache=cache,
+                                pool=pool,
+                                quiet=True,
+                                optimization=optimization,
+                                semaphore=download_semaphore,
+                            )
+                        # written once complete - no images of failed sources in the snapshot
+                        writer.add_tenant(
+                            source_url=source_url,
+                            branding=json.loads(branding.json()),
+                            images=[
+                                writer.add_image(
+                                    image_type=img.image_type,
+                                    file_name=img.file_path,
+                                    open_content=img.open,
+                                )
+                                for img in image_downloads
+                            ],
+                        )
+                        result = TargetResult(target_url=source_url, success=True)
+                    except Exception as err:
+                        result = TargetResult(
+                            target_url=source_url, success=False, error=format_error(err)
+                        )
+
+                progress.update(1)
+                return result
+
+            results = await asyncio.gather(*[_save(source_url) for source_url in source_urls])
+
+        writer.write_index()
+
+    if not writer.tenants:
+        os.remove(part_name)
+        return results
+
+    os.replace(part_name, zip_name)
+
+    if not quiet:
+        success_txt = typer.style("SUCCESS: ", fg=typer.colors.GREEN, bold=True)
+        typer.echo(
+            f"{success_txt} Stored {len(writer.tenants)} brandings in file {zip_name} "
+            f"({len(writer.images)} unique images, {writer.deduplicated} bytes deduplicated)."
+        )
 
-    delete_images(images=image_downloads)
-    delete_branding_json()
-    await dracoon.client.disconnect()
-    success_txt = typer.style("SUCCESS: ", fg=typer.colors.GREEN, bold=True)
-    typer.echo(f"{success_txt} Stored branding from {source_url} in file {zip_name}")
+    return results
 
 
 def is_valid_zip(file_names: List[str]):
+    """legacy layout (v1): branding.json and an image per branding image type"""
+
+    file_names = set(file_names)
 
     if "branding.json" not in file_names:
         return False
 
-    file_roots = [file_name.split(".")[0] for file_name in file_names]
-    expected_names = [f"{img_type.value}_large" for img_type in BRANDING_IMAGES]
+    file_roots = {file_name.split(".")[0] for file_name in file_names}
 
-    for required_image in expected_names:
-        if required_image not in file_roots:
-            return False
-
-    return True
+    return all(f"{img_type.value}_large" in file_roots for img_type in BRANDING_IMAGES)
 
 
 def get_image_type(file_root: str) -> ImageType:
@@ -304,79 +901,298 @@ def get_image_type(file_root: str) -> ImageType:
     if len(parts) < 2:
         raise InvalidArgumentError("Invalid image name format.")
 
-    type_str = parts[0]
+    try:
+        img_type = ImageType(parts[0])
+    except ValueError:
+        raise InvalidArgumentError("Invalid image name format.")
 
-    if type_str == ImageType.APP_LOGO.value:
-        return ImageType.APP_LOGO
-    if type_str == ImageType.APP_SPLASH_IMAGE.value:
-        return ImageType.APP_SPLASH_IMAGE
-    if type_str == ImageType.WEB_LOGO.value:
-        return ImageType.WEB_LOGO
-    if type_str == ImageType.WEB_SPLASH_IMAGE.value:
-        return ImageType.WEB_SPLASH_IMAGE
-    if type_str == ImageType.SQUARED_LOGO.value:
-        return ImageType.SQUARED_LOGO
+    if img_type not in BRANDING_IMAGES:
+        raise InvalidArgumentError("Invalid image name format.")
 
-    raise InvalidArgumentError("Invalid image name format.")
+    return img_type
 
 
-async def load_from_zip(dracoon: DRACOON, zip_file: str):
+def read_legacy_zip(branding_zip: zipfile.ZipFile) -> Tuple[Any, List[ImageDownload]]:
+    """branding and images of a legacy zip file (branding.json contains the branding as JSON string)"""
 
-    with zipfile.ZipFile(zip_file, "r") as branding_zip:
-        branding_files = branding_zip.namelist()
+    # central directory only
+    branding_files = branding_zip.namelist()
 
-        if not is_valid_zip(file_names=branding_files):
-            error_txt = typer.style(
-                "Format error:", bg=typer.colors.RED, fg=typer.colors.WHITE
-            )
-            typer.echo(f"{error_txt}Invalid branding zip file format.")
-            sys.exit(1)
+    if not is_valid_zip(file_names=branding_files):
+        raise InvalidArchiveError("Invalid branding zip file format.")
 
-        # extract in cwd
-        branding_zip.extractall()
+    image_downloads = []
+    for image in branding_files:
+        if image == "branding.json":
+            continue
+        try:
+            image_type = get_image_type(file_root=image.split("/")[0])
+        except InvalidArgumentError as err:
+            raise InvalidArchiveError(f"Invalid image {image}: {err}") from err
+        image_downloads.append(ImageDownload(file_path=image, image_type=image_type, archive=branding_zip))
+
+    try:
+        branding_json = json.loads(branding_zip.read("branding.json"))
+        return json.loads(branding_json), image_downloads
+    except ValueError:
+        raise InvalidArchiveError("Invalid branding.json.")
+
+
+def read_branding_zip(
+    branding_zip: zipfile.ZipFile, source_url: str = None
+) -> Tuple[Any, List[ImageDownload]]:
+    """
+    branding and images of a zip file (v2 snapshot or legacy layout) - raises InvalidArchiveError
+    images are verified against the manifest (size, SHA-256) and streamed from the zip on upload
+    """
+
+    if not SnapshotReader.is_snapshot(branding_zip):
+        return read_legacy_zip(branding_zip=branding_zip)
+
+    reader = SnapshotReader(archive=branding_zip)
+    manifest = reader.get_tenant(source_url=source_url)
+    reader.verify(manifest=manifest, required=BRANDING_IMAGES)
+
+    image_downloads = [
+        ImageDownload(
+            file_path=image.file_name,
+            image_type=image.image_type,
+            archive=branding_zip,
+            member=image.path,
+        )
+        for image in manifest.images
+    ]
+
+    return manifest.branding, image_downloads
+
+
+def check_image(image: ImageDownload, check_size: bool = True):
+    """decode an image and check its dimensions (resized images only) - raises InvalidArchiveError"""
+    # imported here: Pillow is only required if images are checked
+    from PIL import Image
+
+    try:
+        with image.open() as content:
+            image_bytes = content.read()
+    except zipfile.BadZipFile as err:
+        raise InvalidArchiveError(f"Corrupted image {image.file_path}: {err}")
+
+    try:
+        with Image.open(io.BytesIO(image_bytes)) as decoded:
+            expected = RESIZE_DIMENSIONS.get(image.image_type)
+            if check_size and expected and decoded.size != expected:
+                width, height = decoded.size
+                raise InvalidArchiveError(
+                    f"Invalid size of {image.file_path}: {width}x{height} (expected {expected[0]}x{expected[1]})."
+                )
+            # PNG: checksums of all chunks are verified without inflating the pixel data
+            # other formats have no checksums and are decoded (truncated or corrupted data fails)
+            if decoded.format == "PNG":
+                decoded.verify()
+            else:
+                decoded.load()
+    except (OSError, ValueError, SyntaxError, Image.DecompressionBombError) as err:
+        raise InvalidArchiveError(f"Invalid image {image.file_path}: {err}")
+
+
+def resize_legacy_image(image: ImageDownload) -> ImageDownload:
+    """app or web logo of a legacy zip resized in memory (unchanged if sized correctly or not decodable)"""
+    # imported here: Pillow is only required if images are resized
+    from PIL import Image
+
+    expected = RESIZE_DIMENSIONS.get(image.image_type)
+    if not expected:
+        return image
+
+    try:
+        with image.open() as content:
+            image_bytes = content.read()
+        with Image.open(io.BytesIO(image_bytes)) as decoded:
+            if decoded.size == expected:
+                return image
+            image_format = decoded.format
+        resized = resize_image_bytes(content=image_bytes, img_type=image.image_type)
+    except (OSError, ValueError, SyntaxError, zipfile.BadZipFile, Image.DecompressionBombError):
+        # reported by the preflight
+        return image
+
+    return ImageDownload(
+        file_path=get_resized_file_path(image.file_path, image_format=image_format),
+        image_type=image.image_type,
+        content=resized,
+    )
+
+
+async def resize_legacy_images(
+    images: List[ImageDownload], executor: Executor, quiet: bool = False
+) -> List[ImageDownload]:
+    """resize app and web logos of a legacy zip on a worker pool (other images are streamed from the zip)"""
+
+    loop = asyncio.get_running_loop()
+
+    with span("resize_legacy_images", images=str(len(images))):
+        resized = await asyncio.gather(
+            *[loop.run_in_executor(executor, resize_legacy_image, img) for img in images]
+        )
+
+    if not quiet:
+        for original, img in zip(images, resized):
+            if img is not original:
+                typer.echo(f"Resized {img.image_type.value}.")
+
+    return resized
 
-        images = [
-            file_name for file_name in branding_files if file_name != "branding.json"
-        ]
-        file_roots = [img.split("/")[0] for img in images]
 
-        image_downloads = [
-            ImageDownload(
-                file_path=image,
-                image_type=get_image_type(file_root=image.split("/")[0]),
+async def preflight_branding(
+    branding_dict: Any, images: List[ImageDownload], executor: Executor, check_sizes: bool = True
+) -> List[str]:
+    """
+    validate a branding before any request: the update payload is parsed and all images
+    are decoded on a worker pool - returns all errors found (empty if valid)
+    sizes of app and web logo are only checked if check_sizes (legacy zips are resized on load)
+    """
+
+    errors = []
+
+    with span("preflight", images=str(len(images))):
+        try:
+            # payload parsing changes the branding (colors)
+            make_branding_payload(
+                public_branding_dict=copy.deepcopy(branding_dict),
+                image_reqs=[SimpleImageRequest(id=0, type=img.image_type) for img in images],
             )
-            for image in images
-        ]
+        except (KeyError, TypeError, ValidationError) as err:
+            errors.append(f"Invalid branding payload: {format_error(err)}")
+
+        loop = asyncio.get_running_loop()
+        results = await asyncio.gather(
+            *[loop.run_in_executor(executor, check_image, img, check_sizes) for img in images],
+            return_exceptions=True,
+        )
+
+    for result in results:
+        if isinstance(result, InvalidArchiveError):
+            errors.append(str(result))
+        elif isinstance(result, BaseException):
+            raise result
+
+    return errors
+
+
+async def check_branding_zip(
+    zip_file: str, executor: Executor, source_url: str = None
+) -> List[str]:
+    """preflight of a zip file (format, manifest, payload and images) - returns all errors found"""
+
+    loop = asyncio.get_running_loop()
+
     try:
-        # upload images
-        image_reqs = await upload_images(images=image_downloads, dracoon=dracoon)
+        with zipfile.ZipFile(zip_file, "r") as branding_zip:
+            # manifest is verified (hashed) on the worker pool as well
+            branding_dict, image_downloads = await loop.run_in_executor(
+                executor, read_branding_zip, branding_zip, source_url
+            )
+            return await preflight_branding(
+                branding_dict=branding_dict,
+                images=image_downloads,
+                executor=executor,
+                check_sizes=SnapshotReader.is_snapshot(branding_zip),
+            )
+    except InvalidArchiveError as err:
+        return [str(err)]
+    except (OSError, zipfile.BadZipFile) as err:
+        return [f"Invalid zip file: {err}"]
+
+
+async def check_branding_zips(
+    zip_files: List[str],
+    workers: int = DEFAULT_WORKERS,
+    source_url: str = None,
+    quiet: bool = False,
+) -> List[TargetResult]:
+    """preflight of many zip files - archives and images are checked concurrently (no network)"""
+
+    # enough archives in flight to keep all workers busy
+    semaphore = asyncio.Semaphore(workers)
+
+    with ThreadPoolExecutor(max_workers=workers) as executor, typer.progressbar(
+        length=len(zip_files),
+        label="Checking branding zip files",
+        file=io.StringIO() if quiet else None,
+    ) as progress:
 
-        # load branding JSON
-        with open("branding.json") as json_file:
-            branding_json = json.load(json_file)
+        async def _check(zip_file: str) -> TargetResult:
+            async with semaphore:
+                errors = await check_branding_zip(
+                    zip_file=zip_file, executor=executor, source_url=source_url
+                )
+            progress.update(1)
+            return TargetResult(target_url=zip_file, success=not errors, error=" ".join(errors) or None)
+
+        return await asyncio.gather(*[_check(zip_file) for zip_file in zip_files])
+
+
+async def load_from_zip(
+    dracoon: DRACOON,
+    zip_file: str,
+    concurrency: int = DEFAULT_CONCURRENCY,
+    incremental: bool = False,
+    source_url: str = None,
+    workers: int = DEFAULT_WORKERS,
+    preflight: bool = True,
+    quiet: bool = False,
+    pool: ConnectionPool = None,
+    registry: UploadRegistry = None,
+) -> UpdateBrandingResponse:
+
+    """
+    upload a branding from a zip file - images are streamed from the zip (no extraction)
+    the branding is checked before the first upload (unless already checked by the caller)
+    returns the updated branding (None if already up to date) - raises on error
+    """
 
-        parsed_colors = []
+    with zipfile.ZipFile(zip_file, "r") as branding_zip:
 
-        parsed_json = json.loads(branding_json)
+        parsed_json, image_downloads = read_branding_zip(
+            branding_zip=branding_zip, source_url=source_url
+        )
 
-        update_payload = make_branding_payload(public_branding_dict=parsed_json, image_reqs=image_reqs)
+        errors = []
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            # zip files saved by earlier versions contain logos that are not resized
+            if not SnapshotReader.is_snapshot(branding_zip):
+                image_downloads = await resize_legacy_images(
+                    images=image_downloads, executor=executor, quiet=quiet
+                )
+            if preflight:
+                errors = await preflight_branding(
+                    branding_dict=parsed_json, images=image_downloads, executor=executor
+                )
+        if errors:
+            raise InvalidArchiveError(" ".join(errors))
+
+        try:
+            # upload images and send request to update branding
+            update = await update_target_branding(
+                dracoon=dracoon,
+                branding_dict=parsed_json,
+                images=image_downloads,
+                concurrency=concurrency,
+                incremental=incremental,
+                quiet=quiet,
+                pool=pool,
+                registry=registry,
+            )
+        except DRACOONHttpError as err:
+            raise make_target_error(err, action="Could not update branding") from err
 
-        # send request to update branding
-        result = await update_branding(
-            branding_upload=update_payload, dracoon=dracoon
+    if not quiet:
+        success_txt = typer.style("SUCCESS: ", fg=typer.colors.GREEN, bold=True)
+        typer.echo(
+            f"{success_txt} Sprayed source branding from {zip_file} to {dracoon.client.base_url}."
         )
-    except DRACOONHttpError:
-        error_txt = typer.style("Error: ", bg=typer.colors.RED, fg=typer.colors.WHITE)
-        typer.echo(f"{error_txt}Could not update branding.")
-        sys.exit(1)
-    finally:
-        if image_downloads: delete_images(images=image_downloads)
-        delete_branding_json()
 
-    success_txt = typer.style("SUCCESS: ", fg=typer.colors.GREEN, bold=True)
-    typer.echo(
-        f"{success_txt} Sprayed source branding from {zip_file} to {dracoon.client.base_url}."
-    )
+    return update
 
 
 def make_branding_payload(public_branding_dict: Any, image_reqs: List[SimpleImageRequest]) -> UpdateBrandingRequest:
@@ -404,36 +1220,527 @@ def make_branding_payload(public_branding_dict: Any, image_reqs: List[SimpleImag
         return UpdateBrandingRequest(**updated_branding)
 
 
-async def spray_branding(source_url: str, target_dracoon: DRACOON, on_prem_source: bool = False):
-    """ spray a public branding to a target DRACOON """
-    source_dracoon = init_public_dracoon(url=source_url, on_prem_source=on_prem_source)
-    # fetch public source branding / images
-    branding = await get_branding(dracoon=source_dracoon)
+def payload_equals(payload: UpdateBrandingRequest, other: UpdateBrandingRequest) -> bool:
+    """compare branding payloads (image order is ignored)"""
+
+    def _normalize(branding: UpdateBrandingRequest) -> dict:
+        branding_dict = json.loads(branding.json())
+        branding_dict["images"] = sorted(
+            branding_dict["images"], key=lambda image: image["type"]
+        )
+        return branding_dict
+
+    return _normalize(payload) == _normalize(other)
+
+
+async def get_branding_diff(target_dracoon: DRACOON, images: List[ImageDownload], uploads: TargetUploads) -> BrandingDiff:
+    """
+    compare images to the current branding of a target - raises on error
+    an image is unchanged if the target still uses the id recorded for an upload of the same content
+    (servers may re-encode uploaded images - target image bytes are not compared)
+    """
+
+    await refresh_expiring_token(target_dracoon.client)
+    with span("get_branding", url=target_dracoon.client.base_url, target=True):
+        current = await target_dracoon.branding.get_branding()
+    current_ids = {
+        ImageType(image.type): image.id
+        for image in current.images
+        if ImageType(image.type) in BRANDING_IMAGES
+    }
+
+    unchanged_images = {}
+    for img in images:
+        image_id = uploads.get_upload(image_type=img.image_type.value, sha256=img.hash())
+        if image_id is not None and current_ids.get(img.image_type) == image_id:
+            unchanged_images[img.image_type] = SimpleImageRequest(id=image_id, type=img.image_type)
+
+    changed_images = [img for img in images if img.image_type not in unchanged_images]
+
+    return BrandingDiff(
+        current=target_dracoon.branding.make_updateable_branding(current),
+        changed_images=changed_images,
+        unchanged_images=unchanged_images,
+    )
+
+
+async def spray_branding(
+    source_url: str,
+    target_dracoon: DRACOON,
+    on_prem_source: bool = False,
+    concurrency: int = DEFAULT_CONCURRENCY,
+    workers: int = DEFAULT_WORKERS,
+    cache: BrandingCache = None,
+    incremental: bool = False,
+    pool: ConnectionPool = None,
+    source: SourceBranding = None,
+    optimization: ImageOptimization = None,
+    quiet: bool = False,
+) -> UpdateBrandingResponse:
+    """
+    spray a public branding to a target DRACOON (images are kept in memory)
+    returns the updated branding (None if already up to date) - raises on error
+    """
+    # fetch public source branding / images (unless already fetched)
+    if not source:
+        source = await fetch_source_branding(
+            source_url=source_url,
+            on_prem_source=on_prem_source,
+            concurrency=concurrency,
+            workers=workers,
+            cache=cache,
+            pool=pool,
+            quiet=quiet,
+            optimization=optimization,
+        )
+    branding, image_downloads = source
     try:
-        image_downloads = await download_images(dracoon=source_dracoon)
+        update = await update_target_branding(
+            dracoon=target_dracoon,
+            branding_dict=branding.dict(),
+            images=image_downloads,
+            concurrency=concurrency,
+            incremental=incremental,
+            quiet=quiet,
+            pool=pool,
+        )
 
-        # upload images
-        image_reqs = await upload_images(images=image_downloads, dracoon=target_dracoon)
+    except DRACOONHttpError as err:
+        raise make_target_error(err, action="Could not update branding") from err
 
-        # update branding
-        branding_dict = branding.dict()
-        branding_payload = make_branding_payload(public_branding_dict=branding_dict, image_reqs=image_reqs)
+    if not quiet:
+        success_txt = typer.style("SUCCESS:", fg=typer.colors.GREEN, bold=True)
+        typer.echo(f"{success_txt} Sprayed branding from {source_url} to target {target_dracoon.client.base_url}")
 
-        # send request to update branding
-        result = await update_branding(
-            branding_upload=branding_payload, dracoon=target_dracoon
+    return update
+
+
+async def update_target_branding(
+    dracoon: DRACOON,
+    branding_dict: Any,
+    images: List[ImageDownload],
+    concurrency: int = DEFAULT_CONCURRENCY,
+    incremental: bool = False,
+    quiet: bool = False,
+    pool: ConnectionPool = None,
+    registry: UploadRegistry = None,
+) -> UpdateBrandingResponse:
+    """
+    upload images and update branding - only changed images / payload if incremental
+    uploads of incremental updates are recorded in the registry (default registry if None)
+    """
+
+    if not incremental:
+        image_reqs = await upload_images(
+            images=images, dracoon=dracoon, concurrency=concurrency, quiet=quiet, pool=pool
         )
+        branding_payload = make_branding_payload(
+            public_branding_dict=branding_dict, image_reqs=image_reqs
+        )
+        return await update_branding(branding_upload=branding_payload, dracoon=dracoon)
 
-    except DRACOONHttpError:
-        error_txt = typer.style("Error:", bg=typer.colors.RED, fg=typer.colors.WHITE)
-        typer.echo(f"{error_txt}Could not update branding.")
-        sys.exit(1)
+    uploads = (registry or UploadRegistry()).for_target(dracoon.client.base_url)
+    diff = await get_branding_diff(target_dracoon=dracoon, images=images, uploads=uploads)
+    if not quiet:
+        typer.echo(
+            f"{len(diff.unchanged_images)} of {len(images)} images unchanged on target."
+        )
 
-    finally:
-        if image_downloads: delete_images(images=image_downloads)
-        await source_dracoon.client.disconnect()
+    uploaded = []
+    if diff.changed_images:
+        uploaded = await upload_images(
+            images=diff.changed_images, dracoon=dracoon, concurrency=concurrency, quiet=quiet, pool=pool
+        )
+        for img, image_req in zip(diff.changed_images, uploaded):
+            uploads.record_upload(image_type=img.image_type.value, sha256=img.hash(), image_id=image_req.id)
 
-    success_txt = typer.style("SUCCESS:", fg=typer.colors.GREEN, bold=True)
-    typer.echo(f"{success_txt} Sprayed branding from {source_url} to target {target_dracoon.client.base_url}")
+    branding_payload = make_branding_payload(
+        public_branding_dict=branding_dict,
+        image_reqs=diff.merge_image_reqs(images=images, uploaded=uploaded),
+    )
+
+    if diff.is_up_to_date(branding_payload):
+        if not quiet:
+            typer.echo("Branding already up to date - skipping update.")
+        return None
+
+    return await update_branding(branding_upload=branding_payload, dracoon=dracoon)
+
+
+def read_targets(targets_file: str) -> List[str]:
+    """read target urls from a file (one per line, # starts a comment)"""
+
+    with open(targets_file, "r") as f:
+        lines = [line.split("#")[0].strip() for line in f]
+
+    # remove empty lines and duplicates (keep order)
+    return list(dict.fromkeys(line for line in lines if line))
+
+
+def get_source_fingerprint(
+    branding: CacheableBrandingResponse, images: List[ImageDownload]
+) -> str:
+    """content hash of a source branding (payload and images) - changes whenever the source changes"""
+
+    parts = [branding.json()] + sorted(
+        f"{img.image_type.value}:{img.hash()}" for img in images
+    )
+
+    return hash_content("\n".join(parts).encode("utf-8"))
+
+
+async def verify_branding(
+    target_dracoon: DRACOON, branding_payload: UpdateBrandingRequest
+) -> bool:
+    """
+    check that a target uses the branding payload (images compared by id and type)
+    image content is not compared - servers may re-encode uploaded images
+    """
 
+    await refresh_expiring_token(target_dracoon.client)
+    with span("get_branding", url=target_dracoon.client.base_url, target=True):
+        current = await target_dracoon.branding.get_branding()
 
+    return payload_equals(
+        branding_payload, target_dracoon.branding.make_updateable_branding(current)
+    )
+
+
+async def push_branding(
+    target_dracoon: DRACOON,
+    branding: CacheableBrandingResponse,
+    images: List[ImageDownload],
+    semaphore: asyncio.Semaphore,
+    incremental: bool = False,
+    journal: TargetJournal = None,
+    pool: ConnectionPool = None,
+    registry: UploadRegistry = None,
+) -> UpdateBrandingResponse:
+    """
+    upload images and update branding of a target - raises on error
+    if incremental, only changed images are uploaded (recorded in the registry) and an unchanged branding is not updated
+    with a journal, progress is recorded, uploads of a previous run are reused and the update is verified
+    """
+
+    if journal and journal.updated:
+        # updated in a previous run - only verification missing
+        updated_images = journal.progress.updated_images
+        if updated_images and await verify_branding(
+            target_dracoon=target_dracoon,
+            branding_payload=make_branding_payload(
+                public_branding_dict=branding.dict(),
+                image_reqs=[
+                    SimpleImageRequest(id=image_id, type=ImageType(image_type))
+                    for image_type, image_id in updated_images.items()
+                ],
+            ),
+        ):
+            journal.record_verified()
+            return None
+        journal.reset()
+
+    diff = uploads = None
+    changed_images = images
+    if incremental:
+        uploads = (registry or UploadRegistry()).for_target(target_dracoon.client.base_url)
+        diff = await get_branding_diff(target_dracoon=target_dracoon, images=images, uploads=uploads)
+        changed_images = diff.changed_images
+
+    reused_uploads = False
+
+    async def _upload(img: ImageDownload) -> SimpleImageRequest:
+        nonlocal reused_uploads
+
+        if not journal and not uploads:
+            return await upload_image(image=img, dracoon=target_dracoon, semaphore=semaphore, pool=pool)
+
+        img_hash = img.hash()
+        image_id = journal.get_upload(image_type=img.image_type.value, sha256=img_hash) if journal else None
+        if image_id is not None:
+            reused_uploads = True
+            return SimpleImageRequest(id=image_id, type=img.image_type)
+
+        image_req = await upload_image(image=img, dracoon=target_dracoon, semaphore=semaphore, pool=pool)
+        for record in (journal, uploads):
+            if record:
+                record.record_upload(image_type=img.image_type.value, sha256=img_hash, image_id=image_req.id)
+        return image_req
+
+    image_reqs = await gather_or_cancel([_upload(img) for img in changed_images])
+
+    if diff:
+        image_reqs = diff.merge_image_reqs(images=images, uploaded=image_reqs)
+
+    branding_payload = make_branding_payload(
+        public_branding_dict=branding.dict(), image_reqs=image_reqs
+    )
+
+    if diff and diff.is_up_to_date(branding_payload):
+        if journal:
+            journal.record_verified()
+        return None
+
+    await refresh_expiring_token(target_dracoon.client)
+
+    try:
+        with span("update_branding", url=target_dracoon.client.base_url):
+            update = await target_dracoon.branding.update_branding(branding_update=branding_payload)
+    except (HTTPBadRequestError, HTTPNotFoundError):
+        if not reused_uploads:
+            raise
+        # uploads of a previous run are no longer available - upload again
+        journal.reset()
+        return await push_branding(
+            target_dracoon=target_dracoon,
+            branding=branding,
+            images=images,
+            semaphore=semaphore,
+            incremental=incremental,
+            journal=journal,
+            pool=pool,
+            registry=registry,
+        )
+
+    if journal:
+        image_ids = {ImageType(image_req.type).value: image_req.id for image_req in image_reqs}
+        journal.record_update(image_ids=image_ids)
+        if not await verify_branding(
+            target_dracoon=target_dracoon, branding_payload=branding_payload
+        ):
+            raise VerificationFailedError("Branding verification failed.")
+        journal.record_verified()
+
+    return update
+
+
+def format_error(err: Exception) -> str:
+    """short error description for a target summary"""
+
+    if isinstance(err, HTTPForbiddenError):
+        return "Config Manager role required (Forbidden)."
+    if isinstance(err, DRACOONHttpError):
+        return f"HTTP error {err.error.response.status_code}"
+
+    return str(err) or type(err).__name__
+
+
+async def spray_branding_to_targets(
+    source_url: str,
+    target_urls: List[str],
+    connect: Callable[[str], Awaitable[DRACOON]],
+    on_prem_source: bool = False,
+    concurrency: int = DEFAULT_CONCURRENCY,
+    workers: int = DEFAULT_WORKERS,
+    cache: BrandingCache = None,
+    incremental: bool = False,
+    pool: ConnectionPool = None,
+    source: SourceBranding = None,
+    journal: RolloutJournal = None,
+    optimization: ImageOptimization = None,
+    quiet: bool = False,
+    registry: UploadRegistry = None,
+) -> List[TargetResult]:
+    """
+    spray a public branding to multiple targets (source is downloaded once)
+    with a journal, targets completed in a previous run (same source branding) are skipped
+    """
+
+    if not source:
+        source = await fetch_source_branding(
+            source_url=source_url,
+            on_prem_source=on_prem_source,
+            concurrency=concurrency,
+            workers=workers,
+            cache=cache,
+            pool=pool,
+            quiet=quiet,
+            optimization=optimization,
+        )
+    branding, image_downloads = source
+    fingerprint = (
+        get_source_fingerprint(branding=branding, images=image_downloads) if journal else None
+    )
+
+    # uploads of incremental sprays are recorded for later runs
+    if incremental and not registry:
+        registry = UploadRegistry()
+
+    # global caps for targets in flight and image uploads across all targets
+    target_semaphore = asyncio.Semaphore(concurrency)
+    upload_semaphore = asyncio.Semaphore(concurrency)
+
+    with typer.progressbar(
+        length=len(target_urls),
+        label="Spraying branding to targets",
+        file=io.StringIO() if quiet else None,
+    ) as progress:
+
+        async def _spray(target_url: str) -> TargetResult:
+            target_journal = journal.for_target(target_url, fingerprint) if journal else None
+
+            if target_journal and target_journal.verified:
+                progress.update(1)
+                return TargetResult(target_url=target_url, success=True, skipped=True)
+
+            async with target_semaphore:
+                with span("spray_target", url=target_url) as target_span:
+                    target_dracoon = None
+                    try:
+                        target_dracoon = await connect(target_url)
+                        await push_branding(
+                            target_dracoon=target_dracoon,
+                            branding=branding,
+                            images=image_downloads,
+                            semaphore=upload_semaphore,
+                            incremental=incremental,
+                            journal=target_journal,
+                            pool=pool,
+                            registry=registry,
+                        )
+                        result = TargetResult(target_url=target_url, success=True)
+                    except Exception as err:
+                        result = TargetResult(
+                            target_url=target_url, success=False, error=format_error(err)
+                        )
+                    finally:
+                        if target_dracoon:
+                            await target_dracoon.client.disconnect()
+                    target_span.attributes["success"] = str(result.success)
+
+            progress.update(1)
+            return result
+
+        results = await asyncio.gather(*[_spray(target_url) for target_url in target_urls])
+
+    return results
+
+
+def get_poll_delay(interval: float, jitter: float = DEFAULT_WATCH_JITTER) -> float:
+    """poll interval with random jitter (fraction of the interval) - watchers do not poll in lockstep"""
+
+    return max(0.0, interval * (1 + random.uniform(-jitter, jitter)))
+
+
+async def watch_branding(
+    source_url: str,
+    target_urls: List[str],
+    connect: Callable[[str], Awaitable[DRACOON]],
+    interval: float = DEFAULT_WATCH_INTERVAL,
+    jitter: float = DEFAULT_WATCH_JITTER,
+    spray_on_start: bool = False,
+    on_prem_source: bool = False,
+    concurrency: int = DEFAULT_CONCURRENCY,
+    workers: int = DEFAULT_WORKERS,
+    cache: BrandingCache = None,
+    incremental: bool = False,
+    pool: ConnectionPool = None,
+    journal: RolloutJournal = None,
+    optimization: ImageOptimization = None,
+    max_polls: int = None,
+    on_spray: Callable[[List[TargetResult]], None] = None,
+    quiet: bool = False,
+    registry: UploadRegistry = None,
+):
+    """
+    poll a source branding and spray it to all targets whenever it changed
+    an unchanged source costs a single (conditional) request per poll - runs until cancelled
+    if a target fails, the branding is sprayed again on the next poll
+    on_spray is called with the results of every spray
+    """
+
+    # validators and changedAt of the branding sprayed last - only updated once all targets succeeded
+    etag = last_modified = changed_at = None
+    # first poll only records the current branding
+    baseline = not spray_on_start
+    polls = 0
+
+    if not quiet:
+        typer.echo(f"Watching branding of {source_url} (every {interval}s).")
+
+    while max_polls is None or polls < max_polls:
+        if polls:
+            await asyncio.sleep(get_poll_delay(interval=interval, jitter=jitter))
+        polls += 1
+
+        dracoon = await init_public_dracoon(url=source_url, on_prem_source=on_prem_source, pool=pool)
+        try:
+            with span("poll_source", url=source_url):
+                branding, new_etag, new_last_modified = await get_branding_revalidated(
+                    dracoon=dracoon, etag=etag, last_modified=last_modified
+                )
+        # keep watching
+        except (DCSprayError, httpx.HTTPError) as err:
+            if not quiet:
+                error_txt = typer.style("Error:", bg=typer.colors.RED, fg=typer.colors.WHITE)
+                typer.echo(f"{error_txt} {format_error(err)}")
+            continue
+        finally:
+            await dracoon.client.disconnect()
+
+        # not modified (HTTP 304) or no validators supported and unchanged
+        if branding is None:
+            continue
+        if branding.changedAt == changed_at or baseline:
+            etag, last_modified, changed_at = new_etag, new_last_modified, branding.changedAt
+            baseline = False
+            continue
+
+        if not quiet:
+            typer.echo(f"Source branding changed ({branding.changedAt}).")
+
+        try:
+            source = await fetch_source_branding(
+                source_url=source_url,
+                on_prem_source=on_prem_source,
+                concurrency=concurrency,
+                workers=workers,
+                cache=cache,
+                pool=pool,
+                quiet=True,
+                optimization=optimization,
+            )
+        except (DCSprayError, httpx.HTTPError) as err:
+            if not quiet:
+                error_txt = typer.style("Error:", bg=typer.colors.RED, fg=typer.colors.WHITE)
+                typer.echo(f"{error_txt} {format_error(err)}")
+            continue
+
+        results = await spray_branding_to_targets(
+            source_url=source_url,
+            target_urls=target_urls,
+            connect=connect,
+            concurrency=concurrency,
+            incremental=incremental,
+            pool=pool,
+            source=source,
+            journal=journal,
+            quiet=quiet,
+            registry=registry,
+        )
+        if on_spray:
+            on_spray(results)
+        if not quiet:
+            print_target_summary(results=results)
+
+        if all(result.success for result in results):
+            etag, last_modified, changed_at = new_etag, new_last_modified, source[0].changedAt
+        elif not quiet:
+            typer.echo("Failed targets are sprayed again on the next poll.")
+
+
+def print_target_summary(results: List[TargetResult], summary: str = "targets sprayed"):
+    """print success / failure per target"""
+
+    success_txt = typer.style("SUCCESS:", fg=typer.colors.GREEN, bold=True)
+    error_txt = typer.style("Error:", bg=typer.colors.RED, fg=typer.colors.WHITE)
+
+    for result in results:
+        if result.skipped:
+            typer.echo(f"{success_txt} {result.target_url} (already complete)")
+        elif result.success:
+            typer.echo(f"{success_txt} {result.target_url}")
+        else:
+            typer.echo(f"{error_txt} {result.target_url}: {result.error}")
+
+    failed = len([result for result in results if not result.success])
+    typer.echo(f"{len(results) - failed} of {len(results)} {summary}, {failed} failed.")
@@ -0,0 +1,327 @@
+import hashlib
+import json
+import os
+import shutil
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from dataclasses import dataclass, field, asdict
+from pathlib import Path
+from typing import IO, Callable, Dict, Iterator, List, Optional, Tuple
+
+import typer
+
+try:
+    import fcntl
+except ImportError:
+    # Windows
+    fcntl = None
+    import msvcrt
+
+
+CACHE_VERSION = 1
+# default cache size cap in bytes (100 MB)
+DEFAULT_CACHE_SIZE = 100 * 1024 * 1024
+INDEX_FILE = "index.json"
+# held while the index is read, changed and written (cache directory shared by concurrent runs)
+LOCK_FILE = "index.lock"
+OBJECTS_DIR = "objects"
+RESIZED_DIR = "resized"
+# resized images kept in memory / on disk (least recently used are removed first)
+MAX_RESIZED_IN_MEMORY = 16
+MAX_RESIZED_ON_DISK = 64
+
+
+def get_default_cache_dir() -> str:
+    """platform specific user cache directory for dcspray"""
+    return str(Path(typer.get_app_dir("dcspray")).joinpath("cache"))
+
+
+# chunk size used to hash streams
+HASH_CHUNK_SIZE = 64 * 1024
+
+
+def hash_content(content: bytes) -> str:
+    return hashlib.sha256(content).hexdigest()
+
+
+def hash_stream(stream: IO[bytes]) -> str:
+    """hash a binary stream chunk by chunk"""
+    sha256 = hashlib.sha256()
+    for chunk in iter(lambda: stream.read(HASH_CHUNK_SIZE), b""):
+        sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+@contextmanager
+def file_lock(path: Path) -> Iterator[None]:
+    """exclusive lock of a file shared by concurrent runs (blocks until free)"""
+    with open(path, "a+b") as lock:
+        if fcntl:
+            fcntl.flock(lock.fileno(), fcntl.LOCK_EX)
+        else:
+            lock.seek(0)
+            msvcrt.locking(lock.fileno(), msvcrt.LK_LOCK, 1)
+
+        try:
+            yield
+        finally:
+            if fcntl:
+                fcntl.flock(lock.fileno(), fcntl.LOCK_UN)
+            else:
+                lock.seek(0)
+                msvcrt.locking(lock.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+@dataclass
+class CachedImage:
+    image_type: str
+    file_name: str
+    sha256: str
+    size: int
+    # size before optimization (only set for optimized images)
+    original_size: int = None
+
+
+@dataclass
+class CacheEntry:
+    key: str
+    branding: dict
+    changed_at: str
+    images: List[CachedImage]
+    etag: str = None
+    last_modified: str = None
+    last_used: float = field(default_factory=time.time)
+
+    @property
+    def size(self) -> int:
+        return sum(image.size for image in self.images)
+
+
+class BrandingCache:
+    """
+    Content-addressed on-disk cache for branding JSON and (resized) images.
+    Entries are keyed by source url, images are stored once by SHA-256 and
+    entries are evicted least recently used first once the size cap is reached.
+    Changes are made under a file lock on the current index, so concurrent runs
+    sharing a cache directory keep each other's entries.
+    """
+
+    def __init__(self, cache_dir: str = None, max_size: int = DEFAULT_CACHE_SIZE):
+        self.path = Path(cache_dir or get_default_cache_dir())
+        self.objects = self.path.joinpath(OBJECTS_DIR)
+        self.max_size = max_size
+        self.objects.mkdir(parents=True, exist_ok=True)
+        self.entries: Dict[str, CacheEntry] = self._load_index()
+        # resized images are kept across runs
+        self.resized = ResizeMemo(directory=self.path.joinpath(RESIZED_DIR))
+
+    def _load_index(self) -> Dict[str, CacheEntry]:
+        index_path = self.path.joinpath(INDEX_FILE)
+
+        try:
+            with open(index_path, "r") as f:
+                index = json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+        # drop index of an incompatible cache layout
+        if index.get("version") != CACHE_VERSION:
+            return {}
+
+        entries = {}
+        for key, entry in index.get("entries", {}).items():
+            images = [CachedImage(**image) for image in entry.pop("images")]
+            entries[key] = CacheEntry(images=images, **entry)
+
+        return entries
+
+    def _write_index(self):
+        index = {
+            "version": CACHE_VERSION,
+            "entries": {key: asdict(entry) for key, entry in self.entries.items()},
+        }
+        self._write_atomic(self.path.joinpath(INDEX_FILE), json.dumps(index).encode("utf-8"))
+
+    @contextmanager
+    def _update_index(self) -> Iterator[None]:
+        """lock, reload (changes of other runs) and write the index after changing the entries"""
+        with file_lock(self.path.joinpath(LOCK_FILE)):
+            self.entries = self._load_index()
+            yield
+            self._write_index()
+
+    @staticmethod
+    def _write_atomic(path: Path, content: bytes):
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        with open(tmp_path, "wb") as f:
+            f.write(content)
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def _copy_atomic(path: Path, content: IO[bytes]):
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        with open(tmp_path, "wb") as f:
+            shutil.copyfileobj(content, f, HASH_CHUNK_SIZE)
+        os.replace(tmp_path, path)
+
+    def _object_path(self, sha256: str) -> Path:
+        return self.objects.joinpath(sha256)
+
+    def get(self, key: str) -> Optional[CacheEntry]:
+        """get a cache entry - only returned if all images are present (missing images are a cache miss)"""
+        entry = self.entries.get(key)
+
+        if not entry:
+            return None
+
+        for image in entry.images:
+            if not self._object_path(image.sha256).is_file():
+                self.entries.pop(key, None)
+                return None
+
+        return entry
+
+    def read_image(self, image: CachedImage, write: Callable[[bytes], None]):
+        """
+        pass image content chunk by chunk to write
+        raises OSError if removed (e.g. by a concurrent run) and ValueError if corrupt (after the last chunk)
+        """
+        sha256 = hashlib.sha256()
+
+        with open(self._object_path(image.sha256), "rb") as f:
+            for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+                sha256.update(chunk)
+                write(chunk)
+
+        if sha256.hexdigest() != image.sha256:
+            raise ValueError(f"Cached image {image.file_name} is corrupt.")
+
+    def touch(self, key: str, etag: str = None, last_modified: str = None):
+        """mark entry as recently used and store updated validators"""
+        with self._update_index():
+            entry = self.entries.get(key)
+            # evicted by a concurrent run
+            if not entry:
+                return
+            entry.last_used = time.time()
+            if etag:
+                entry.etag = etag
+            if last_modified:
+                entry.last_modified = last_modified
+
+    def put(self, key: str, branding: dict, changed_at: str,
+            images: List[Tuple[CachedImage, Callable[[], IO[bytes]]]],
+            etag: str = None, last_modified: str = None) -> CacheEntry:
+        """
+        store branding and image content (opened and copied chunk by chunk if not stored yet)
+        evicts old entries if required
+        """
+        entry = CacheEntry(key=key, branding=branding, changed_at=changed_at, images=[image for image, _ in images],
+                           etag=etag, last_modified=last_modified)
+
+        # objects are written under the lock - a concurrent eviction cannot remove them before they are referenced
+        with self._update_index():
+            for image, open_content in images:
+                object_path = self._object_path(image.sha256)
+                if not object_path.is_file():
+                    with open_content() as content:
+                        self._copy_atomic(object_path, content)
+
+            self.entries[key] = entry
+            self._evict(keep=key)
+
+        return entry
+
+    def evict(self, keep: str = None):
+        """remove least recently used entries until the cache fits the size cap"""
+        with self._update_index():
+            self._evict(keep=keep)
+
+    def _evict(self, keep: str = None):
+        entries = sorted(self.entries.values(), key=lambda entry: entry.last_used)
+        evicted = []
+
+        while self._referenced_size() > self.max_size and entries:
+            entry = entries.pop(0)
+            if entry.key == keep:
+                continue
+            evicted.append(self.entries.pop(entry.key))
+
+        self._remove_unreferenced(evicted)
+
+    def _referenced_size(self) -> int:
+        images = {image.sha256: image.size for entry in self.entries.values() for image in entry.images}
+        return sum(images.values())
+
+    def _remove_unreferenced(self, evicted: List[CacheEntry]):
+        """remove images of evicted entries unless still referenced by another entry"""
+        referenced = {image.sha256 for entry in self.entries.values() for image in entry.images}
+
+        for image in {image.sha256 for entry in evicted for image in entry.images} - referenced:
+            try:
+                self._object_path(image).unlink()
+            except FileNotFoundError:
+                pass
+
+
+class ResizeMemo:
+    """
+    Resized images keyed by source content hash and target dimensions.
+    Kept in memory (LRU) and optionally on disk to be reused across runs.
+    """
+
+    def __init__(self, directory: Path = None, max_entries: int = MAX_RESIZED_IN_MEMORY,
+                 max_files: int = MAX_RESIZED_ON_DISK):
+        self.directory = directory
+        self.max_entries = max_entries
+        self.max_files = max_files
+        self.entries: "OrderedDict[str, bytes]" = OrderedDict()
+
+        if directory:
+            directory.mkdir(parents=True, exist_ok=True)
+
+    @staticmethod
+    def make_key(source_hash: str, width: int, height: int) -> str:
+        return f"{source_hash}-{width}x{height}"
+
+    def get(self, key: str) -> Optional[bytes]:
+        if key in self.entries:
+            self.entries.move_to_end(key)
+            return self.entries[key]
+
+        if not self.directory:
+            return None
+
+        path = self.directory.joinpath(key)
+        try:
+            content = path.read_bytes()
+            # mark as recently used
+            os.utime(path)
+        except OSError:
+            return None
+
+        self._remember(key, content)
+        return content
+
+    def put(self, key: str, content: bytes):
+        self._remember(key, content)
+
+        if not self.directory:
+            return
+
+        BrandingCache._write_atomic(self.directory.joinpath(key), content)
+
+        files = sorted(
+            (path for path in self.directory.iterdir() if path.suffix != ".tmp"),
+            key=lambda path: path.stat().st_mtime,
+        )
+        for path in files[:max(0, len(files) - self.max_files)]:
+            path.unlink()
+
+    def _remember(self, key: str, content: bytes):
+        self.entries[key] = content
+        self.entries.move_to_end(key)
+
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
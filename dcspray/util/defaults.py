@@ -0,0 +1,13 @@
+# defaults shared by the CLI and the branding helpers
+# (kept free of heavy imports so that the CLI starts fast)
+
+# maximum number of concurrent image transfers / targets
+DEFAULT_CONCURRENCY = 5
+# worker threads used to resize images (app and web logo)
+DEFAULT_WORKERS = 2
+# seconds between polls of a watched source
+DEFAULT_WATCH_INTERVAL = 300
+# random deviation of the poll interval (fraction of the interval)
+DEFAULT_WATCH_JITTER = 0.1
+# bytes buffered by image transfers in flight (downloads, uploads) - further transfers wait
+DEFAULT_MEMORY_BUDGET = 16 * 1024 * 1024
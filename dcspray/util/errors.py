@@ -0,0 +1,42 @@
+# errors raised by dcspray - the CLI reports them and exits, embedding applications handle them
+# (kept free of heavy imports so that the CLI starts fast)
+
+
+class DCSprayError(Exception):
+    """base class of all dcspray errors (message is shown by the CLI)"""
+
+
+class InvalidDRACOONUrlError(DCSprayError):
+    """url is not a (reachable) DRACOON instance"""
+
+
+class AuthenticationFailedError(DCSprayError):
+    """authentication failed (wrong credentials / code / client or invalid url)"""
+
+    def __init__(self, message: str, status_code: int = None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class BrandingError(DCSprayError):
+    """getting, uploading or updating a branding failed (status code if caused by an HTTP error)"""
+
+    def __init__(self, message: str, status_code: int = None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class SourceBrandingError(BrandingError):
+    """getting the source branding or its images failed"""
+
+
+class TargetBrandingError(BrandingError):
+    """uploading images or updating the branding of a target failed"""
+
+
+class InvalidArchiveError(DCSprayError):
+    """branding archive is malformed, incomplete or corrupted"""
+
+
+class VerificationFailedError(DCSprayError):
+    """target branding does not match the sprayed branding after an update"""
@@ -0,0 +1,141 @@
+import json
+import os
+from dataclasses import dataclass, field
+from typing import IO, Dict, Optional, Tuple
+
+
+# steps recorded per target (in order of a rollout)
+STEP_UPLOAD = "upload"
+STEP_UPDATE = "update"
+STEP_VERIFY = "verify"
+# drops all progress of a target (e.g. uploads no longer valid)
+STEP_RESET = "reset"
+
+
+@dataclass
+class TargetProgress:
+    # image type -> (upload id, SHA-256 of uploaded image)
+    uploads: Dict[str, Tuple[int, str]] = field(default_factory=dict)
+    # source fingerprint of the last update / verification
+    updated: str = None
+    verified: str = None
+    # image type -> image id of the last update payload
+    updated_images: Dict[str, int] = field(default_factory=dict)
+
+
+class RolloutJournal:
+    """
+    Append-only journal (JSON lines) of a rollout to many targets.
+    Every step is appended as a single line and synced to disk, so a rerun after a crash
+    can skip targets (and uploads) that are already complete.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.targets: Dict[str, TargetProgress] = {}
+        self._replay()
+        self._file: IO[str] = open(path, "a")
+
+        # terminate a line torn by a crash before appending
+        if self._file.tell() > 0 and not self._ends_with_newline():
+            self._file.write("\n")
+
+    def _ends_with_newline(self) -> bool:
+        with open(self.path, "rb") as f:
+            f.seek(-1, os.SEEK_END)
+            return f.read(1) == b"\n"
+
+    def _replay(self):
+        if not os.path.isfile(self.path):
+            return
+
+        with open(self.path, "r") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # incomplete line (process died while writing)
+                    continue
+                self._apply(record)
+
+    def _apply(self, record: dict):
+        step = record.get("step")
+        target = record.get("target")
+
+        if step == STEP_RESET:
+            self.targets.pop(target, None)
+            return
+
+        progress = self.targets.setdefault(target, TargetProgress())
+
+        if step == STEP_UPLOAD:
+            progress.uploads[record["image_type"]] = (record["id"], record["sha256"])
+        elif step == STEP_UPDATE:
+            progress.updated = record["fingerprint"]
+            progress.updated_images = record["images"]
+        elif step == STEP_VERIFY:
+            progress.verified = record["fingerprint"]
+
+    def append(self, record: dict):
+        self._apply(record)
+        self._file.write(json.dumps(record) + "\n")
+        self._file.flush()
+        # on disk before the next step starts (survives a power loss, not only a crash of the process)
+        os.fsync(self._file.fileno())
+
+    def for_target(self, target_url: str, fingerprint: str) -> "TargetJournal":
+        return TargetJournal(journal=self, target_url=target_url, fingerprint=fingerprint)
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self) -> "RolloutJournal":
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class TargetJournal:
+    """ progress of a single target for a source branding (identified by its fingerprint) """
+
+    def __init__(self, journal: RolloutJournal, target_url: str, fingerprint: str):
+        self.journal = journal
+        self.target_url = target_url
+        self.fingerprint = fingerprint
+
+    @property
+    def progress(self) -> TargetProgress:
+        return self.journal.targets.get(self.target_url) or TargetProgress()
+
+    @property
+    def updated(self) -> bool:
+        return self.progress.updated == self.fingerprint
+
+    @property
+    def verified(self) -> bool:
+        return self.progress.verified == self.fingerprint
+
+    def get_upload(self, image_type: str, sha256: str) -> Optional[int]:
+        """ id of an image uploaded in a previous run (only if content is identical) """
+        upload = self.progress.uploads.get(image_type)
+
+        if upload and upload[1] == sha256:
+            return upload[0]
+
+        return None
+
+    def _append(self, step: str, **record):
+        self.journal.append({"target": self.target_url, "step": step, **record})
+
+    def record_upload(self, image_type: str, sha256: str, image_id: int):
+        self._append(STEP_UPLOAD, image_type=image_type, sha256=sha256, id=image_id)
+
+    def record_update(self, image_ids: Dict[str, int]):
+        self._append(STEP_UPDATE, fingerprint=self.fingerprint, images=image_ids)
+
+    def record_verified(self):
+        self._append(STEP_VERIFY, fingerprint=self.fingerprint)
+
+    def reset(self):
+        self._append(STEP_RESET)
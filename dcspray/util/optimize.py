@@ -0,0 +1,136 @@
+import io
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List
+
+import typer
+from dracoon.branding.responses import ImageType
+
+
+# JPEG quality range searched to fit a byte budget
+MIN_JPEG_QUALITY = 40
+MAX_JPEG_QUALITY = 95
+# palette sizes searched to fit a byte budget (PNG)
+MIN_PNG_COLORS = 16
+MAX_PNG_COLORS = 256
+# EXIF orientation tag (1: not rotated / mirrored)
+EXIF_ORIENTATION = 0x0112
+
+
+@dataclass
+class ImageOptimization:
+    """ optimize images before upload - budgets (in bytes) allow lossy compression per image type """
+    budgets: Dict[ImageType, int] = field(default_factory=dict)
+
+    @property
+    def cache_key(self) -> str:
+        """ cached images depend on the budgets used """
+        budgets = ",".join(
+            f"{img_type.value}={budget}"
+            for img_type, budget in sorted(self.budgets.items(), key=lambda item: item[0].value)
+        )
+        return f"optimize:{budgets}"
+
+
+def parse_byte_budgets(values: List[str]) -> Dict[ImageType, int]:
+    """ parse byte budgets given as TYPE=KB (e.g. webSplashImage=500) """
+    budgets = {}
+
+    for value in values:
+        img_type, _, size = value.partition("=")
+        try:
+            budgets[ImageType(img_type)] = int(size) * 1024
+        except ValueError:
+            valid_types = ", ".join(img_type.value for img_type in ImageType)
+            raise typer.BadParameter(f"Invalid byte budget {value} (expected TYPE=KB, types: {valid_types}).")
+
+    return budgets
+
+
+def _save(image, image_format: str, **params) -> bytes:
+    """ save image without metadata (only the color profile is kept) """
+    content = io.BytesIO()
+    image.save(content, image_format, icc_profile=image.info.get("icc_profile"), **params)
+    return content.getvalue()
+
+
+def apply_orientation(image):
+    """ rotate / mirror the pixels as given by the EXIF orientation (the tag is stripped on save) """
+    from PIL import ImageOps
+
+    if image.getexif().get(EXIF_ORIENTATION, 1) == 1:
+        return image
+
+    return ImageOps.exif_transpose(image)
+
+
+def recompress(image, image_format: str) -> bytes:
+    """
+    lossless recompression (PNG) - JPEG is saved with its original quantization tables
+    (rotated JPEG images are re-encoded with the highest quality searched)
+    """
+    if image_format == "PNG":
+        return _save(image, "PNG", optimize=True)
+
+    if image.format != "JPEG":
+        return _save(image, "JPEG", quality=MAX_JPEG_QUALITY, optimize=True)
+
+    return _save(image, "JPEG", quality="keep", optimize=True)
+
+
+def search_budget(encode: Callable[[int], bytes], low: int, high: int, budget: int) -> bytes:
+    """ binary search for the highest setting (quality / colors) that fits the budget """
+    best = None
+
+    while low <= high:
+        middle = (low + high) // 2
+        content = encode(middle)
+
+        if len(content) <= budget:
+            best = content
+            low = middle + 1
+        else:
+            high = middle - 1
+
+    # budget not reachable: smallest possible result
+    return best or encode(low)
+
+
+def fit_budget(image, image_format: str, budget: int) -> bytes:
+    """ lossy compression (JPEG quality / PNG palette size) to fit a byte budget """
+    from PIL import Image
+
+    if image_format == "JPEG":
+        return search_budget(
+            lambda quality: _save(image, "JPEG", quality=quality, optimize=True),
+            MIN_JPEG_QUALITY, MAX_JPEG_QUALITY, budget,
+        )
+
+    rgba = image.convert("RGBA")
+    return search_budget(
+        lambda colors: _save(rgba.quantize(colors=colors, method=Image.FASTOCTREE), "PNG", optimize=True),
+        MIN_PNG_COLORS, MAX_PNG_COLORS, budget,
+    )
+
+
+def optimize_image_bytes(content: bytes, budget: int = None) -> bytes:
+    """
+    strip metadata and recompress an image (PNG / JPEG) - other formats are not changed
+    if a budget (bytes) is given and not met, the image is compressed lossy to fit
+    never returns a larger image than the original
+    """
+    # imported here: Pillow is only required if images are optimized
+    from PIL import Image
+
+    with Image.open(io.BytesIO(content)) as image:
+        image_format = image.format
+
+        if image_format not in ("PNG", "JPEG"):
+            return content
+
+        oriented = apply_orientation(image)
+        candidates = [content, recompress(oriented, image_format)]
+
+        if budget and min(len(candidate) for candidate in candidates) > budget:
+            candidates.append(fit_budget(oriented, image_format, budget))
+
+    return min(candidates, key=len)
@@ -0,0 +1,92 @@
+import httpx
+from dracoon import DRACOON
+from dracoon.client import DEFAULT_TIMEOUT_CONFIG
+
+from dcspray.util.defaults import DEFAULT_MEMORY_BUDGET
+from dcspray.util.retry import RetryPolicy, RetryTransport
+from dcspray.util.transfer import MemoryBudget, memory_budget
+
+
+# keep idle connections open long enough to be reused across phases
+DEFAULT_KEEPALIVE_EXPIRY = 60
+DEFAULT_MAX_CONNECTIONS = 100
+DEFAULT_MAX_KEEPALIVE_CONNECTIONS = 20
+
+
+class SharedTransport(httpx.AsyncBaseTransport):
+    """ transport wrapper that ignores close - the pool closes the transport """
+
+    def __init__(self, transport: httpx.AsyncBaseTransport):
+        self.transport = transport
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        return await self.transport.handle_async_request(request)
+
+    async def aclose(self):
+        pass
+
+
+class ConnectionPool:
+    """
+    Shared keep-alive connection pool for all DRACOON clients of a run.
+    Each host gets one TLS handshake which is reused by every client attached to the pool.
+    Throttled and failed requests are retried with backoff (rate limited per host).
+    Image transfers of all clients share the memory budget of the pool (in bytes).
+    """
+
+    def __init__(self, http2: bool = False, max_connections: int = DEFAULT_MAX_CONNECTIONS,
+                 max_keepalive_connections: int = DEFAULT_MAX_KEEPALIVE_CONNECTIONS,
+                 keepalive_expiry: float = DEFAULT_KEEPALIVE_EXPIRY, retry_policy: RetryPolicy = None,
+                 memory_budget: int = DEFAULT_MEMORY_BUDGET):
+        limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_keepalive_connections,
+                              keepalive_expiry=keepalive_expiry)
+
+        # raises ImportError if HTTP/2 support (h2) is not installed
+        # connection errors are retried by the retry transport only (no retries of httpcore)
+        self._transport = httpx.AsyncHTTPTransport(http2=http2, limits=limits)
+        # also used for retries of streamed uploads (see retry_call)
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.transport = SharedTransport(RetryTransport(self._transport, policy=self.retry_policy))
+        self.http2 = http2
+        self.memory_budget = MemoryBudget(limit=memory_budget)
+
+    def make_client(self, headers: httpx.Headers = None) -> httpx.AsyncClient:
+        return httpx.AsyncClient(headers=headers, timeout=DEFAULT_TIMEOUT_CONFIG, transport=self.transport)
+
+    async def attach(self, dracoon: DRACOON) -> DRACOON:
+        """ replace the httpx clients of a DRACOON instance by pooled clients (the original clients are closed) """
+        client = dracoon.client
+        original_clients = (client.http, client.uploader, client.downloader)
+
+        client.http = self.make_client(headers=client.http.headers)
+        client.uploader = self.make_client(headers=client.uploader.headers)
+        client.downloader = self.make_client(headers=client.downloader.headers)
+
+        for original_client in original_clients:
+            await original_client.aclose()
+
+        return dracoon
+
+    async def close(self):
+        await self._transport.aclose()
+
+    async def __aenter__(self) -> "ConnectionPool":
+        return self
+
+    async def __aexit__(self, *args):
+        await self.close()
+
+
+async def init_dracoon(base_url: str, pool: ConnectionPool = None, **kwargs) -> DRACOON:
+    """ create a DRACOON instance - uses pooled connections if a pool is given """
+    dracoon = DRACOON(base_url=base_url, **kwargs)
+
+    if pool:
+        await pool.attach(dracoon)
+
+    return dracoon
+
+
+def get_memory_budget(pool: ConnectionPool = None) -> MemoryBudget:
+    """ memory budget of a pool - transfers without a pool share the process-wide budget """
+    return pool.memory_budget if pool else memory_budget
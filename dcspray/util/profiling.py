@@ -0,0 +1,131 @@
+import asyncio
+import json
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Dict, Iterator, List, Optional
+
+import typer
+
+
+@dataclass
+class Span:
+    name: str
+    start: float
+    end: float = None
+    # bytes transferred (downloaded / uploaded) or processed
+    bytes: int = 0
+    # lane of the span (one per asyncio task)
+    lane: int = 0
+    attributes: Dict[str, str] = field(default_factory=dict)
+
+    @property
+    def duration(self) -> float:
+        return (self.end or time.perf_counter()) - self.start
+
+
+class Profiler:
+    """
+    Records spans of all phases (verify, authenticate, download, resize, upload, update).
+    Spans can be printed as a summary table or exported as Chrome trace or JSON lines.
+    """
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.spans: List[Span] = []
+        self._lanes: Dict[int, int] = {}
+
+    def lane(self) -> int:
+        """ lane per asyncio task so that concurrent spans do not overlap in a trace """
+        try:
+            task = asyncio.current_task()
+        except RuntimeError:
+            task = None
+        return self._lanes.setdefault(id(task), len(self._lanes))
+
+    def print_summary(self):
+        """ print count, total / average / max duration and bytes per span name """
+        groups: Dict[str, List[Span]] = {}
+        for recorded in self.spans:
+            groups.setdefault(recorded.name, []).append(recorded)
+
+        typer.echo(f"{'phase':<22}{'count':>7}{'total':>11}{'avg':>11}{'max':>11}{'bytes':>13}")
+        for name, spans in groups.items():
+            durations = [recorded.duration for recorded in spans]
+            total_bytes = sum(recorded.bytes for recorded in spans)
+            typer.echo(f"{name:<22}{len(spans):>7}{sum(durations) * 1000:>8.1f} ms"
+                       f"{sum(durations) / len(spans) * 1000:>8.1f} ms{max(durations) * 1000:>8.1f} ms"
+                       f"{total_bytes:>13}")
+
+        typer.echo(f"Total wall time: {(time.perf_counter() - self.start) * 1000:.1f} ms")
+
+    def _relative_us(self, timestamp: float) -> int:
+        return int((timestamp - self.start) * 1_000_000)
+
+    def to_chrome_trace(self) -> dict:
+        events = [
+            {
+                "name": recorded.name,
+                "cat": "dcspray",
+                "ph": "X",
+                "ts": self._relative_us(recorded.start),
+                "dur": int(recorded.duration * 1_000_000),
+                "pid": os.getpid(),
+                "tid": recorded.lane,
+                "args": {**recorded.attributes, "bytes": recorded.bytes},
+            }
+            for recorded in self.spans
+        ]
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def write_trace(self, path: str):
+        """ write spans as JSON lines (.jsonl) or Chrome trace (any other extension) """
+        if path.endswith(".jsonl"):
+            with open(path, "w") as f:
+                for recorded in self.spans:
+                    f.write(json.dumps({
+                        "name": recorded.name,
+                        "start_ms": self._relative_us(recorded.start) / 1000,
+                        "duration_ms": recorded.duration * 1000,
+                        "bytes": recorded.bytes,
+                        **recorded.attributes,
+                    }) + "\n")
+            return
+
+        with open(path, "w") as f:
+            json.dump(self.to_chrome_trace(), f)
+
+
+_profiler: ContextVar[Optional[Profiler]] = ContextVar("dcspray_profiler", default=None)
+
+
+def start_profiling() -> Profiler:
+    """ record spans for the current context (and all tasks created from it) """
+    profiler = Profiler()
+    _profiler.set(profiler)
+    return profiler
+
+
+def get_profiler() -> Optional[Profiler]:
+    return _profiler.get()
+
+
+@contextmanager
+def span(name: str, **attributes) -> Iterator[Span]:
+    """ time a phase - only recorded if profiling is enabled """
+    profiler = _profiler.get()
+    recorded = Span(name=name, start=time.perf_counter(),
+                    attributes={key: str(value) for key, value in attributes.items()})
+
+    if profiler is None:
+        yield recorded
+        return
+
+    recorded.lane = profiler.lane()
+    try:
+        yield recorded
+    finally:
+        recorded.end = time.perf_counter()
+        profiler.spans.append(recorded)
@@ -0,0 +1,217 @@
+import asyncio
+import random
+import time
+from dataclasses import dataclass
+from email.utils import parsedate_to_datetime
+from typing import Awaitable, Callable, Dict, TypeVar
+
+import httpx
+from dracoon.errors import DRACOONHttpError
+
+from dcspray.util.profiling import span
+
+
+# rate limited / temporarily unavailable - any other status is not retried
+RETRY_STATUS_CODES = {429, 502, 503, 504}
+# host asks for fewer requests (503 only with Retry-After) - bad gateways do not reduce the rate
+THROTTLE_STATUS_CODES = {429, 503}
+# request was not sent - retried for any method
+UNSENT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+# request may have been processed - only retried for idempotent methods
+TRANSIENT_ERRORS = (httpx.TimeoutException, httpx.NetworkError, httpx.RemoteProtocolError)
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}
+DEFAULT_MAX_RETRIES = 5
+# backoff in seconds (exponential with full jitter)
+DEFAULT_BACKOFF_BASE = 0.5
+DEFAULT_BACKOFF_MAX = 30
+# upper bound for waiting on a Retry-After header (seconds)
+DEFAULT_MAX_RETRY_AFTER = 120
+# adaptive request rate per host (requests per second)
+DEFAULT_MAX_RATE = 100
+DEFAULT_MIN_RATE = 1
+# additive increase per successful request after being throttled
+RATE_INCREASE = 0.5
+# response extension set if the host was throttled for a response that is handed back (not retried)
+# the next request to the host waits in the bucket - callers retrying the request do not wait again
+THROTTLED_EXTENSION = "dcspray.throttled"
+
+T = TypeVar("T")
+
+
+def parse_retry_after(retry_after: str) -> float:
+    """ Retry-After in seconds (delay seconds or HTTP date) - None if missing or invalid """
+    if not retry_after:
+        return None
+
+    try:
+        return max(0.0, float(retry_after))
+    except ValueError:
+        pass
+
+    try:
+        return max(0.0, parsedate_to_datetime(retry_after).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+@dataclass
+class RetryPolicy:
+    max_retries: int = DEFAULT_MAX_RETRIES
+    backoff_base: float = DEFAULT_BACKOFF_BASE
+    backoff_max: float = DEFAULT_BACKOFF_MAX
+    max_retry_after: float = DEFAULT_MAX_RETRY_AFTER
+
+    def get_delay(self, attempt: int, response: httpx.Response = None) -> float:
+        """ delay before the next attempt - honors Retry-After of the response """
+        retry_after = parse_retry_after(response.headers.get("retry-after")) if response is not None else None
+
+        if retry_after is not None:
+            # small jitter so that throttled requests do not retry all at once
+            return min(retry_after, self.max_retry_after) + random.uniform(0, self.backoff_base)
+
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    def should_retry(self, attempt: int, response: httpx.Response) -> bool:
+        return attempt < self.max_retries and response.status_code in RETRY_STATUS_CODES
+
+    @staticmethod
+    def is_throttled(response: httpx.Response) -> bool:
+        if response.status_code not in THROTTLE_STATUS_CODES:
+            return False
+        return response.status_code == 429 or parse_retry_after(response.headers.get("retry-after")) is not None
+
+    @staticmethod
+    def is_retryable_error(request: httpx.Request, err: httpx.TransportError) -> bool:
+        """ connection failures are retried - failures after sending only for idempotent methods """
+        if isinstance(err, UNSENT_ERRORS):
+            return True
+        return isinstance(err, TRANSIENT_ERRORS) and request.method in IDEMPOTENT_METHODS
+
+
+class TokenBucket:
+    """
+    Adaptive per-host rate limit: the rate is halved whenever the host throttles (429 / 503)
+    and increased again with every successful request (AIMD).
+    """
+
+    def __init__(self, max_rate: float = DEFAULT_MAX_RATE, min_rate: float = DEFAULT_MIN_RATE):
+        self.max_rate = max_rate
+        self.min_rate = min_rate
+        self.rate = max_rate
+        self.tokens = max_rate
+        self.updated = time.monotonic()
+        # no requests to the host before this time (Retry-After)
+        self.blocked_until = 0.0
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.rate, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self):
+        """ wait for a free request slot """
+        while True:
+            blocked = self.blocked_until - time.monotonic()
+            if blocked > 0:
+                await asyncio.sleep(blocked)
+                continue
+
+            self._refill()
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+    def on_success(self):
+        self.rate = min(self.max_rate, self.rate + RATE_INCREASE)
+
+    def on_throttled(self, delay: float = 0):
+        self.rate = max(self.min_rate, self.rate / 2)
+        self.tokens = min(self.tokens, self.rate)
+        self.blocked_until = max(self.blocked_until, time.monotonic() + delay)
+
+
+class RetryTransport(httpx.AsyncBaseTransport):
+    """
+    Transport retrying throttled (429), unavailable (502 - 504) and failed requests with backoff.
+    Connection failures are retried for any method, other transport errors only for idempotent methods.
+    Requests with streamed bodies (e.g. multipart uploads) are not retried here - their
+    callers have to re-open the stream (see retry_call).
+    """
+
+    def __init__(self, transport: httpx.AsyncBaseTransport, policy: RetryPolicy = None):
+        self.transport = transport
+        self.policy = policy or RetryPolicy()
+        self.buckets: Dict[str, TokenBucket] = {}
+
+    def get_bucket(self, host: str) -> TokenBucket:
+        if host not in self.buckets:
+            self.buckets[host] = TokenBucket()
+        return self.buckets[host]
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        bucket = self.get_bucket(request.url.host)
+        # bodies held in memory can be sent again
+        replayable = isinstance(request.stream, httpx.ByteStream)
+        attempt = 0
+
+        while True:
+            await bucket.acquire()
+
+            try:
+                response = await self.transport.handle_async_request(request)
+            except httpx.TransportError as err:
+                if (
+                    not replayable
+                    or attempt >= self.policy.max_retries
+                    or not self.policy.is_retryable_error(request, err)
+                ):
+                    raise
+                delay = self.policy.get_delay(attempt)
+            else:
+                if response.status_code not in RETRY_STATUS_CODES:
+                    bucket.on_success()
+                    return response
+
+                delay = self.policy.get_delay(attempt, response)
+                throttled = self.policy.is_throttled(response)
+                if throttled:
+                    bucket.on_throttled(delay)
+
+                if not replayable or not self.policy.should_retry(attempt, response):
+                    if throttled:
+                        response.extensions[THROTTLED_EXTENSION] = True
+                    return response
+
+                await response.aclose()
+
+            with span("retry_wait", host=request.url.host, attempt=attempt + 1):
+                await asyncio.sleep(delay)
+            attempt += 1
+
+    async def aclose(self):
+        await self.transport.aclose()
+
+
+async def retry_call(call: Callable[[], Awaitable[T]], policy: RetryPolicy = None) -> T:
+    """
+    retry a DRACOON call failing with a retryable status
+    call has to create its request (and re-open streamed bodies) on every attempt
+    responses throttled by the retry transport are retried at once - the transport waits for the host
+    """
+    policy = policy or RetryPolicy()
+    attempt = 0
+
+    while True:
+        try:
+            return await call()
+        except DRACOONHttpError as err:
+            response = err.error.response
+            if not policy.should_retry(attempt, response):
+                raise
+
+        if not response.extensions.get(THROTTLED_EXTENSION):
+            with span("retry_wait", host=response.url.host, attempt=attempt + 1):
+                await asyncio.sleep(policy.get_delay(attempt, response))
+        attempt += 1
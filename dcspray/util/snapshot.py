@@ -0,0 +1,207 @@
+import json
+import re
+import shutil
+import time
+import zipfile
+from dataclasses import dataclass, asdict
+from pathlib import Path
+from typing import IO, Callable, Dict, List
+
+from dracoon.branding.responses import ImageType
+
+from dcspray.util.cache import HASH_CHUNK_SIZE, hash_stream
+from dcspray.util.errors import InvalidArchiveError
+
+
+# archives without index use the legacy layout (branding.json and images, no manifest)
+ARCHIVE_VERSION = 2
+SNAPSHOT_INDEX = "snapshot.json"
+IMAGES_DIR = "images"
+TENANTS_DIR = "tenants"
+
+
+@dataclass
+class ManifestImage:
+    image_type: ImageType
+    # original file name (e.g. webLogo_large.png)
+    file_name: str
+    sha256: str
+    size: int
+    # archive member holding the image content
+    path: str
+
+    def to_dict(self) -> dict:
+        return {**asdict(self), "image_type": self.image_type.value}
+
+    @classmethod
+    def from_dict(cls, image: dict) -> "ManifestImage":
+        return cls(**{**image, "image_type": ImageType(image["image_type"])})
+
+
+@dataclass
+class TenantManifest:
+    source_url: str
+    # public branding (JSON)
+    branding: dict
+    images: List[ManifestImage]
+    saved_at: float
+
+    def to_dict(self) -> dict:
+        return {**asdict(self), "images": [image.to_dict() for image in self.images]}
+
+    @classmethod
+    def from_dict(cls, manifest: dict) -> "TenantManifest":
+        return cls(
+            **{**manifest, "images": [ManifestImage.from_dict(image) for image in manifest["images"]]}
+        )
+
+
+def make_tenant_name(source_url: str) -> str:
+    """file system safe name of a source (host and path)"""
+    name = re.sub(r"^https?://", "", source_url).strip("/")
+    return re.sub(r"[^A-Za-z0-9.-]", "_", name)
+
+
+def has_member(archive: zipfile.ZipFile, name: str) -> bool:
+    """lookup in the central directory (no scan of all members)"""
+    try:
+        archive.getinfo(name)
+    except KeyError:
+        return False
+    return True
+
+
+class SnapshotWriter:
+    """
+    Writes brandings of one or many sources into a single zip file.
+    Images are stored once by content hash, every tenant has a manifest pointing to its images.
+    """
+
+    def __init__(self, archive: zipfile.ZipFile, compression: Callable[[str], int] = None):
+        self.archive = archive
+        self.compression = compression
+        # sha256 -> archive member
+        self.images: Dict[str, str] = {}
+        # source url -> tenant manifest member
+        self.tenants: Dict[str, str] = {}
+        # bytes not written because identical images were already stored
+        self.deduplicated = 0
+
+    def add_image(self, image_type: ImageType, file_name: str, open_content: Callable[[], IO[bytes]]) -> ManifestImage:
+        """image content is hashed and copied chunk by chunk (never held in memory)"""
+        with open_content() as content:
+            sha256 = hash_stream(content)
+            size = content.tell()
+        path = self.images.get(sha256)
+
+        if path:
+            self.deduplicated += size
+        else:
+            path = f"{IMAGES_DIR}/{sha256}{Path(file_name).suffix.lower()}"
+            info = zipfile.ZipInfo(path, date_time=time.localtime(time.time())[:6])
+            info.compress_type = self.compression(file_name) if self.compression else zipfile.ZIP_STORED
+            info.external_attr = 0o600 << 16
+            with open_content() as content, self.archive.open(info, "w") as member:
+                shutil.copyfileobj(content, member, HASH_CHUNK_SIZE)
+            self.images[sha256] = path
+
+        return ManifestImage(image_type=image_type, file_name=file_name, sha256=sha256, size=size, path=path)
+
+    def add_tenant(self, source_url: str, branding: dict, images: List[ManifestImage]):
+        name = make_tenant_name(source_url)
+        path = f"{TENANTS_DIR}/{name}.json"
+
+        # different urls with the same name (e.g. trailing slash)
+        suffix = 1
+        while path in self.tenants.values():
+            suffix += 1
+            path = f"{TENANTS_DIR}/{name}_{suffix}.json"
+
+        manifest = TenantManifest(source_url=source_url, branding=branding, images=images, saved_at=time.time())
+        self.archive.writestr(path, json.dumps(manifest.to_dict()), compress_type=zipfile.ZIP_DEFLATED)
+        self.tenants[source_url] = path
+
+    def write_index(self):
+        index = {
+            "version": ARCHIVE_VERSION,
+            "tenants": self.tenants,
+            "images": len(self.images),
+        }
+        self.archive.writestr(SNAPSHOT_INDEX, json.dumps(index), compress_type=zipfile.ZIP_DEFLATED)
+
+
+class SnapshotReader:
+    """
+    Reads brandings from a zip file written by SnapshotWriter.
+    Images are looked up in the central directory and checked against the manifest (size, SHA-256)
+    without decoding them.
+    """
+
+    def __init__(self, archive: zipfile.ZipFile):
+        self.archive = archive
+
+        try:
+            index = json.loads(archive.read(SNAPSHOT_INDEX))
+        except (KeyError, ValueError):
+            raise InvalidArchiveError("Missing or invalid snapshot index.")
+
+        version = index.get("version")
+        if version != ARCHIVE_VERSION:
+            raise InvalidArchiveError(
+                f"Unsupported archive version {version} (expected {ARCHIVE_VERSION}) - "
+                "please save the branding again with this version of dcspray."
+            )
+
+        # source url -> tenant manifest member
+        self.tenants: Dict[str, str] = index.get("tenants") or {}
+
+    @staticmethod
+    def is_snapshot(archive: zipfile.ZipFile) -> bool:
+        return has_member(archive, SNAPSHOT_INDEX)
+
+    def get_tenant(self, source_url: str = None) -> TenantManifest:
+        """manifest of a source - may be omitted if the archive contains a single branding"""
+
+        if source_url is None:
+            if len(self.tenants) != 1:
+                sources = ", ".join(self.tenants)
+                raise InvalidArchiveError(f"Archive contains several brandings, please select a source ({sources}).")
+            path = next(iter(self.tenants.values()))
+        else:
+            path = self.tenants.get(source_url) or self.tenants.get(source_url.rstrip("/"))
+
+        if not path:
+            raise InvalidArchiveError(f"No branding from {source_url} in archive.")
+
+        try:
+            return TenantManifest.from_dict(json.loads(self.archive.read(path)))
+        except (KeyError, ValueError, TypeError):
+            raise InvalidArchiveError(f"Missing or invalid manifest {path}.")
+
+    def verify(self, manifest: TenantManifest, required: List[ImageType] = None):
+        """check all images of a manifest exist and match size and SHA-256 - raises InvalidArchiveError"""
+
+        image_types = {image.image_type for image in manifest.images}
+        missing_types = [img_type.value for img_type in required or [] if img_type not in image_types]
+
+        if missing_types:
+            raise InvalidArchiveError(f"Missing images: {', '.join(missing_types)}.")
+
+        for image in manifest.images:
+            try:
+                info = self.archive.getinfo(image.path)
+            except KeyError:
+                raise InvalidArchiveError(f"Missing image {image.path}.")
+
+            # size from the central directory - content is only hashed if the size matches
+            if info.file_size != image.size:
+                raise InvalidArchiveError(f"Size mismatch of image {image.path}.")
+
+            try:
+                with self.archive.open(info) as content:
+                    sha256 = hash_stream(content)
+            except zipfile.BadZipFile:
+                raise InvalidArchiveError(f"Corrupted image {image.path}.")
+
+            if sha256 != image.sha256:
+                raise InvalidArchiveError(f"Checksum mismatch of image {image.path}.")
@@ -0,0 +1,105 @@
+import base64
+import json
+import os
+import time
+from dataclasses import dataclass, asdict
+from pathlib import Path
+from typing import Dict, Optional
+
+import typer
+from cryptography.fernet import Fernet, InvalidToken
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
+from dracoon.client import DRACOONConnection
+
+
+TOKEN_STORE_VERSION = 1
+TOKEN_STORE_FILE = "tokens.json"
+# passphrase used to encrypt the token store (prompted if not set)
+TOKEN_STORE_SECRET_ENV = "DCSPRAY_TOKEN_STORE_SECRET"
+KDF_ITERATIONS = 390_000
+SALT_SIZE = 16
+
+
+def get_default_token_store_path() -> str:
+    """platform specific user directory for dcspray"""
+    return str(Path(typer.get_app_dir("dcspray")).joinpath(TOKEN_STORE_FILE))
+
+
+def derive_key(secret: str, salt: bytes) -> bytes:
+    kdf = PBKDF2HMAC(algorithm=hashes.SHA256(), length=32, salt=salt, iterations=KDF_ITERATIONS)
+    return base64.urlsafe_b64encode(kdf.derive(secret.encode("utf-8")))
+
+
+@dataclass
+class StoredToken:
+    # access tokens are not stored: they are revoked on logout and a refresh is a single request
+    refresh_token: str
+    # epoch seconds
+    updated_at: float
+
+    @classmethod
+    def from_connection(cls, connection: DRACOONConnection) -> "StoredToken":
+        return cls(refresh_token=connection.refresh_token, updated_at=time.time())
+
+
+class TokenStore:
+    """
+    Encrypted local store of OAuth refresh tokens keyed by target url and client id.
+    Tokens are encrypted (Fernet) with a key derived from a passphrase, the file is only readable by the user.
+    """
+
+    def __init__(self, secret: str, path: str = None):
+        self.path = Path(path or get_default_token_store_path())
+        self.tokens: Dict[str, StoredToken] = {}
+
+        store = self._read()
+
+        if store and store.get("version") == TOKEN_STORE_VERSION:
+            self.salt = base64.b64decode(store["salt"])
+            self.fernet = Fernet(derive_key(secret, self.salt))
+            try:
+                tokens = json.loads(self.fernet.decrypt(store["tokens"].encode("utf-8")))
+            except InvalidToken:
+                raise ValueError("Invalid token store passphrase.")
+            self.tokens = {key: StoredToken(**token) for key, token in tokens.items()}
+        else:
+            self.salt = os.urandom(SALT_SIZE)
+            self.fernet = Fernet(derive_key(secret, self.salt))
+
+    def _read(self) -> Optional[dict]:
+        try:
+            with open(self.path, "r") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write(self):
+        tokens = json.dumps({key: asdict(token) for key, token in self.tokens.items()})
+        store = {
+            "version": TOKEN_STORE_VERSION,
+            "salt": base64.b64encode(self.salt).decode("ascii"),
+            "tokens": self.fernet.encrypt(tokens.encode("utf-8")).decode("ascii"),
+        }
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w") as f:
+            json.dump(store, f)
+        os.replace(tmp_path, self.path)
+
+    @staticmethod
+    def make_key(target_url: str, client_id: str) -> str:
+        return f"{client_id}@{target_url.rstrip('/')}"
+
+    def get(self, target_url: str, client_id: str) -> Optional[StoredToken]:
+        return self.tokens.get(self.make_key(target_url, client_id))
+
+    def put(self, target_url: str, client_id: str, connection: DRACOONConnection):
+        self.tokens[self.make_key(target_url, client_id)] = StoredToken.from_connection(connection)
+        self._write()
+
+    def remove(self, target_url: str, client_id: str):
+        if self.tokens.pop(self.make_key(target_url, client_id), None):
+            self._write()
@@ -0,0 +1,108 @@
+import asyncio
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Callable, Deque, Tuple
+
+import httpx
+
+from dcspray.util.defaults import DEFAULT_MEMORY_BUDGET
+
+
+# size of chunks read from the network (multipart uploads are read in chunks of the same size)
+TRANSFER_CHUNK_SIZE = 64 * 1024
+# memory reserved per transfer in flight - network read buffer, chunker and the chunk being processed
+TRANSFER_BUFFER_SIZE = 4 * TRANSFER_CHUNK_SIZE
+
+
+class MemoryBudget:
+    """
+    Cap on bytes buffered by all transfers in flight (a few chunks per streamed transfer).
+    Transfers wait for a free share of the budget first come, first served - memory stays flat
+    no matter how many targets are sprayed at once, additional transfers are delayed instead.
+    """
+
+    def __init__(self, limit: int = DEFAULT_MEMORY_BUDGET):
+        self.limit = limit
+        self.in_use = 0
+        # highest number of bytes reserved at the same time
+        self.peak = 0
+        self._waiters: Deque[Tuple[int, asyncio.Future]] = deque()
+
+    def _take(self, size: int):
+        self.in_use += size
+        self.peak = max(self.peak, self.in_use)
+
+    def _wake(self):
+        while self._waiters:
+            size, waiter = self._waiters[0]
+            if waiter.done():
+                # cancelled while waiting
+                self._waiters.popleft()
+                continue
+            if self.in_use + size > self.limit:
+                break
+            self._waiters.popleft()
+            self._take(size)
+            waiter.set_result(None)
+
+    async def acquire(self, size: int) -> int:
+        """wait until size bytes are available - returns the reserved size (at most the limit)"""
+
+        # a transfer larger than the budget runs alone
+        size = min(size, self.limit)
+
+        if not self._waiters and self.in_use + size <= self.limit:
+            self._take(size)
+            return size
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append((size, waiter))
+
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # reserved right before cancellation
+                self.release(size)
+            else:
+                self._wake()
+            raise
+
+        return size
+
+    def release(self, size: int):
+        self.in_use -= size
+        self._wake()
+
+    @asynccontextmanager
+    async def reserve(self, size: int) -> AsyncIterator[None]:
+        size = await self.acquire(size)
+        try:
+            yield
+        finally:
+            self.release(size)
+
+
+# shared by transfers without a connection pool (each pool has its own budget)
+memory_budget = MemoryBudget()
+
+
+async def stream_download(
+    http: httpx.AsyncClient, url: str, write: Callable[[bytes], None], budget: MemoryBudget = None,
+    chunk_size: int = TRANSFER_CHUNK_SIZE,
+) -> httpx.Response:
+    """
+    GET a url and pass the body chunk by chunk to write - raises httpx.HTTPStatusError
+    the transfer buffer is reserved from the memory budget while the transfer is in flight
+    """
+
+    async with (budget or memory_budget).reserve(TRANSFER_BUFFER_SIZE):
+        async with http.stream("GET", url) as res:
+            if res.is_error:
+                # error details (small) are read for logging
+                await res.aread()
+                res.raise_for_status()
+            async for chunk in res.aiter_bytes(chunk_size):
+                write(chunk)
+
+    return res
@@ -0,0 +1,92 @@
+import json
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+import typer
+
+from dcspray.util.cache import BrandingCache, file_lock
+
+
+REGISTRY_VERSION = 1
+REGISTRY_FILE = "uploads.json"
+# held while the registry is read, changed and written (shared by concurrent runs)
+LOCK_FILE = "uploads.lock"
+
+
+def get_default_registry_dir() -> str:
+    """platform specific user directory for dcspray"""
+    return typer.get_app_dir("dcspray")
+
+
+class UploadRegistry:
+    """
+    Images uploaded to targets by incremental sprays: target url -> image type -> (image id, SHA-256 of the source image).
+    Servers may re-encode uploaded images, so a target image is unchanged if it still uses the recorded id
+    of an upload with the same source content (image bytes of the target are never compared).
+    """
+
+    def __init__(self, registry_dir: str = None):
+        self.path = Path(registry_dir or get_default_registry_dir())
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.targets: Dict[str, Dict[str, Tuple[int, str]]] = self._load()
+
+    def _load(self) -> Dict[str, Dict[str, Tuple[int, str]]]:
+        try:
+            with open(self.path.joinpath(REGISTRY_FILE), "r") as f:
+                registry = json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+        if registry.get("version") != REGISTRY_VERSION:
+            return {}
+
+        return {
+            target_url: {image_type: (upload["id"], upload["sha256"]) for image_type, upload in uploads.items()}
+            for target_url, uploads in registry.get("targets", {}).items()
+        }
+
+    def _write(self):
+        registry = {
+            "version": REGISTRY_VERSION,
+            "targets": {
+                target_url: {image_type: {"id": image_id, "sha256": sha256}
+                             for image_type, (image_id, sha256) in uploads.items()}
+                for target_url, uploads in self.targets.items()
+            },
+        }
+        BrandingCache._write_atomic(self.path.joinpath(REGISTRY_FILE), json.dumps(registry).encode("utf-8"))
+
+    def get_upload(self, target_url: str, image_type: str, sha256: str) -> Optional[int]:
+        """ id of the image uploaded last (only if content is identical) """
+        upload = self.targets.get(target_url, {}).get(image_type)
+
+        if upload and upload[1] == sha256:
+            return upload[0]
+
+        return None
+
+    def record_upload(self, target_url: str, image_type: str, sha256: str, image_id: int):
+        # reload under the lock - keeps uploads recorded by concurrent runs
+        with file_lock(self.path.joinpath(LOCK_FILE)):
+            self.targets = self._load()
+            self.targets.setdefault(target_url, {})[image_type] = (image_id, sha256)
+            self._write()
+
+    def for_target(self, target_url: str) -> "TargetUploads":
+        return TargetUploads(registry=self, target_url=target_url)
+
+
+class TargetUploads:
+    """ uploads of a single target (same interface as TargetJournal) """
+
+    def __init__(self, registry: UploadRegistry, target_url: str):
+        self.registry = registry
+        self.target_url = target_url
+
+    def get_upload(self, image_type: str, sha256: str) -> Optional[int]:
+        return self.registry.get_upload(target_url=self.target_url, image_type=image_type, sha256=sha256)
+
+    def record_upload(self, image_type: str, sha256: str, image_id: int):
+        self.registry.record_upload(
+            target_url=self.target_url, image_type=image_type, sha256=sha256, image_id=image_id
+        )
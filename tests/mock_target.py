@@ -0,0 +1,77 @@
+""" in process stand-in for the branding endpoints of a target (based on respx) """
+import json
+from datetime import datetime
+
+import httpx
+import respx
+from dracoon import DRACOON
+from dracoon.branding.responses import ImageType
+from dracoon.client import DRACOONConnection
+
+from dcspray.util.branding import ImageDownload
+
+TARGET_URL = "https://target.dracoon.test"
+
+BRANDING = {
+    "createdAt": "2022-01-01T00:00:00.000Z",
+    "changedAt": "2022-01-01T00:00:00.000Z",
+    "productName": "DRACOON",
+    "colors": [
+        {"type": "main", "colorDetails": [{"type": "normal", "rgba": "0,0,0,1"}, {"type": "light", "rgba": "1,1,1,1"}]}
+    ],
+    "colorizeHeader": True,
+    "imprintUrl": "https://dracoon.test/imprint",
+    "privacyUrl": "https://dracoon.test/privacy",
+    "supportUrl": "https://dracoon.test/support",
+    "emailContact": "support@dracoon.test",
+    "images": [],
+    "positionLoginBox": 1,
+    "appearanceLoginBox": "light",
+    "texts": [{"type": "terms", "languages": [{"languageTag": "en-US", "content": "Terms"}]}],
+}
+
+IMAGES = [
+    ImageDownload(file_path="webLogo.png", image_type=ImageType.WEB_LOGO, content=b"web logo"),
+    ImageDownload(file_path="appLogo.png", image_type=ImageType.APP_LOGO, content=b"app logo"),
+]
+
+
+def connected_target() -> DRACOON:
+    dracoon = DRACOON(base_url=TARGET_URL, raise_on_err=True)
+    dracoon.client.connection = DRACOONConnection(datetime.now(), "access_token", 3600, "refresh_token")
+    dracoon.client.connected = True
+    return dracoon
+
+
+class MockTarget:
+    """target branding endpoints - images are re-encoded on upload (served content differs)"""
+
+    def __init__(self, router: respx.MockRouter, images: dict = None):
+        self.uploads = 0
+        self.updates = 0
+        self.branding = {**BRANDING, "images": self._images(images or {})}
+
+        router.post(url__startswith=f"{TARGET_URL}/branding/api/v1/branding/files").mock(side_effect=self._upload)
+        router.put(f"{TARGET_URL}/branding/api/v1/branding").mock(side_effect=self._update)
+        router.get(f"{TARGET_URL}/branding/api/v1/branding").mock(
+            side_effect=lambda request: httpx.Response(200, json=self.branding)
+        )
+        router.get(url__startswith=f"{TARGET_URL}/images/").respond(200, content=b"re-encoded")
+
+    @staticmethod
+    def _images(images: dict) -> list:
+        return [
+            {"id": image_id, "type": image_type, "url": f"{TARGET_URL}/images/{image_id}"}
+            for image_type, image_id in images.items()
+        ]
+
+    def _upload(self, request: httpx.Request) -> httpx.Response:
+        self.uploads += 1
+        return httpx.Response(200, json={"id": 100 + self.uploads, "createdAt": "2022-01-01T00:00:00.000Z"})
+
+    def _update(self, request: httpx.Request) -> httpx.Response:
+        self.updates += 1
+        payload = json.loads(request.content)
+        images = {image["type"]: image["id"] for image in payload.pop("images")}
+        self.branding = {**self.branding, **payload, "images": self._images(images)}
+        return httpx.Response(200, json=self.branding)
@@ -0,0 +1,113 @@
+import io
+import threading
+import time
+
+import pytest
+
+from dcspray.util.cache import BrandingCache, CachedImage, hash_content
+
+SOURCE_URL = "https://source.dracoon.test"
+
+
+def make_image(content: bytes, image_type: str = "webLogo"):
+    image = CachedImage(image_type=image_type, file_name=f"{image_type}_large.png",
+                        sha256=hash_content(content), size=len(content))
+    return image, lambda: io.BytesIO(content)
+
+
+def put(cache: BrandingCache, key: str, *contents: bytes):
+    return cache.put(key, branding={"productName": key}, changed_at="2022-01-01T00:00:00.000Z",
+                     images=[make_image(content) for content in contents])
+
+
+def read(cache: BrandingCache, image: CachedImage) -> bytes:
+    content = bytearray()
+    cache.read_image(image, content.extend)
+    return bytes(content)
+
+
+def test_miss(tmp_path):
+    cache = BrandingCache(cache_dir=str(tmp_path))
+
+    assert cache.get(SOURCE_URL) is None
+
+
+def test_hit_across_runs(tmp_path):
+    put(BrandingCache(cache_dir=str(tmp_path)), SOURCE_URL, b"logo", b"splash")
+
+    entry = BrandingCache(cache_dir=str(tmp_path)).get(SOURCE_URL)
+
+    assert entry.branding == {"productName": SOURCE_URL}
+    assert [read(BrandingCache(cache_dir=str(tmp_path)), image) for image in entry.images] == [b"logo", b"splash"]
+
+
+def test_missing_image_is_a_miss(tmp_path):
+    cache = BrandingCache(cache_dir=str(tmp_path))
+    entry = put(cache, SOURCE_URL, b"logo")
+
+    cache._object_path(entry.images[0].sha256).unlink()
+
+    assert cache.get(SOURCE_URL) is None
+
+
+def test_corrupt_image_is_detected(tmp_path):
+    cache = BrandingCache(cache_dir=str(tmp_path))
+    entry = put(cache, SOURCE_URL, b"logo")
+
+    cache._object_path(entry.images[0].sha256).write_bytes(b"lego")
+
+    with pytest.raises(ValueError):
+        read(cache, entry.images[0])
+
+
+def test_least_recently_used_is_evicted_first(tmp_path, monkeypatch):
+    cache = BrandingCache(cache_dir=str(tmp_path), max_size=30)
+    put(cache, "a", b"a" * 10)
+    put(cache, "b", b"b" * 10, b"shared")
+
+    # a used after b
+    clock = iter(range(int(time.time()) + 10, int(time.time()) + 100))
+    monkeypatch.setattr(time, "time", lambda: next(clock))
+    cache.touch("b")
+    cache.touch("a")
+
+    put(cache, "c", b"c" * 10, b"shared")
+
+    entries = BrandingCache(cache_dir=str(tmp_path), max_size=30).entries
+    assert sorted(entries) == ["a", "c"]
+    # images of b are removed unless still used by c
+    assert not cache._object_path(hash_content(b"b" * 10)).exists()
+    assert cache._object_path(hash_content(b"shared")).exists()
+
+
+def test_entry_larger_than_cache_is_kept(tmp_path):
+    cache = BrandingCache(cache_dir=str(tmp_path), max_size=5)
+    put(cache, "a", b"a" * 10)
+
+    assert BrandingCache(cache_dir=str(tmp_path), max_size=5).get("a")
+
+
+def test_concurrent_writers_keep_all_entries(tmp_path):
+    """ two runs sharing a cache directory (each with its own cache instance) """
+    keys = 20
+    errors = []
+
+    def _write(writer: str):
+        try:
+            cache = BrandingCache(cache_dir=str(tmp_path))
+            for i in range(keys):
+                put(cache, f"{writer}-{i}", f"{writer}-{i}".encode(), b"shared")
+        except Exception as err:
+            errors.append(err)
+
+    writers = [threading.Thread(target=_write, args=(writer,)) for writer in ("a", "b")]
+    for writer in writers:
+        writer.start()
+    for writer in writers:
+        writer.join()
+
+    assert errors == []
+    cache = BrandingCache(cache_dir=str(tmp_path))
+    assert len(cache.entries) == 2 * keys
+    for key in cache.entries:
+        assert [read(cache, image) for image in cache.get(key).images] == [key.encode(), b"shared"]
@@ -0,0 +1,41 @@
+import subprocess
+import sys
+
+MODULE = "dcspray.cli"
+# only required by commands - must not be imported by the CLI module itself
+DEFERRED_MODULES = ["dracoon", "httpx", "pydantic", "PIL", "cryptography"]
+# same budget as benchmarks/importtime.py
+BUDGET_MS = 250
+RUNS = 3
+
+
+def measure_import():
+    """ top level packages imported and cumulative import time (ms) of the CLI in a fresh interpreter """
+    res = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {MODULE}"],
+                         capture_output=True, text=True, check=True)
+    imported = set()
+    total_ms = None
+
+    for line in res.stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        _, cumulative_us, name = line[len("import time:"):].split("|")
+        imported.add(name.strip().split(".")[0])
+        if name.strip() == MODULE:
+            total_ms = int(cumulative_us) / 1000
+
+    return imported, total_ms
+
+
+def test_heavy_modules_are_not_imported():
+    imported, _ = measure_import()
+
+    assert [module for module in DEFERRED_MODULES if module in imported] == []
+
+
+def test_import_time_budget():
+    # first run warms up bytecode caches
+    measure_import()
+    best_ms = min(measure_import()[1] for _ in range(RUNS))
+
+    assert best_ms <= BUDGET_MS
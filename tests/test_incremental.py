@@ -0,0 +1,85 @@
+import asyncio
+
+import respx
+from dracoon.branding.responses import CacheableBrandingResponse
+
+from dcspray.util.branding import push_branding, update_target_branding
+from dcspray.util.uploads import UploadRegistry
+
+from mock_target import BRANDING, IMAGES, TARGET_URL, MockTarget, connected_target
+
+
+def push(registry: UploadRegistry):
+    return asyncio.run(
+        push_branding(
+            target_dracoon=connected_target(),
+            branding=CacheableBrandingResponse(**BRANDING),
+            images=IMAGES,
+            semaphore=asyncio.Semaphore(2),
+            incremental=True,
+            registry=registry,
+        )
+    )
+
+
+@respx.mock
+def test_second_run_skips_re_encoded_images(tmp_path):
+    # target serves re-encoded images - content differs from the uploaded source images
+    target = MockTarget(respx.mock)
+
+    assert push(UploadRegistry(registry_dir=str(tmp_path))) is not None
+    assert target.uploads == 2
+    assert target.updates == 1
+
+    # uploads are read from the registry of the previous run
+    assert push(UploadRegistry(registry_dir=str(tmp_path))) is None
+    assert target.uploads == 2
+    assert target.updates == 1
+
+
+@respx.mock
+def test_changed_image_is_uploaded(tmp_path):
+    target = MockTarget(respx.mock)
+    registry = UploadRegistry(registry_dir=str(tmp_path))
+    push(registry)
+
+    # source image changed since the recorded upload
+    registry.record_upload(target_url=TARGET_URL, image_type="webLogo", sha256="changed", image_id=101)
+
+    assert push(registry) is not None
+    assert target.uploads == 3
+    assert target.updates == 2
+
+
+@respx.mock
+def test_image_replaced_on_target_is_uploaded(tmp_path):
+    target = MockTarget(respx.mock)
+    registry = UploadRegistry(registry_dir=str(tmp_path))
+    push(registry)
+
+    # image replaced on the target (e.g. in the web UI) - recorded id no longer used
+    target.branding["images"][0]["id"] = 7
+
+    assert push(registry) is not None
+    assert target.uploads == 3
+    assert target.updates == 2
+
+
+@respx.mock
+def test_update_target_branding_skips_second_run(tmp_path):
+    target = MockTarget(respx.mock)
+
+    for _ in range(2):
+        asyncio.run(
+            update_target_branding(
+                dracoon=connected_target(),
+                branding_dict=CacheableBrandingResponse(**BRANDING).dict(),
+                images=IMAGES,
+                incremental=True,
+                quiet=True,
+                registry=UploadRegistry(registry_dir=str(tmp_path)),
+            )
+        )
+
+    assert target.uploads == 2
+    assert target.updates == 1
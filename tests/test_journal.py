@@ -0,0 +1,140 @@
+import asyncio
+import os
+
+import respx
+from dracoon.branding.responses import CacheableBrandingResponse
+
+from dcspray.util.branding import push_branding
+from dcspray.util.journal import RolloutJournal
+
+from mock_target import BRANDING, IMAGES, TARGET_URL, MockTarget, connected_target
+
+FINGERPRINT = "source-fingerprint"
+
+
+def push(journal: RolloutJournal):
+    return asyncio.run(
+        push_branding(
+            target_dracoon=connected_target(),
+            branding=CacheableBrandingResponse(**BRANDING),
+            images=IMAGES,
+            semaphore=asyncio.Semaphore(2),
+            journal=journal.for_target(TARGET_URL, FINGERPRINT),
+        )
+    )
+
+
+def test_replay_restores_progress(tmp_path):
+    path = str(tmp_path / "journal.jsonl")
+
+    with RolloutJournal(path) as journal:
+        target = journal.for_target(TARGET_URL, FINGERPRINT)
+        target.record_upload(image_type="webLogo", sha256="abc", image_id=1)
+        target.record_update(image_ids={"webLogo": 1})
+
+    with RolloutJournal(path) as journal:
+        target = journal.for_target(TARGET_URL, FINGERPRINT)
+        assert target.get_upload(image_type="webLogo", sha256="abc") == 1
+        assert target.get_upload(image_type="webLogo", sha256="changed") is None
+        assert target.updated
+        assert not target.verified
+        assert target.progress.updated_images == {"webLogo": 1}
+        # progress of another source branding does not count
+        assert not journal.for_target(TARGET_URL, "other").updated
+
+
+def test_replay_skips_torn_line(tmp_path):
+    path = str(tmp_path / "journal.jsonl")
+
+    with RolloutJournal(path) as journal:
+        journal.for_target(TARGET_URL, FINGERPRINT).record_update(image_ids={})
+
+    with open(path, "a") as f:
+        f.write('{"target": "https://tar')
+
+    with RolloutJournal(path) as journal:
+        target = journal.for_target(TARGET_URL, FINGERPRINT)
+        assert target.updated
+        target.record_verified()
+
+    with RolloutJournal(path) as journal:
+        assert journal.for_target(TARGET_URL, FINGERPRINT).verified
+
+
+def test_append_syncs_to_disk(tmp_path, monkeypatch):
+    path = str(tmp_path / "journal.jsonl")
+    synced = []
+    monkeypatch.setattr(os, "fsync", lambda fd: synced.append(fd))
+
+    with RolloutJournal(path) as journal:
+        target = journal.for_target(TARGET_URL, FINGERPRINT)
+        target.record_update(image_ids={})
+        target.record_verified()
+
+    assert len(synced) == 2
+
+
+def test_replay_applies_reset(tmp_path):
+    path = str(tmp_path / "journal.jsonl")
+
+    with RolloutJournal(path) as journal:
+        target = journal.for_target(TARGET_URL, FINGERPRINT)
+        target.record_upload(image_type="webLogo", sha256="abc", image_id=1)
+        target.reset()
+
+    with RolloutJournal(path) as journal:
+        target = journal.for_target(TARGET_URL, FINGERPRINT)
+        assert target.get_upload(image_type="webLogo", sha256="abc") is None
+        assert not target.updated
+
+
+@respx.mock
+def test_push_verifies_re_encoded_images(tmp_path):
+    path = str(tmp_path / "journal.jsonl")
+    target = MockTarget(respx.mock)
+
+    with RolloutJournal(path) as journal:
+        assert push(journal) is not None
+
+    with RolloutJournal(path) as journal:
+        assert journal.for_target(TARGET_URL, FINGERPRINT).verified
+
+    assert target.uploads == 2
+    assert target.updates == 1
+
+
+@respx.mock
+def test_resume_verifies_recorded_update(tmp_path):
+    path = str(tmp_path / "journal.jsonl")
+    # previous run updated the target, but died before verification
+    target = MockTarget(respx.mock, images={"webLogo": 1, "appLogo": 2})
+
+    with RolloutJournal(path) as journal:
+        progress = journal.for_target(TARGET_URL, FINGERPRINT)
+        progress.record_upload(image_type="webLogo", sha256=IMAGES[0].hash(), image_id=1)
+        progress.record_upload(image_type="appLogo", sha256=IMAGES[1].hash(), image_id=2)
+        progress.record_update(image_ids={"webLogo": 1, "appLogo": 2})
+
+    with RolloutJournal(path) as journal:
+        assert push(journal) is None
+        assert journal.for_target(TARGET_URL, FINGERPRINT).verified
+
+    assert target.uploads == 0
+    assert target.updates == 0
+
+
+@respx.mock
+def test_resume_updates_again_if_target_changed(tmp_path):
+    path = str(tmp_path / "journal.jsonl")
+    # target branding was changed after the recorded update
+    target = MockTarget(respx.mock, images={"webLogo": 7, "appLogo": 2})
+
+    with RolloutJournal(path) as journal:
+        journal.for_target(TARGET_URL, FINGERPRINT).record_update(image_ids={"webLogo": 1, "appLogo": 2})
+
+    with RolloutJournal(path) as journal:
+        assert push(journal) is not None
+        assert journal.for_target(TARGET_URL, FINGERPRINT).verified
+
+    assert target.uploads == 2
+    assert target.updates == 1
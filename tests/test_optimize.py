@@ -0,0 +1,54 @@
+import io
+import random
+
+from PIL import Image
+
+from dcspray.util.optimize import EXIF_ORIENTATION, optimize_image_bytes
+
+# rotated 90° clockwise for display
+ORIENTATION_ROTATE_90 = 6
+
+
+def make_photo(size=(120, 60), orientation: int = None) -> bytes:
+    """ noisy JPEG (does not compress well) - top half red, bottom half blue """
+    rng = random.Random(0)
+    width, height = size
+    image = Image.new("RGB", size)
+    image.putdata([
+        ((200, 0, 0) if y < height // 2 else (0, 0, 200)) if rng.random() < 0.8
+        else (rng.randrange(256), rng.randrange(256), rng.randrange(256))
+        for y in range(height) for _ in range(width)
+    ])
+
+    exif = Image.Exif()
+    if orientation:
+        exif[EXIF_ORIENTATION] = orientation
+
+    buffer = io.BytesIO()
+    image.save(buffer, "JPEG", quality=100, exif=exif.tobytes())
+    return buffer.getvalue()
+
+
+def test_recompressed_jpeg_is_not_larger():
+    content = make_photo()
+    optimized = optimize_image_bytes(content)
+
+    assert len(optimized) <= len(content)
+    with Image.open(io.BytesIO(optimized)) as image:
+        assert image.size == (120, 60)
+
+
+def test_orientation_is_applied_before_stripping_metadata():
+    content = make_photo(orientation=ORIENTATION_ROTATE_90)
+    optimized = optimize_image_bytes(content, budget=len(content) // 2)
+
+    assert len(optimized) < len(content)
+    with Image.open(io.BytesIO(optimized)) as image:
+        # pixels rotated, orientation tag no longer needed
+        assert image.size == (60, 120)
+        assert image.getexif().get(EXIF_ORIENTATION, 1) == 1
+        # top half red -> right half red
+        red, _, blue = image.getpixel((50, 60))
+        assert red > blue
+        red, _, blue = image.getpixel((10, 60))
+        assert blue > red
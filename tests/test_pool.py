@@ -0,0 +1,45 @@
+import asyncio
+
+import respx
+from dracoon import DRACOON
+
+from dcspray.util.pool import ConnectionPool, init_dracoon
+
+from mock_target import TARGET_URL
+
+
+def test_attach_closes_original_clients():
+    async def run():
+        async with ConnectionPool() as pool:
+            dracoon = DRACOON(base_url=TARGET_URL)
+            client = dracoon.client
+            original_clients = [client.http, client.uploader, client.downloader]
+
+            await pool.attach(dracoon)
+
+            assert all(original_client.is_closed for original_client in original_clients)
+            assert not any(pooled_client.is_closed
+                           for pooled_client in (client.http, client.uploader, client.downloader))
+            # headers (user agent) are kept
+            assert client.http.headers["User-Agent"] == original_clients[0].headers["User-Agent"]
+
+    asyncio.run(run())
+
+
+@respx.mock
+def test_pooled_clients_share_the_transport():
+    respx.get(f"{TARGET_URL}/api/v4/public/software/version").respond(200, json={})
+
+    async def run():
+        async with ConnectionPool() as pool:
+            first = await init_dracoon(base_url=TARGET_URL, pool=pool)
+            second = await init_dracoon(base_url=TARGET_URL, pool=pool)
+
+            assert first.client.http._transport is second.client.downloader._transport
+            await first.client.disconnect()
+
+            # closing a client does not close the pool
+            response = await second.client.http.get(f"{TARGET_URL}/api/v4/public/software/version")
+            assert response.status_code == 200
+
+    asyncio.run(run())
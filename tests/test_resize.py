@@ -0,0 +1,64 @@
+import asyncio
+import io
+
+import respx
+from dracoon.branding.responses import ImageType
+from PIL import Image
+
+from dcspray.util.branding import (
+    BRANDING_IMAGES,
+    RESIZE_DIMENSIONS,
+    download_images,
+    init_public_dracoon,
+    resize_image_bytes,
+)
+from dcspray.util.cache import ResizeMemo
+
+SOURCE_URL = "https://source.dracoon.test"
+
+
+def make_image(image_format: str, size=(300, 200)) -> bytes:
+    buffer = io.BytesIO()
+    Image.new("RGB", size, (200, 10, 10)).save(buffer, image_format)
+    return buffer.getvalue()
+
+
+def mock_source(router: respx.MockRouter, jpeg_types: list):
+    for img_type in BRANDING_IMAGES:
+        image_format = "JPEG" if img_type in jpeg_types else "PNG"
+        router.get(
+            f"{SOURCE_URL}/branding/api/v1/public/branding/files/{img_type.value}/large"
+        ).respond(200, content=make_image(image_format), headers={"content-type": f"image/{image_format.lower()}"})
+
+
+def download() -> dict:
+    async def _download():
+        dracoon = await init_public_dracoon(url=SOURCE_URL)
+        return await download_images(dracoon=dracoon, quiet=True, memo=ResizeMemo())
+
+    return {img.image_type: img for img in asyncio.run(_download())}
+
+
+def test_resize_jpeg_logo_to_png():
+    resized = resize_image_bytes(make_image("JPEG"), img_type=ImageType.WEB_LOGO)
+
+    with Image.open(io.BytesIO(resized)) as image:
+        assert image.format == "PNG"
+        assert image.size == RESIZE_DIMENSIONS[ImageType.WEB_LOGO]
+
+
+@respx.mock
+def test_downloaded_jpeg_logo_is_named_png():
+    mock_source(respx.mock, jpeg_types=[ImageType.WEB_LOGO, ImageType.WEB_SPLASH_IMAGE])
+
+    images = download()
+
+    web_logo = images[ImageType.WEB_LOGO]
+    assert web_logo.file_path == "webLogo_large.png"
+    with Image.open(io.BytesIO(web_logo.content)) as image:
+        assert image.format == "PNG"
+        assert image.size == RESIZE_DIMENSIONS[ImageType.WEB_LOGO]
+
+    # images that are not resized keep their format
+    assert images[ImageType.WEB_SPLASH_IMAGE].file_path == "webSplashImage_large.jpeg"
+    assert images[ImageType.APP_LOGO].file_path == "appLogo_large.png"
@@ -0,0 +1,168 @@
+import asyncio
+from email.utils import format_datetime
+from datetime import datetime, timedelta, timezone
+
+import httpx
+import pytest
+from dracoon.errors import DRACOONHttpError
+
+from dcspray.util.retry import RetryPolicy, RetryTransport, THROTTLED_EXTENSION, retry_call
+
+
+URL = "https://dracoon.team/api/v4/test"
+
+
+class ScriptedTransport(httpx.AsyncBaseTransport):
+    """ returns (or raises) the scripted results in order """
+
+    def __init__(self, *results):
+        self.results = list(results)
+        self.requests = 0
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        self.requests += 1
+        result = self.results.pop(0)
+        if isinstance(result, Exception):
+            raise result
+        return httpx.Response(result[0], headers=result[1] if len(result) > 1 else None)
+
+
+async def stream_body():
+    yield b"image"
+
+
+def send(transport: httpx.AsyncBaseTransport, method: str = "GET", **kwargs) -> httpx.Response:
+    async def run():
+        async with httpx.AsyncClient(transport=transport) as client:
+            return await client.request(method, URL, **kwargs)
+
+    return asyncio.run(run())
+
+
+def test_backoff_is_exponential_and_capped():
+    policy = RetryPolicy(backoff_base=1, backoff_max=5)
+
+    for _ in range(50):
+        assert 0 <= policy.get_delay(0) <= 1
+        assert 0 <= policy.get_delay(2) <= 4
+        assert 0 <= policy.get_delay(10) <= 5
+
+
+def test_retry_after_seconds_and_date():
+    policy = RetryPolicy(backoff_base=0, max_retry_after=60)
+
+    assert policy.get_delay(0, httpx.Response(429, headers={"Retry-After": "7"})) == 7
+    # capped
+    assert policy.get_delay(0, httpx.Response(429, headers={"Retry-After": "3600"})) == 60
+
+    retry_date = format_datetime(datetime.now(timezone.utc) + timedelta(seconds=30), usegmt=True)
+    delay = policy.get_delay(0, httpx.Response(503, headers={"Retry-After": retry_date}))
+    assert 25 <= delay <= 30
+
+
+def test_throttled_status():
+    assert RetryPolicy.is_throttled(httpx.Response(429))
+    assert RetryPolicy.is_throttled(httpx.Response(503, headers={"Retry-After": "1"}))
+    assert not RetryPolicy.is_throttled(httpx.Response(503))
+    assert not RetryPolicy.is_throttled(httpx.Response(502))
+
+
+def test_retryable_status_is_retried():
+    inner = ScriptedTransport((503,), (429, {"Retry-After": "0"}), (200,))
+    response = send(RetryTransport(inner, RetryPolicy(backoff_base=0)))
+
+    assert response.status_code == 200
+    assert inner.requests == 3
+
+
+def test_other_status_is_not_retried():
+    inner = ScriptedTransport((500,), (200,))
+    response = send(RetryTransport(inner, RetryPolicy(backoff_base=0)))
+
+    assert response.status_code == 500
+    assert inner.requests == 1
+
+
+def test_gives_up_after_max_retries():
+    inner = ScriptedTransport((502,), (502,), (502,), (200,))
+    response = send(RetryTransport(inner, RetryPolicy(max_retries=2, backoff_base=0)))
+
+    assert response.status_code == 502
+    assert inner.requests == 3
+
+
+def test_transport_errors_only_retried_for_idempotent_requests():
+    request_error = httpx.ReadError("connection reset")
+
+    inner = ScriptedTransport(request_error, (200,))
+    assert send(RetryTransport(inner, RetryPolicy(backoff_base=0)), "GET").status_code == 200
+    assert inner.requests == 2
+
+    # may have been processed - not sent again
+    inner = ScriptedTransport(request_error, (201,))
+    with pytest.raises(httpx.ReadError):
+        send(RetryTransport(inner, RetryPolicy(backoff_base=0)), "POST", content=b"{}")
+    assert inner.requests == 1
+
+    # never sent - retried for any method
+    inner = ScriptedTransport(httpx.ConnectError("refused"), (201,))
+    assert send(RetryTransport(inner, RetryPolicy(backoff_base=0)), "POST", content=b"{}").status_code == 201
+    assert inner.requests == 2
+
+
+def test_streamed_request_is_not_replayed():
+    inner = ScriptedTransport((429, {"Retry-After": "0"}), (201,))
+    response = send(RetryTransport(inner, RetryPolicy(backoff_base=0)), "POST", content=stream_body())
+
+    assert response.status_code == 429
+    assert response.extensions[THROTTLED_EXTENSION]
+    assert inner.requests == 1
+
+
+class CountingPolicy(RetryPolicy):
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.delays = 0
+
+    def get_delay(self, attempt: int, response: httpx.Response = None) -> float:
+        self.delays += 1
+        return super().get_delay(attempt, response)
+
+
+def test_throttled_upload_waits_once():
+    """ the transport throttles the host - retry_call must not wait again """
+    policy = CountingPolicy(backoff_base=0)
+    inner = ScriptedTransport((429, {"Retry-After": "0"}), (201,))
+    transport = RetryTransport(inner, policy)
+
+    async def run():
+        async with httpx.AsyncClient(transport=transport) as client:
+
+            async def upload():
+                response = await client.post(URL, content=stream_body())
+                try:
+                    response.raise_for_status()
+                except httpx.HTTPStatusError as err:
+                    raise DRACOONHttpError(error=err)
+                return response
+
+            return await retry_call(upload, policy)
+
+    assert asyncio.run(run()).status_code == 201
+    assert inner.requests == 2
+    # delay computed once (by the transport for the token bucket)
+    assert policy.delays == 1
+
+
+def test_retry_call_waits_without_retry_transport():
+    policy = CountingPolicy(backoff_base=0)
+    responses = [httpx.Response(503, request=httpx.Request("POST", URL)), "done"]
+
+    async def call():
+        result = responses.pop(0)
+        if isinstance(result, httpx.Response):
+            raise DRACOONHttpError(error=httpx.HTTPStatusError("unavailable", request=result.request, response=result))
+        return result
+
+    assert asyncio.run(retry_call(call, policy)) == "done"
+    assert policy.delays == 1
@@ -0,0 +1,119 @@
+import io
+import json
+import zipfile
+
+import pytest
+from dracoon.branding.responses import ImageType
+
+from dcspray.util.errors import InvalidArchiveError
+from dcspray.util.snapshot import ARCHIVE_VERSION, IMAGES_DIR, SNAPSHOT_INDEX, SnapshotReader, SnapshotWriter
+
+SOURCES = ["https://a.dracoon.test", "https://b.dracoon.test"]
+LOGO = b"shared logo" * 100
+
+
+def write_snapshot(images_by_source: dict) -> io.BytesIO:
+    """ snapshot with one tenant per source - images given as {source: {image type: content}} """
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        writer = SnapshotWriter(archive)
+        for source_url, images in images_by_source.items():
+            manifest_images = [
+                writer.add_image(img_type, f"{img_type.value}_large.png", lambda content=content: io.BytesIO(content))
+                for img_type, content in images.items()
+            ]
+            writer.add_tenant(source_url, branding={"productName": source_url}, images=manifest_images)
+        writer.write_index()
+    return buffer
+
+
+def replace_member(buffer: io.BytesIO, name: str, content: bytes) -> zipfile.ZipFile:
+    """ copy of an archive with the content of a member replaced """
+    copy = io.BytesIO()
+    with zipfile.ZipFile(buffer, "r") as source, zipfile.ZipFile(copy, "w") as target:
+        for info in source.infolist():
+            target.writestr(info, content if info.filename == name else source.read(info))
+    return zipfile.ZipFile(copy, "r")
+
+
+def test_images_are_deduplicated_across_tenants():
+    buffer = write_snapshot({
+        SOURCES[0]: {ImageType.WEB_LOGO: LOGO, ImageType.APP_LOGO: b"app logo a"},
+        SOURCES[1]: {ImageType.WEB_LOGO: LOGO, ImageType.APP_LOGO: b"app logo b"},
+    })
+
+    with zipfile.ZipFile(buffer, "r") as archive:
+        images = [name for name in archive.namelist() if name.startswith(f"{IMAGES_DIR}/")]
+        assert len(images) == 3
+
+        reader = SnapshotReader(archive)
+        manifests = [reader.get_tenant(source_url) for source_url in SOURCES]
+        logos = [
+            next(image for image in manifest.images if image.image_type == ImageType.WEB_LOGO)
+            for manifest in manifests
+        ]
+        assert logos[0].path == logos[1].path
+        assert archive.read(logos[0].path) == LOGO
+
+        for manifest in manifests:
+            reader.verify(manifest, required=[ImageType.WEB_LOGO, ImageType.APP_LOGO])
+
+
+def test_several_tenants_require_a_source():
+    buffer = write_snapshot({source_url: {ImageType.WEB_LOGO: LOGO} for source_url in SOURCES})
+
+    with zipfile.ZipFile(buffer, "r") as archive, pytest.raises(InvalidArchiveError, match="select a source"):
+        SnapshotReader(archive).get_tenant()
+
+
+def test_image_checksum_is_verified():
+    buffer = write_snapshot({SOURCES[0]: {ImageType.WEB_LOGO: LOGO}})
+
+    with zipfile.ZipFile(buffer, "r") as archive:
+        path = SnapshotReader(archive).get_tenant().images[0].path
+
+    # same size, different content
+    archive = replace_member(buffer, path, LOGO[::-1])
+    reader = SnapshotReader(archive)
+
+    with pytest.raises(InvalidArchiveError, match="Checksum mismatch"):
+        reader.verify(reader.get_tenant())
+
+
+def test_image_size_is_verified():
+    buffer = write_snapshot({SOURCES[0]: {ImageType.WEB_LOGO: LOGO}})
+
+    with zipfile.ZipFile(buffer, "r") as archive:
+        path = SnapshotReader(archive).get_tenant().images[0].path
+
+    reader = SnapshotReader(replace_member(buffer, path, LOGO[:-1]))
+
+    with pytest.raises(InvalidArchiveError, match="Size mismatch"):
+        reader.verify(reader.get_tenant())
+
+
+def test_missing_image_type_is_rejected():
+    buffer = write_snapshot({SOURCES[0]: {ImageType.WEB_LOGO: LOGO}})
+
+    with zipfile.ZipFile(buffer, "r") as archive, pytest.raises(InvalidArchiveError, match="appLogo"):
+        reader = SnapshotReader(archive)
+        reader.verify(reader.get_tenant(), required=[ImageType.WEB_LOGO, ImageType.APP_LOGO])
+
+
+def make_archive(index: dict) -> zipfile.ZipFile:
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        archive.writestr(SNAPSHOT_INDEX, json.dumps(index))
+    return zipfile.ZipFile(buffer, "r")
+
+
+@pytest.mark.parametrize("version", [1, ARCHIVE_VERSION + 1, None])
+def test_unknown_version_is_rejected(version):
+    with pytest.raises(InvalidArchiveError, match=f"Unsupported archive version {version}"):
+        SnapshotReader(make_archive({"version": version, "tenants": {}}))
+
+
+def test_current_version_is_read():
+    reader = SnapshotReader(make_archive({"version": ARCHIVE_VERSION, "tenants": {}}))
+
+    assert reader.tenants == {}
@@ -0,0 +1,73 @@
+import asyncio
+import json
+from datetime import datetime
+
+import httpx
+import pytest
+import respx
+from dracoon.client import DRACOONConnection
+
+from dcspray.util.auth import connect_stored_token
+from dcspray.util.tokens import TokenStore
+
+from mock_target import TARGET_URL
+
+CLIENT_ID = "dcspray"
+SECRET = "correct horse battery staple"
+
+
+def make_connection(refresh_token: str) -> DRACOONConnection:
+    return DRACOONConnection(datetime.now(), "access_token", 3600, refresh_token)
+
+
+def test_round_trip(tmp_path):
+    path = str(tmp_path.joinpath("tokens.json"))
+    TokenStore(SECRET, path).put(TARGET_URL + "/", CLIENT_ID, make_connection("refresh_token"))
+
+    # encrypted at rest
+    assert "refresh_token" not in open(path).read()
+
+    token = TokenStore(SECRET, path).get(TARGET_URL, CLIENT_ID)
+    assert token.refresh_token == "refresh_token"
+    assert TokenStore(SECRET, path).get(TARGET_URL, "other_client") is None
+
+
+def test_wrong_passphrase(tmp_path):
+    path = str(tmp_path.joinpath("tokens.json"))
+    TokenStore(SECRET, path).put(TARGET_URL, CLIENT_ID, make_connection("refresh_token"))
+
+    with pytest.raises(ValueError):
+        TokenStore("wrong passphrase", path)
+
+
+@respx.mock
+def test_rotated_token_is_written_back(tmp_path):
+    path = str(tmp_path.joinpath("tokens.json"))
+    TokenStore(SECRET, path).put(TARGET_URL, CLIENT_ID, make_connection("refresh_token"))
+
+    token_route = respx.post(f"{TARGET_URL}/oauth/token").mock(return_value=httpx.Response(200, json={
+        "access_token": "access_token", "expires_in": 3600, "refresh_token": "rotated_token"
+    }))
+
+    async def connect():
+        dracoon = await connect_stored_token(TARGET_URL, CLIENT_ID, token_store=TokenStore(SECRET, path))
+        await dracoon.client.disconnect()
+
+    asyncio.run(connect())
+
+    assert token_route.called
+    assert b"refresh_token=refresh_token" in token_route.calls.last.request.content
+    assert TokenStore(SECRET, path).get(TARGET_URL, CLIENT_ID).refresh_token == "rotated_token"
+
+
+@respx.mock
+def test_rejected_token_is_removed(tmp_path):
+    path = str(tmp_path.joinpath("tokens.json"))
+    TokenStore(SECRET, path).put(TARGET_URL, CLIENT_ID, make_connection("refresh_token"))
+
+    respx.post(f"{TARGET_URL}/oauth/token").mock(
+        return_value=httpx.Response(400, content=json.dumps({"error": "invalid_grant"}))
+    )
+
+    assert asyncio.run(connect_stored_token(TARGET_URL, CLIENT_ID, token_store=TokenStore(SECRET, path))) is None
+    assert TokenStore(SECRET, path).get(TARGET_URL, CLIENT_ID) is None
@@ -0,0 +1,107 @@
+import asyncio
+
+import pytest
+
+from dcspray.util.transfer import MemoryBudget
+
+
+async def wait_queued(budget: MemoryBudget, count: int):
+    while len(budget._waiters) < count:
+        await asyncio.sleep(0)
+
+
+def test_waiters_are_served_in_order():
+    async def run():
+        budget = MemoryBudget(limit=100)
+        order = []
+        held = await budget.acquire(80)
+
+        async def _acquire(name: str, size: int):
+            await budget.acquire(size)
+            order.append(name)
+
+        large = asyncio.create_task(_acquire("large", 50))
+        await wait_queued(budget, 1)
+        # fits into the free share, but must not overtake the waiting transfer
+        small = asyncio.create_task(_acquire("small", 10))
+        await wait_queued(budget, 2)
+        await asyncio.sleep(0)
+        assert order == []
+
+        budget.release(held)
+        await asyncio.gather(large, small)
+        assert order == ["large", "small"]
+        assert budget.in_use == 60
+
+    asyncio.run(run())
+
+
+def test_acquire_larger_than_budget_runs_alone():
+    async def run():
+        budget = MemoryBudget(limit=100)
+
+        assert await budget.acquire(500) == 100
+        assert budget.in_use == 100
+
+        other = asyncio.create_task(budget.acquire(10))
+        await wait_queued(budget, 1)
+        assert not other.done()
+
+        budget.release(100)
+        assert await other == 10
+        assert budget.peak == 100
+
+    asyncio.run(run())
+
+
+def test_cancelled_waiter_does_not_block_budget():
+    async def run():
+        budget = MemoryBudget(limit=100)
+        held = await budget.acquire(100)
+
+        cancelled = asyncio.create_task(budget.acquire(60))
+        waiting = asyncio.create_task(budget.acquire(60))
+        await wait_queued(budget, 2)
+
+        cancelled.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await cancelled
+
+        budget.release(held)
+        assert await waiting == 60
+        assert budget.in_use == 60
+
+    asyncio.run(run())
+
+
+def test_cancelled_after_grant_releases_budget():
+    async def run():
+        budget = MemoryBudget(limit=100)
+        held = await budget.acquire(100)
+
+        waiter = asyncio.create_task(budget.acquire(60))
+        await wait_queued(budget, 1)
+
+        # granted and cancelled before the waiter resumed
+        budget.release(held)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+
+        assert budget.in_use == 0
+
+    asyncio.run(run())
+
+
+def test_reserve_releases_on_error():
+    async def run():
+        budget = MemoryBudget(limit=100)
+
+        with pytest.raises(RuntimeError):
+            async with budget.reserve(40):
+                assert budget.in_use == 40
+                raise RuntimeError("transfer failed")
+
+        assert budget.in_use == 0
+
+    asyncio.run(run())